@@ -1,12 +1,20 @@
 import pygame
 from pygame.locals import *
 import os
+import sys
+import time
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from src.game import Game
 from src.menu import MainMenu
+from src.asset_manager import assets
+from src.loader import Loader
 
 def main():
+    # Time-to-first-frame is measured from here
+    launch_time = time.perf_counter()
+    first_frame = True
+    
     pygame.init()
     display = (1280, 720)
     pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
@@ -32,20 +40,15 @@ def main():
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
     
-    # Initialize music system
-    try:
-        pygame.mixer.init()
-        music_path = os.path.join('src', 'assets', 'sound', 'music.mp3')
-        if os.path.exists(music_path):
-            pygame.mixer.music.load(music_path)
-            pygame.mixer.music.set_volume(0.3)  # 50% volume
-            pygame.mixer.music.play(-1)  # Loop indefinitely
-            print("Background music started")
-    except Exception as e:
-        print(f"Could not initialize music: {e}")
+    # Serve assets from the packed bundle when one has been built
+    assets.open_bundle()
     
-    # Create game instance but don't start yet
-    game = Game(display)
+    # Create game instance but don't start yet; its terrain, models and
+    # sounds load in the background while the menu is up. An optional
+    # heightmap (16-bit .raw/.r16 or .png) can be passed on the command line.
+    heightmap_path = sys.argv[1] if len(sys.argv) > 1 else None
+    loader = Loader()
+    game = Game(display, heightmap_path, loader)
     
     # Create main menu
     def start_game_callback():
@@ -54,7 +57,7 @@ def main():
         pygame.mouse.set_visible(False)
         pygame.event.set_grab(True)
     
-    main_menu = MainMenu(display, start_game_callback)
+    main_menu = MainMenu(display, start_game_callback, loader)
     
     # Main game loop
     clock = pygame.time.Clock()
@@ -73,6 +76,7 @@ def main():
                     # Clean up and exit
                     if hasattr(game, 'cleanup'):
                         game.cleanup()
+                    assets.close()
                     pygame.quit()
                     return
                 if event.type == pygame.KEYDOWN:
@@ -86,6 +90,7 @@ def main():
                             # Quit if in menu
                             if hasattr(game, 'cleanup'):
                                 game.cleanup()
+                            assets.close()
                             pygame.quit()
                             return
             
@@ -104,15 +109,20 @@ def main():
                 main_menu.render()
             
             pygame.display.flip()
+            if first_frame:
+                first_frame = False
+                print(f"Time to first frame: {(time.perf_counter() - launch_time) * 1000:.0f} ms")
             clock.tick(60)  # Cap at 60 FPS
     except Exception as e:
         print(f"Game crashed: {e}")
     finally:
         # Make sure to stop the music and clean up
         try:
-            pygame.mixer.music.stop()
+            loader.close()
             if hasattr(game, 'cleanup'):
                 game.cleanup()
+            # Free every cached asset while the GL context is still alive
+            assets.close()
             pygame.quit()
         except:
             pass
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import numpy as np
+from .mesh_bake import bake_arrays, parse_baked_mesh
+
+# One-file bundle of preprocessed assets, read through a memory map.
+#
+# The builder walks the asset directory and stores every asset in the form
+# the game uses it in:
+#   - models: OBJs baked like mesh_bake does (or .mesh files as they are)
+#   - sounds: PCM samples in the mixer's output format, so playback needs
+#     no decoder
+#   - shaders: GLSL source text
+#   - textures: RGBA pixels, bottom row first as glTexImage2D expects
+# Data blocks are 64-byte aligned and followed by a JSON index. At runtime
+# AssetBundle maps the file once and hands out memoryview and NumPy views
+# into the mapping, so nothing is read or copied until it is touched.
+# Entries are keyed by kind and asset path relative to the asset
+# directory without extension, so skull.obj and skull.mesh share a key.
+# Build with:
+#
+#     python -m src.asset_bundle [asset directory] [bundle path]
+
+BUNDLE_MAGIC = b'BNDL'
+BUNDLE_VERSION = 1
+# magic, version, index offset, index size
+BUNDLE_HEADER = struct.Struct('<4sIQQ')
+BUNDLE_ALIGNMENT = 64
+BUNDLE_PATH = os.path.join('src', 'assets.bundle')
+ASSET_DIR = os.path.join('src', 'assets')
+
+ASSET_KINDS = {
+    '.obj': 'model', '.mesh': 'model',
+    '.wav': 'sound', '.ogg': 'sound', '.mp3': 'sound',
+    '.glsl': 'shader', '.vert': 'shader', '.frag': 'shader',
+    '.png': 'texture', '.jpg': 'texture', '.jpeg': 'texture', '.bmp': 'texture', '.tga': 'texture',
+}
+
+def asset_key(kind, relative_path):
+    return kind + ':' + os.path.splitext(relative_path)[0].replace(os.sep, '/')
+
+class AssetBundle:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self.map)
+
+        magic, version, index_offset, index_size = BUNDLE_HEADER.unpack_from(self.data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {BUNDLE_VERSION} asset bundle")
+        index = json.loads(bytes(self.data[index_offset:index_offset + index_size]))
+        self.root = index['root']  # Asset directory the bundle was built from
+        self.entries = index['entries']  # Key -> offset, size, source mtime and kind-specific fields
+
+    def find(self, kind, path):
+        """Index entry for the asset at path (a path under the bundle's root), or None.
+
+        A loose file changed after the bundle was built wins over the bundle.
+        """
+        relative = os.path.relpath(path, self.root)
+        entry = self.entries.get(asset_key(kind, relative))
+        if entry is None:
+            return None
+        try:
+            if os.path.getmtime(path) > entry['source_mtime']:
+                print(f"{path} is newer than {self.path}, loading the loose file; rebuild the bundle")
+                return None
+        except OSError:
+            pass
+        return entry
+
+    def view(self, entry):
+        """Zero-copy memoryview of an entry's bytes."""
+        return self.data[entry['offset']:entry['offset'] + entry['size']]
+
+    def mesh(self, path):
+        """BakedMesh viewing the bundle for the model at path, or None."""
+        entry = self.find('model', path)
+        return parse_baked_mesh(self.view(entry), entry['hash']) if entry else None
+
+    def sound(self, path):
+        """(PCM memoryview, (frequency, format, channels)) for the sound at path, or None."""
+        entry = self.find('sound', path)
+        return (self.view(entry), tuple(entry['mixer'])) if entry else None
+
+    def text(self, path):
+        entry = self.find('shader', path)
+        return str(self.view(entry), 'utf-8') if entry else None
+
+    def texture(self, path):
+        """(width, height, RGBA uint8 array view) for the image at path, or None."""
+        entry = self.find('texture', path)
+        if entry is None:
+            return None
+        width, height = entry['width'], entry['height']
+        return width, height, np.frombuffer(self.view(entry), dtype=np.uint8).reshape(height, width, 4)
+
+    def close(self):
+        self.data.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # Views handed out (e.g. cached meshes) keep the mapping alive until freed
+            pass
+
+def open_bundle(path=BUNDLE_PATH):
+    """AssetBundle at path, or None if there is none or it cannot be read."""
+    if not os.path.exists(path):
+        return None
+    try:
+        bundle = AssetBundle(path)
+        print(f"Using asset bundle {path} ({len(bundle.entries)} assets)")
+        return bundle
+    except Exception as e:
+        print(f"Could not open asset bundle {path}: {e}")
+        return None
+
+def pack_model(path):
+    if path.endswith('.mesh'):
+        with open(path, 'rb') as f:
+            data = f.read()
+    else:
+        from .model import Model
+        model = Model()
+        model.load_obj(path)
+        vertices, indices, layout = model.mesh_arrays()
+        if len(indices) == 0:
+            raise ValueError("no triangles")
+        data = bake_arrays(vertices, indices, layout).tobytes()
+    return data, {'hash': hashlib.sha1(data).hexdigest()}
+
+def pack_sound(path):
+    import pygame
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    sound = pygame.mixer.Sound(path)
+    return sound.get_raw(), {'mixer': list(pygame.mixer.get_init())}
+
+def pack_shader(path):
+    with open(path, 'rb') as f:
+        return f.read(), {}
+
+def pack_texture(path):
+    import pygame
+    surface = pygame.image.load(path)
+    data = pygame.image.tostring(surface, "RGBA", 1)
+    return data, {'width': surface.get_width(), 'height': surface.get_height()}
+
+PACKERS = {'model': pack_model, 'sound': pack_sound, 'shader': pack_shader, 'texture': pack_texture}
+
+def build_bundle(asset_dir=ASSET_DIR, bundle_path=BUNDLE_PATH):
+    """Pack every recognised file under asset_dir into bundle_path; returns the entry count."""
+    sources = {}
+    for directory, _, files in os.walk(asset_dir):
+        for name in sorted(files):
+            kind = ASSET_KINDS.get(os.path.splitext(name)[1].lower())
+            if kind is None:
+                continue
+            path = os.path.join(directory, name)
+            key = asset_key(kind, os.path.relpath(path, asset_dir))
+            previous = sources.get(key)
+            if previous is not None:
+                # A baked mesh beats its OBJ when it is up to date; otherwise the first file wins
+                if kind != 'model' or previous.endswith('.mesh') == path.endswith('.mesh'):
+                    continue
+                mesh, obj = (path, previous) if path.endswith('.mesh') else (previous, path)
+                path = mesh if os.path.getmtime(mesh) >= os.path.getmtime(obj) else obj
+            sources[key] = path
+
+    entries = {}
+    temp_path = bundle_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(b'\0' * BUNDLE_HEADER.size)
+        for key, path in sorted(sources.items()):
+            kind = key.split(':', 1)[0]
+            try:
+                data, fields = PACKERS[kind](path)
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+                continue
+
+            f.write(b'\0' * (-f.tell() % BUNDLE_ALIGNMENT))
+            entries[key] = dict(offset=f.tell(), size=len(data), source_mtime=os.path.getmtime(path), **fields)
+            f.write(data)
+            print(f"  {key}: {len(data)} bytes from {path}")
+
+        index = json.dumps({'root': asset_dir, 'entries': entries}).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, index_offset, len(index)))
+    os.replace(temp_path, bundle_path)
+
+    print(f"Built {bundle_path}: {len(entries)} assets, {os.path.getsize(bundle_path)} bytes")
+    return len(entries)
+
+if __name__ == '__main__':
+    build_bundle(*sys.argv[1:3])
@@ -0,0 +1,296 @@
+import os
+import threading
+from concurrent.futures import Future
+import pygame
+from OpenGL.GL import *
+from .shader import PROGRAMS, ProgramCache
+from .asset_bundle import BUNDLE_PATH, open_bundle
+
+# Shared cache for everything the game loads from disk or builds once:
+# fonts, sounds, models, textures and shader programs.
+#
+# Assets are keyed by (kind, key) and decoded on first use. Each acquire
+# takes a reference and each release drops one; an asset nobody holds stays
+# cached until evict() frees it, so a menu closing and reopening does not
+# reload anything. The mixer is initialized here, once, and the background
+# music is only (re)loaded when a different track is asked for. Fonts,
+# sounds and models (with upload=False) may be requested from the startup
+# loader's worker threads; textures and shaders need the GL thread. When
+# an asset bundle is open, assets in it are taken from its memory map and
+# only missing ones are read from loose files.
+#
+# The lock only guards the cache itself: an asset is decoded outside it,
+# with a pending entry recorded under its key so a second caller for the
+# same asset waits for that one load while every other asset stays free.
+
+MUSIC_PATH = os.path.join('src', 'assets', 'sound', 'music.mp3')
+
+class AssetManager:
+    def __init__(self):
+        self.entries = {}  # (kind, key) -> [asset, references, free function or None]
+        self.mixer_ready = None  # None until the first attempt, then whether it worked
+        self.music_path = None  # Track currently loaded into the mixer
+        self.loading = {}  # (kind, key) -> Future of a load in progress, so each asset is decoded once
+        self.lock = threading.RLock()  # Guards entries and loading, never held while decoding
+        self.bundle = None  # AssetBundle consulted before loose files
+        self.programs = ProgramCache()  # Links shaders through the on-disk binary cache
+        self.pending_programs = {}  # Name -> PendingProgram started by warm_shaders()
+
+    def acquire(self, kind, key, load, free=None):
+        """Return the cached asset for (kind, key), loading it with load() the first time.
+
+        A caller asking for an asset another thread is loading waits for that
+        load; if it raises, every waiting caller gets the exception.
+        """
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is not None:
+                entry[1] += 1
+                return entry[0]
+            pending = self.loading.get((kind, key))
+            loader = pending is None
+            if loader:
+                pending = self.loading[(kind, key)] = Future()
+
+        if not loader:
+            pending.result()
+            # Taken again rather than returned from the future, since the
+            # entry may have been evicted in between
+            return self.acquire(kind, key, load, free)
+
+        try:
+            asset = load()
+        except BaseException as e:
+            with self.lock:
+                del self.loading[(kind, key)]
+            pending.set_exception(e)
+            raise
+        with self.lock:
+            self.entries[(kind, key)] = [asset, 1, free]
+            del self.loading[(kind, key)]
+        pending.set_result(None)
+        return asset
+
+    def release(self, kind, key):
+        """Drop one reference; the asset stays cached until evicted."""
+        with self.lock:
+            entry = self.entries.get((kind, key))
+            if entry is not None and entry[1] > 0:
+                entry[1] -= 1
+
+    def references(self, kind, key):
+        entry = self.entries.get((kind, key))
+        return entry[1] if entry is not None else 0
+
+    def evict(self, kind=None, force=False):
+        """Free cached assets nobody references (or every one with force), optionally of one kind.
+
+        Returns how many were freed.
+        """
+        with self.lock:
+            evicted = [entry_key for entry_key, (_, references, _) in self.entries.items()
+                       if (kind is None or entry_key[0] == kind) and (force or references == 0)]
+            for entry_key in evicted:
+                asset, _, free = self.entries.pop(entry_key)
+                if free is not None and asset is not None:
+                    try:
+                        free(asset)
+                    except Exception as e:
+                        print(f"Error freeing {entry_key[0]} {entry_key[1]}: {e}")
+            return len(evicted)
+
+    def open_bundle(self, path=BUNDLE_PATH):
+        """Serve assets from the bundle at path if there is one; returns whether it opened."""
+        with self.lock:
+            if self.bundle is None:
+                self.bundle = open_bundle(path)
+            return self.bundle is not None
+
+    def init_mixer(self):
+        """Initialize pygame's mixer the first time it is needed; returns whether sound works."""
+        with self.lock:
+            if self.mixer_ready is None:
+                try:
+                    pygame.mixer.init()
+                    self.mixer_ready = True
+                except Exception as e:
+                    print(f"Could not initialize sound system: {e}")
+                    self.mixer_ready = False
+            return self.mixer_ready
+
+    def font(self, name, size, bold=False):
+        def load():
+            pygame.font.init()
+            return pygame.font.SysFont(name, size, bold=bold)
+        return self.acquire('font', (name, size, bold), load)
+
+    def sound(self, path, volume=1.0):
+        """A pygame Sound for path, or None if sound is unavailable or the file is missing."""
+        def load():
+            if not self.init_mixer():
+                return None
+            packed = self.bundle.sound(path) if self.bundle else None
+            if packed is not None:
+                samples, mixer_format = packed
+                # The samples are only usable as they are in the format they were packed for
+                if mixer_format == pygame.mixer.get_init():
+                    sound = pygame.mixer.Sound(buffer=samples)
+                    sound.set_volume(volume)
+                    return sound
+            if not os.path.exists(path):
+                print(f"Warning: Sound file not found at {path}")
+                return None
+            try:
+                sound = pygame.mixer.Sound(path)
+                sound.set_volume(volume)
+                print(f"Loaded sound: {path}")
+                return sound
+            except Exception as e:
+                print(f"Error loading sound {path}: {e}")
+                return None
+        return self.acquire('sound', path, load)
+
+    def model(self, path, upload=True):
+        """A Model for path; with upload=False its GL buffers wait for model.upload()."""
+        # Imported here since models pull in the whole mesh pipeline
+        from .model import Model
+        def load():
+            baked = self.bundle.mesh(path) if self.bundle else None
+            return Model(path, upload=False, baked=baked)
+        model = self.acquire('model', path, load, lambda model: model.delete())
+        if upload:
+            model.upload()
+        return model
+
+    def texture(self, path):
+        """A GL texture name for an image file, or None if it cannot be loaded."""
+        def load():
+            packed = self.bundle.texture(path) if self.bundle else None
+            if packed is not None:
+                width, height, data = packed
+            else:
+                try:
+                    surface = pygame.image.load(path)
+                except Exception as e:
+                    print(f"Error loading texture {path}: {e}")
+                    return None
+                width, height = surface.get_width(), surface.get_height()
+                data = pygame.image.tostring(surface, "RGBA", 1)
+            texture = glGenTextures(1)
+            glBindTexture(GL_TEXTURE_2D, texture)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+            glBindTexture(GL_TEXTURE_2D, 0)
+            return texture
+        return self.acquire('texture', path, load, lambda texture: glDeleteTextures([texture]))
+
+    def shader_source(self, path):
+        """GLSL source text of a shader file, or None if it cannot be read."""
+        def load():
+            text = self.bundle.text(path) if self.bundle else None
+            if text is not None:
+                return text
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return f.read()
+            except OSError as e:
+                print(f"Error loading shader source {path}: {e}")
+                return None
+        return self.acquire('shader source', path, load)
+
+    def read_shader(self, path):
+        # Shader #include reader: bundle or loose file, without holding a reference
+        source = self.shader_source(path)
+        self.release('shader source', path)
+        return source
+
+    def shader(self, name, vertex_source=None, fragment_source=None, attributes=()):
+        """A linked program cached under name, by default from its register_program() sources.
+
+        Raises RuntimeError with the driver's log if it does not compile.
+        """
+        def load():
+            nonlocal vertex_source, fragment_source, attributes
+            if vertex_source is None:
+                vertex_source, fragment_source, attributes = PROGRAMS[name]
+            with self.lock:
+                pending = self.pending_programs.pop(name, None)
+            if pending is None:
+                pending = self.programs.start(name, vertex_source, fragment_source, attributes, self.read_shader)
+            # Link before caching so a failed compile is retried rather than remembered
+            return self.programs.finish(pending)
+        return self.acquire('shader', name, load, glDeleteProgram)
+
+    def warm_shaders(self):
+        """Compile every registered program that is not cached yet; a Loader finish step.
+
+        All compiles are started at once and each is finished as the driver
+        reports it complete, so with parallel compilation frames keep coming.
+        """
+        with self.lock:
+            names = [name for name in PROGRAMS if ('shader', name) not in self.entries]
+        for name in names:
+            try:
+                pending = self.programs.start(name, *PROGRAMS[name], read=self.read_shader)
+            except Exception as e:
+                print(f"Could not compile shader {name}: {e}")
+                continue
+            with self.lock:
+                self.pending_programs[name] = pending
+        while True:
+            with self.lock:
+                ready = [(name, pending) for name, pending in self.pending_programs.items()
+                         if self.programs.ready(pending)]
+                for name, _ in ready:
+                    del self.pending_programs[name]
+            for name, pending in ready:
+                try:
+                    program = self.programs.finish(pending)
+                except RuntimeError as e:
+                    print(f"Could not compile shader {name}: {e}")
+                    continue
+                with self.lock:
+                    self.entries.setdefault(('shader', name), [program, 0, glDeleteProgram])
+            with self.lock:
+                remaining = len(self.pending_programs)
+            if not remaining:
+                return
+            yield 1.0 - remaining / len(names)
+
+    def play_music(self, path=MUSIC_PATH, volume=0.3):
+        """Loop a music track, unless it is already the one playing."""
+        if not self.init_mixer():
+            return
+        try:
+            if self.music_path == path and pygame.mixer.music.get_busy():
+                return
+            if not os.path.exists(path):
+                print(f"Warning: Music file not found at {path}")
+                return
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.play(-1)  # -1 means loop indefinitely
+            self.music_path = path
+            print(f"Background music started: {path}")
+        except Exception as e:
+            print(f"Error playing music {path}: {e}")
+
+    def stop_music(self):
+        if self.mixer_ready:
+            try:
+                pygame.mixer.music.stop()
+            except Exception:
+                pass
+        self.music_path = None
+
+    def close(self):
+        """Stop the music, free every cached asset and unmap the bundle."""
+        self.stop_music()
+        self.evict(force=True)
+        if self.bundle is not None:
+            self.bundle.close()
+            self.bundle = None
+
+# The game's one asset cache
+assets = AssetManager()
@@ -1,6 +1,8 @@
 import math
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from .raycast import raycast_many
 
 class Bullet:
     def __init__(self, position, direction, speed=1.0, lifespan=2.0):
@@ -10,6 +12,7 @@ class Bullet:
         self.lifespan = lifespan  # Time in seconds before bullet disappears
         self.active = True
         self.damage = 30  # Increased from 10 to 30 for more impact
+        self.radius = 0.1  # Drawn size, collision and culling sphere
     
     def update(self, delta_time):
         # Move the bullet along its direction
@@ -36,7 +39,7 @@ class Bullet:
         
         # Draw bullet as a small sphere
         quadric = gluNewQuadric()
-        gluSphere(quadric, 0.1, 8, 8)  # Small radius, low detail
+        gluSphere(quadric, self.radius, 8, 8)  # Small radius, low detail
         gluDeleteQuadric(quadric)
         
         glEnable(GL_LIGHTING)
@@ -54,16 +57,17 @@ class Bullet:
         # Check if distance is less than sum of radii
         # Use entity's collision radius instead of scale-based calculation
         entity_radius = entity.collision_radius if hasattr(entity, 'collision_radius') else max(entity.scale) * 1.0
-        bullet_radius = 0.1  # Same as rendering size
-        
-        if distance_sq < (entity_radius + bullet_radius) ** 2:
+        if distance_sq < (entity_radius + self.radius) ** 2:
             return True
         
         return False
 
 class BulletManager:
-    def __init__(self):
+    def __init__(self, terrain=None):
         self.bullets = []
+        self.terrain = terrain  # Bullets stop when they hit the ground
+        self.crater_radius = 2.5  # Size of the dent a bullet leaves in the terrain
+        self.crater_depth = 0.2
         self.cooldown = 0.2  # Time between shots in seconds
         self.last_shot_time = 0
     
@@ -96,25 +100,69 @@ class BulletManager:
         
         return False
     
-    def update(self, delta_time, entities):
-        # Update all bullets
-        for bullet in self.bullets[:]:
+    def update(self, delta_time, targets=None):
+        # targets is the EnemySwarm; returns how many of them bullets killed
+        kills = 0
+        
+        # Move all bullets, remembering where each one started this frame
+        starts = []
+        for bullet in self.bullets:
+            starts.append(bullet.position.copy())
             bullet.update(delta_time)
-            
-            # Check for collisions with entities
-            for entity in entities:
-                if hasattr(entity, 'is_alive') and entity.is_alive:
-                    if bullet.check_collision(entity) and bullet.active:
-                        # Apply damage to entity
-                        entity.take_damage(bullet.damage)
-                        bullet.active = False
-                        break
-            
-            # Remove inactive bullets
-            if not bullet.active:
-                self.bullets.remove(bullet)
+        
+        # Where along this frame's path each bullet reaches the terrain, as a
+        # fraction of the path (inf if it does not), all in one batch
+        ground = np.full(len(self.bullets), np.inf)
+        if self.terrain is not None and self.bullets:
+            directions = [bullet.direction for bullet in self.bullets]
+            distances = [bullet.speed * delta_time for bullet in self.bullets]
+            hits, hit_distances = raycast_many(self.terrain, starts, directions, distances)
+            for i, (hit, hit_distance, distance) in enumerate(zip(hits, hit_distances, distances)):
+                if hit:
+                    ground[i] = hit_distance / distance if distance > 0 else 0.0
+        
+        # Check for collisions with the targets along this frame's paths, all bullets in one query
+        struck = set()  # Bullets stopped by a target
+        active = [i for i, bullet in enumerate(self.bullets) if bullet.active]
+        if targets is not None and active:
+            segments, handles, along = targets.segment_hits([starts[i] for i in active],
+                                                            [self.bullets[i].position for i in active],
+                                                            [self.bullets[i].radius for i in active])
+            # Nearest first per bullet; a target killed by an earlier bullet no longer resolves
+            for segment, handle, t in zip(segments.tolist(), handles.tolist(), along.tolist()):
+                index = active[segment]
+                bullet = self.bullets[index]
+                if not bullet.active or t > ground[index]:
+                    continue  # Already spent, or the ground is in the way
+                row = targets.row(handle)
+                if row < 0:
+                    continue
+                # Apply damage to the target
+                if targets.take_damage(row, bullet.damage):
+                    kills += 1
+                bullet.active = False
+                struck.add(index)
+        
+        # Bullets that reached the ground without hitting a target first stop
+        # there and dent it where they landed
+        for index, (bullet, start, t) in enumerate(zip(self.bullets, starts, ground.tolist())):
+            if t != np.inf and index not in struck:
+                bullet.active = False
+                hit_distance = t * bullet.speed * delta_time
+                impact_x = start[0] + bullet.direction[0] * hit_distance
+                impact_z = start[2] + bullet.direction[2] * hit_distance
+                self.terrain.deform(impact_x, impact_z, self.crater_radius, self.crater_depth)
+        
+        # Remove inactive bullets
+        self.bullets = [bullet for bullet in self.bullets if bullet.active]
+        
+        return kills
     
-    def render(self):
-        # Render all active bullets
-        for bullet in self.bullets:
+    def render(self, frustum=None):
+        # Render all active bullets, skipping those outside the view
+        bullets = self.bullets
+        if frustum is not None and bullets:
+            visible = frustum.spheres_visible([b.position for b in bullets], [b.radius for b in bullets], 'bullets')
+            bullets = [b for b, keep in zip(bullets, visible) if keep]
+        for bullet in bullets:
             bullet.render()
\ No newline at end of file
@@ -0,0 +1,354 @@
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .terrain import Terrain, ProceduralHeights, interpolate_cells, crater_falloff
+
+# Queries touching at most this many chunks (in their bounding box) read
+# from a lattice stitched together from those chunks
+DENSE_CHUNK_SPAN = 64
+
+class ChunkedTerrain:
+    """Unbounded terrain streamed in fixed-size chunks around the player.
+
+    Every chunk is a small Terrain patch on one shared vertex lattice, so
+    neighbouring chunks agree exactly along their borders. Heights and
+    vertex data are generated on a worker thread pool; the GPU upload
+    happens on the main thread in update(), at most uploads_per_frame
+    chunks per call. Chunks outside the view distance stay in an LRU
+    cache until it grows past max_cache_bytes.
+    """
+
+    def __init__(self, chunk_size=32, chunk_resolution=16, seed=None, view_distance=96.0,
+                 max_cache_bytes=16 * 1024 * 1024, uploads_per_frame=2, workers=2,
+                 height_source=None, cache_dir=None):
+        self.chunk_size = chunk_size  # Size of a chunk in world units
+        self.chunk_resolution = chunk_resolution  # Grid cells along a chunk edge
+        self.cell_size = chunk_size / chunk_resolution
+        self.view_distance = view_distance
+        self.max_cache_bytes = max_cache_bytes
+        self.uploads_per_frame = uploads_per_frame
+        self.cache_dir = cache_dir  # Optional on-disk cache for generated chunks
+
+        # Default to the noise lattice of the classic 100x100 map, so the
+        # area around the origin looks the same as before
+        self.height_source = height_source or ProceduralHeights(seed, round(100 / self.cell_size))
+        self.center = self.height_source.center
+        self.grid_origin = (-self.center[0] * self.cell_size, -self.center[1] * self.cell_size)
+
+        self.chunks = OrderedDict()  # (cx, cz) -> Terrain, least recently used first
+        self.chunk_bytes = {}  # (cx, cz) -> approximate CPU + GPU footprint
+        self.cache_bytes = 0
+        self.pending = {}  # (cx, cz) -> Future from the worker pool
+        self.ready = {}  # (cx, cz) -> (Terrain, vertices) waiting for upload
+        self.visible_keys = []  # Loaded chunks inside the view distance, nearest first
+        self.drawn_keys = []  # Visible chunks that passed frustum culling this frame
+        self.triangle_count = 0  # Terrain triangles drawn with the current LOD selection
+        # (cx, cz) -> (res + 1, res + 1) height change craters made to a chunk,
+        # re-applied when it is generated again; bounded by the area cratered
+        self.crater_deltas = {}
+        self.height_version = 0  # Bumped by update() whenever loaded heights changed since the last one
+        self.heights_changed = False
+        self.lattice = None  # (key, heights) of the last dense_lattice(), reused while its chunks and heights stay the same
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='terrain')
+
+    def chunk_key(self, x, z):
+        """Key of the chunk containing world point (x, z)."""
+        gx = x / self.cell_size + self.center[0]
+        gz = z / self.cell_size + self.center[1]
+        return (math.floor(gx / self.chunk_resolution), math.floor(gz / self.chunk_resolution))
+
+    def needed_keys(self, position):
+        """Chunks overlapping the view circle around position, nearest first."""
+        res = self.chunk_resolution
+        gx = position[0] / self.cell_size + self.center[0]
+        gz = position[2] / self.cell_size + self.center[1]
+        reach = self.view_distance / self.cell_size
+
+        cx = np.arange(math.floor((gx - reach) / res), math.floor((gx + reach) / res) + 1)
+        cz = np.arange(math.floor((gz - reach) / res), math.floor((gz + reach) / res) + 1)
+        cx, cz = np.meshgrid(cx, cz)
+
+        # Distance from the player to the nearest point of each chunk, in lattice units
+        dx = np.maximum(np.maximum(cx * res - gx, gx - (cx + 1) * res), 0)
+        dz = np.maximum(np.maximum(cz * res - gz, gz - (cz + 1) * res), 0)
+        distance = np.hypot(dx, dz)
+        inside = distance <= reach
+
+        order = np.argsort(distance[inside], kind='stable')
+        return list(zip(cx[inside][order].tolist(), cz[inside][order].tolist()))
+
+    def generate_chunk(self, key):
+        # Runs on a worker thread: pure NumPy, no GL calls
+        cx, cz = key
+        terrain = Terrain(self.chunk_size, self.chunk_resolution,
+                          grid_offset=(cx * self.chunk_resolution, cz * self.chunk_resolution),
+                          height_source=self.height_source, create_mesh=False,
+                          cache_dir=self.cache_dir)
+        return terrain, terrain.bake_vertices()
+
+    def add_chunk(self, key, terrain, vertices):
+        # Runs on the main thread: re-apply craters, upload and account for the chunk
+        if self.apply_craters(key, terrain):
+            vertices = terrain.build_vertices()
+        terrain.create_mesh(vertices)
+        self.chunks[key] = terrain
+        footprint = terrain.heights.nbytes + vertices.nbytes + terrain.mesh.index_count * 4
+        self.chunk_bytes[key] = footprint
+        self.cache_bytes += footprint
+        self.heights_changed = True
+        self.lattice = None
+
+    def update(self, position):
+        """Stream chunks around position; call once per frame."""
+        keys = self.needed_keys(position)
+        needed = set(keys)
+
+        # Cancel work for chunks we have moved away from
+        for key in list(self.pending):
+            if key not in needed and self.pending[key].cancel():
+                del self.pending[key]
+        for key in list(self.ready):
+            if key not in needed:
+                del self.ready[key]
+
+        # Queue generation for missing chunks, nearest first
+        for key in keys:
+            if key not in self.chunks and key not in self.pending and key not in self.ready:
+                self.pending[key] = self.executor.submit(self.generate_chunk, key)
+
+        # Collect finished chunks
+        for key in list(self.pending):
+            future = self.pending[key]
+            if future.done():
+                del self.pending[key]
+                if key in needed:
+                    self.ready[key] = future.result()
+
+        # Upload a limited number of chunks per frame to avoid hitches
+        uploads = 0
+        for key in keys:
+            if uploads >= self.uploads_per_frame:
+                break
+            if key in self.ready:
+                self.add_chunk(key, *self.ready.pop(key))
+                uploads += 1
+
+        # Mark visible chunks as recently used
+        for key in keys:
+            if key in self.chunks:
+                self.chunks.move_to_end(key)
+        self.visible_keys = [key for key in keys if key in self.chunks]
+        self.drawn_keys = self.visible_keys
+
+        self.evict(needed)
+
+        # One bump for everything that changed this frame, so consumers of
+        # height_version rebuild at most once per frame
+        if self.heights_changed:
+            self.heights_changed = False
+            self.height_version += 1
+
+    def load_progress(self, position):
+        """Fraction of the chunks around position that are loaded and uploaded."""
+        keys = self.needed_keys(position)
+        return sum(key in self.chunks for key in keys) / len(keys) if keys else 1.0
+    
+    def load_around(self, position):
+        """Synchronously generate and upload every chunk around position."""
+        for key in self.needed_keys(position):
+            if key not in self.chunks:
+                self.add_chunk(key, *self.generate_chunk(key))
+        self.update(position)
+
+    def evict(self, needed):
+        # Drop least recently used chunks until we are under the memory cap
+        for key in list(self.chunks):
+            if self.cache_bytes <= self.max_cache_bytes:
+                break
+            if key in needed:
+                continue
+            self.chunks.pop(key).delete()
+            self.cache_bytes -= self.chunk_bytes.pop(key)
+
+    def chunk_origin(self, key):
+        # World x/z of a chunk's vertex (0, 0)
+        return (self.grid_origin[0] + key[0] * self.chunk_size, self.grid_origin[1] + key[1] * self.chunk_size)
+
+    def deform(self, x, z, radius, depth):
+        """Dent the terrain around (x, z) in every chunk the crater touches.
+
+        Loaded chunks change straight away, and the change is added to each
+        chunk's crater delta so the chunk keeps it when generated again.
+        height_version is bumped by the next update().
+        """
+        res = self.chunk_resolution
+        min_key = self.chunk_key(x - radius, z - radius)
+        max_key = self.chunk_key(x + radius, z + radius)
+        changed = False
+        for cx in range(min_key[0], max_key[0] + 1):
+            for cz in range(min_key[1], max_key[1] + 1):
+                window = crater_falloff(self.chunk_origin((cx, cz)), self.cell_size, res, x, z, radius)
+                if window is None:
+                    continue
+                (z0, z1, x0, x1), falloff = window
+                delta = self.crater_deltas.get((cx, cz))
+                if delta is None:
+                    delta = self.crater_deltas[(cx, cz)] = np.zeros((res + 1, res + 1))
+                delta[z0:z1, x0:x1] -= depth * falloff
+                self.heights_changed = True
+                self.lattice = None
+
+                chunk = self.chunks.get((cx, cz))
+                if chunk is not None:
+                    changed |= chunk.deform(x, z, radius, depth)
+        return changed
+
+    def apply_craters(self, key, terrain):
+        # Add the craters made so far to a freshly generated chunk
+        delta = self.crater_deltas.get(key)
+        if delta is None:
+            return False
+        if not terrain.heights.flags.writeable:
+            terrain.heights = np.array(terrain.heights)
+        terrain.heights += delta
+        terrain.patch_bounds_cache = None
+        return True
+
+    def dense_lattice(self, min_x, min_z, span_x, span):
+        # Heights of a span_x by span block of chunks from chunk (min_x, min_z),
+        # stitched into one lattice; chunks not loaded come from the height
+        # source. Queries from frame to frame mostly touch the same chunks, so
+        # the lattice is kept until they or their heights change.
+        key = (min_x, min_z, span_x, span, self.height_version)
+        if self.lattice is not None and self.lattice[0] == key:
+            return self.lattice[1]
+        res = self.chunk_resolution
+        lattice = np.empty((span * res, span_x * res))
+        for key_z in range(span):
+            for key_x in range(span_x):
+                block = lattice[key_z * res:(key_z + 1) * res, key_x * res:(key_x + 1) * res]
+                chunk = self.chunks.get((min_x + key_x, min_z + key_z))
+                if chunk is not None:
+                    block[:] = chunk.heights[:res, :res]
+                else:
+                    gx, gz = np.meshgrid((min_x + key_x) * res + np.arange(res), (min_z + key_z) * res + np.arange(res))
+                    block[:] = self.height_source(gx, gz)
+                    delta = self.crater_deltas.get((min_x + key_x, min_z + key_z))
+                    if delta is not None:
+                        block += delta[:res, :res]
+        self.lattice = (key, lattice)
+        return lattice
+
+    def vertex_heights(self, gx, gz):
+        """Heights at integer lattice vertices, from loaded chunks where possible."""
+        gx = np.asarray(gx, dtype=np.int64)
+        gz = np.asarray(gz, dtype=np.int64)
+        res = self.chunk_resolution
+        cx = gx // res
+        cz = gz // res
+
+        heights = np.empty(gx.shape)
+        loaded = np.zeros(gx.shape, dtype=bool)
+        if self.chunks and gx.size:
+            min_x = cx.min()
+            min_z = cz.min()
+            span_x = int(cx.max() - min_x) + 1
+            span = int(cz.max() - min_z) + 1
+            if span_x * span <= DENSE_CHUNK_SPAN:
+                # Few chunks touched: index one stitched lattice directly, which
+                # beats grouping the vertices by chunk. Flat indices gather much
+                # faster than 2D fancy indexing.
+                lattice = self.dense_lattice(int(min_x), int(min_z), span_x, span)
+                return np.take(lattice, (gz - min_z * res) * (span_x * res) + (gx - min_x * res))
+            
+            # Group vertices by chunk using a single integer code per chunk
+            codes, inverse = np.unique((cx - min_x) * span + (cz - min_z), return_inverse=True)
+            inverse = inverse.reshape(gx.shape)
+            for i, code in enumerate(codes.tolist()):
+                key_x = int(min_x) + code // int(span)
+                key_z = int(min_z) + code % int(span)
+                chunk = self.chunks.get((key_x, key_z))
+                if chunk is None:
+                    continue
+                mask = inverse == i
+                heights[mask] = chunk.heights[gz[mask] - key_z * res, gx[mask] - key_x * res]
+                loaded |= mask
+
+        # Anything not resident comes straight from the height source
+        missing = ~loaded
+        if missing.any():
+            heights[missing] = self.height_source(gx[missing], gz[missing])
+        return heights
+
+    def get_height(self, x, z):
+        chunk = self.chunks.get(self.chunk_key(x, z))
+        if chunk is not None:
+            return chunk.get_height(x, z)
+        return self.sample_many([(x, z)])[0]
+
+    def sample_many(self, points, normals=False):
+        """Batched heights (and optionally normals) that work across chunk borders."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        # Convert world coordinates to lattice coordinates
+        grid_x = points[:, 0] / self.cell_size + self.center[0]
+        grid_z = points[:, 1] / self.cell_size + self.center[1]
+        cell_x = np.floor(grid_x).astype(np.int64)
+        cell_z = np.floor(grid_z).astype(np.int64)
+        fx = grid_x - cell_x
+        fz = grid_z - cell_z
+
+        res = self.chunk_resolution
+        if self.chunks and len(points):
+            min_x = int(cell_x.min()) // res
+            min_z = int(cell_z.min()) // res
+            span_x = (int(cell_x.max()) + 1) // res - min_x + 1
+            span = (int(cell_z.max()) + 1) // res - min_z + 1
+            if span_x * span <= DENSE_CHUNK_SPAN:
+                # The corners are fixed offsets from each cell in the stitched lattice
+                lattice = self.dense_lattice(min_x, min_z, span_x, span)
+                width = span_x * res
+                index = (cell_z - min_z * res) * width + (cell_x - min_x * res)
+                h1 = np.take(lattice, index)
+                h2 = np.take(lattice, index + 1)
+                h3 = np.take(lattice, index + width)
+                h4 = np.take(lattice, index + width + 1)
+                return interpolate_cells(h1, h2, h3, h4, fx, fz, self.cell_size, normals)
+
+        # Fetch all four cell corners in one lookup
+        corners_x = np.stack([cell_x, cell_x + 1, cell_x, cell_x + 1])
+        corners_z = np.stack([cell_z, cell_z, cell_z + 1, cell_z + 1])
+        h1, h2, h3, h4 = self.vertex_heights(corners_x, corners_z)
+
+        return interpolate_cells(h1, h2, h3, h4, fx, fz, self.cell_size, normals)
+
+    def select_lod(self, camera_position, frustum=None):
+        # Whole chunks are culled first, then each drawn chunk culls its patches
+        self.drawn_keys = self.visible_keys
+        if frustum is not None and self.visible_keys:
+            bounds = [self.chunks[key].bounds() for key in self.visible_keys]
+            visible = frustum.boxes_visible([low for low, _ in bounds], [high for _, high in bounds],
+                                            'terrain chunks')
+            self.drawn_keys = [key for key, keep in zip(self.visible_keys, visible) if keep]
+
+        # Chunks pick their levels from world positions, so seams between chunks match too
+        self.triangle_count = 0
+        for key in self.drawn_keys:
+            chunk = self.chunks[key]
+            chunk.select_lod(camera_position, frustum)
+            self.triangle_count += chunk.triangle_count
+
+    def render(self):
+        for key in self.drawn_keys:
+            self.chunks[key].render()
+
+    def close(self):
+        # Stop the workers and release every chunk's GPU buffers
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for chunk in self.chunks.values():
+            chunk.delete()
+        self.chunks.clear()
+        self.chunk_bytes.clear()
+        self.cache_bytes = 0
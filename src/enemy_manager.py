@@ -1,15 +1,20 @@
 import os
-import random
 import math
 import pygame
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
-from .model import Model
+from .model_instancer import ModelInstancer, model_transforms
+from .enemy_swarm import EnemySwarm
+from .flow_field import FlowField
+from .mesh_bake import preferred_model_path
+from .asset_manager import assets
 
 class EnemyManager:
-    def __init__(self, terrain):
-        self.enemies = []
+    def __init__(self, terrain, preload=True):
+        self.swarm = EnemySwarm()  # Every enemy's state, in arrays
         self.terrain = terrain
+        self.flow_field = FlowField(terrain)  # Routes to the player, shared by every enemy
         self.score = 0
         self.wave = 1
         self.enemies_per_wave = 3  # Start with 3 enemies, increase each wave
@@ -18,64 +23,77 @@ class EnemyManager:
         self.wave_cleared = True
         self.wave_spawned = False
         
-        # Add damage cooldown tracking
-        self.damage_cooldowns = {}  # Dictionary to track cooldown for each enemy
+        # Damage cooldown per enemy, kept with the enemy's row in swarm.last_hit
         self.damage_cooldown_time = 1.0  # One second between hits from same enemy
         
-        # Load skull model path
-        self.skull_model_path = os.path.join('src', 'assets', 'models', 'skull.obj')
+        # Load skull model path, using the baked mesh when one is up to date
+        self.skull_model_path = preferred_model_path(os.path.join('src', 'assets', 'models', 'skull.obj'))
         
-        # Preload the skull model data to avoid lag when spawning
+        # Preload the skull model data to avoid lag when spawning. Without
+        # preload the game's loader runs load_skull() and finish_skull().
+        self.preloaded_skull = None
+        self.skull_renderer = None
+        if preload:
+            for _ in self.finish_skull(self.load_skull()):
+                pass
+    
+    def load_skull(self):
+        # Parsing and decimation only, so it can run on a loader thread
         print("Preloading skull model...")
-        self.preloaded_skull = Model(self.skull_model_path)
+        model = assets.model(self.skull_model_path, upload=False)
+        if not model.lod_meshes and model.lod_data is None:
+            model.prepare_lods()
+        return model
+    
+    def finish_skull(self, model):
+        # GL uploads on the main thread, one step per loader batch
+        model.upload()
+        yield 0.4
+        # Simplified meshes and a billboard for distant skulls, unless a
+        # previous manager already built them on the cached model
+        if not model.lod_meshes:
+            model.build_lods(impostor=False)
+            yield 0.7
+        model.build_impostor()
+        yield 0.9
+        
+        # All skulls share the preloaded mesh and are drawn in one instanced call
+        self.preloaded_skull = model
+        self.skull_renderer = ModelInstancer(model)
         print("Skull model preloaded")
     
-    def spawn_enemy(self, player_pos):
-        # Determine spawn position (random position around player)
-        angle = random.uniform(0, 2 * math.pi)
-        distance = random.uniform(15, 25)  # Spawn 15-25 units away
-        
-        spawn_x = player_pos[0] + math.sin(angle) * distance
-        spawn_z = player_pos[2] + math.cos(angle) * distance
-        
-        # Get terrain height at spawn position
-        terrain_height = self.terrain.get_height(spawn_x, spawn_z)
-        spawn_y = terrain_height + 1.5  # Spawn slightly above terrain
-        
-        # Create a new skull instance by cloning the preloaded model
-        skull = self.preloaded_skull.clone()
-        skull.id = len(self.enemies)  # Assign unique ID to each enemy
-        
-        # Set position
-        skull.set_position(spawn_x, spawn_y, spawn_z)
-        
-        # Make small scale
-        skull.set_scale(0.05, 0.05, 0.05)
-        
-        # Set collision radius
-        skull.set_collision_radius(1.0)
-        
-        # Set initial rotation (X axis 270 degrees to face upright)
-        skull.set_rotation(270, 0, 0)
-        
-        # Set movement parameters
-        skull.set_speed(1.0)  # Reduced from 1.5 to 1.0
-        
-        # Add to enemies list
-        self.enemies.append(skull)
-        
-        return skull
+    def random_spawn_points(self, player_pos, count):
+        # Determine spawn positions (random positions around player)
+        angles = np.random.uniform(0, 2 * math.pi, count)
+        distances = np.random.uniform(15, 25, count)  # Spawn 15-25 units away
+        
+        points = np.empty((count, 2))
+        points[:, 0] = player_pos[0] + np.sin(angles) * distances
+        points[:, 1] = player_pos[2] + np.cos(angles) * distances
+        return points
+    
+    def spawn_enemy(self, player_pos, spawn_point=None, terrain_height=None, health=100):
+        if spawn_point is None:
+            spawn_point = self.random_spawn_points(player_pos, 1)[0]
+        spawn_x, spawn_z = float(spawn_point[0]), float(spawn_point[1])
+        
+        # Get terrain height at spawn position unless the caller already sampled it
+        if terrain_height is None:
+            terrain_height = self.terrain.get_height(spawn_x, spawn_z)
+        spawn_y = float(terrain_height) + 1.5  # Spawn slightly above terrain
+        
+        # Returns the new enemy's handle (see EnemySwarm.row)
+        handles = self.swarm.spawn([(spawn_x, spawn_y, spawn_z)], health)
+        return int(handles[0]) if len(handles) else None
     
     def spawn_wave(self, player_pos):
-        # Clear any remaining dead enemies from the list
-        self.enemies = [e for e in self.enemies if e.is_alive]
-        
-        # Spawn all enemies for the current wave
-        for i in range(self.enemies_per_wave):
-            skull = self.spawn_enemy(player_pos)
-            # Slightly different health for variety
-            skull.health = random.randint(80, 120)
-            skull.max_health = skull.health
+        # Spawn all enemies for the current wave, sampling the terrain in one batch
+        spawn_points = self.random_spawn_points(player_pos, self.enemies_per_wave)
+        spawn_heights = self.terrain.sample_many(spawn_points)
+        positions = np.column_stack([spawn_points[:, 0], spawn_heights + 1.5, spawn_points[:, 1]])
+        # Slightly different health for variety
+        health = np.random.randint(80, 121, self.enemies_per_wave)
+        self.swarm.spawn(positions, health)
         
         self.wave_spawned = True
         self.wave_cleared = False
@@ -83,7 +101,7 @@ class EnemyManager:
     
     def update(self, delta_time, player):
         # Count active enemies
-        active_enemies = len([e for e in self.enemies if e.is_alive])
+        active_enemies = self.swarm.alive_count()
         
         # Check if wave is cleared
         if active_enemies == 0 and self.wave_spawned:
@@ -102,59 +120,46 @@ class EnemyManager:
             else:
                 self.spawn_cooldown -= delta_time
         
-        # Update all enemies
-        for enemy in self.enemies:
-            if enemy.is_alive:
-                # Set player as target
-                enemy.set_target(player.position)
-                
-                # Update enemy
-                enemy.update(delta_time)
-                
-                # Calculate angle to face player
-                dx = enemy.position[0] - player.position[0]
-                dz = enemy.position[2] - player.position[2]
-                angle = math.degrees(math.atan2(dx, dz))
-                
-                # Apply rotation - keep X at 270 to face upright, Y for tracking player
-                enemy.set_rotation(270, angle, 0)
-                
-                # Adjust Y position based on terrain
-                terrain_height = self.terrain.get_height(enemy.position[0], enemy.position[2])
-                y_pos = terrain_height + 1.0  # Float 1 unit above terrain
-                enemy.position[1] = y_pos
+        # Re-route when the player reaches another lattice vertex, then move,
+        # turn and ground every enemy in one pass over the arrays
+        self.flow_field.update(player.position)
+        self.swarm.update(delta_time, player.position, self.terrain, self.flow_field)
     
     def check_collisions(self, player):
         current_time = pygame.time.get_ticks() / 1000.0
-        
-        for enemy in self.enemies:
-            if not enemy.is_alive:
-                continue
+        swarm = self.swarm
+        
+        # Only the few enemies touching the player are looked at one by one
+        for index in swarm.touching(player.position, 1.5):
+            # Only apply damage if this enemy's cooldown has expired
+            if current_time - swarm.last_hit[index] >= self.damage_cooldown_time:
+                # Apply damage and update cooldown
+                if player.take_damage(5):  # 5 damage per hit
+                    print(f"Player took damage! Health: {player.health}")
                 
-            if player.check_collision(enemy, collision_distance=1.5):
-                # Check if this enemy is on cooldown
-                enemy_id = enemy.id
-                last_hit_time = self.damage_cooldowns.get(enemy_id, 0)
-                
-                # Only apply damage if cooldown has expired
-                if current_time - last_hit_time >= self.damage_cooldown_time:
-                    # Apply damage and update cooldown
-                    if player.take_damage(5):  # 5 damage per hit
-                        print(f"Player took damage! Health: {player.health}")
-                    
-                    # Record time of this hit
-                    self.damage_cooldowns[enemy_id] = current_time
+                # Record time of this hit
+                swarm.last_hit[index] = current_time
     
-    def handle_bullet_hit(self, enemy):
-        # When enemy is defeated by bullet
-        if not enemy.is_alive:
+    def handle_kills(self, kills):
+        # When enemies are defeated by bullets
+        for _ in range(kills):
             self.score += 1
             print(f"Enemy defeated! Score: {self.score}")
     
-    def render(self):
+    def render(self, camera_position=None, frustum=None):
         # Only render the enemies themselves, no health bars
-        for enemy in self.enemies:
-            enemy.render()
+        swarm = self.swarm
+        # Nothing to draw with if the skull model failed to load
+        if not len(swarm) or self.skull_renderer is None:
+            return
+        basis = model_transforms(swarm.rotations(), np.full((len(swarm), 3), swarm.scale))
+        tints = self.skull_renderer.instance_tints(swarm.flash > 0)
+        swarm.lod_level[:] = self.skull_renderer.render(
+            swarm.position, basis, tints, swarm.lod_level, camera_position, frustum)
+    
+    def active_count(self):
+        return self.swarm.alive_count()
     
-    def get_active_enemies(self):
-        return [e for e in self.enemies if e.is_alive]
\ No newline at end of file
+    def close(self):
+        # Stop the flow field's worker
+        self.flow_field.close()
@@ -0,0 +1,258 @@
+import numpy as np
+from .spatial_grid import SpatialGrid
+
+# Enemy state as parallel NumPy arrays, one row per enemy.
+#
+# Cloning a Model per enemy and updating each with Python attribute access
+# costs microseconds per enemy per frame, which caps a wave at a few
+# hundred. Here every field lives in its own contiguous array, so seeking,
+# facing the player and snapping to the terrain are a handful of array
+# operations for the whole wave. Model is only the shared mesh that
+# ModelInstancer draws at these positions.
+#
+# The arrays are a fixed-capacity pool allocated once. Live enemies are
+# packed into the first count rows: a killed enemy's row is filled with
+# the last live row straight away, so every array operation covers live
+# enemies only, and spawning and killing allocate nothing. Since rows
+# move, each enemy also owns a slot that does not, and a handle packs the
+# slot with the slot's generation, which is bumped whenever the slot is
+# freed, so a handle to a dead enemy never finds the one that reused it.
+#
+# Collision queries (bullets, player contact and enemies keeping apart)
+# go through a SpatialGrid rebuilt at the end of every update. Given a
+# FlowField, enemies follow it around steep ground rather than heading
+# straight for the target.
+
+SLOT_BITS = 24  # Low handle bits hold the slot, the rest its generation
+SEPARATION_RATE = 10.0  # How quickly overlapping enemies are pushed apart, per second
+SEPARATION_BUDGET = 256  # Most enemies whose neighbours are looked at per update
+
+class EnemySwarm:
+    # Per-enemy arrays, moved together when rows are compacted
+    FIELDS = ('position', 'speed', 'health', 'max_health', 'flash', 'yaw', 'lod_level', 'last_hit', 'slot')
+
+    def __init__(self, capacity=16384, scale=0.05, collision_radius=1.0, pitch=270.0, hover=1.0, separation=1.0):
+        self.capacity = capacity
+        self.count = 0  # Live enemies, in rows 0 to count - 1
+        self.pool = {
+            'position': np.zeros((capacity, 3)),
+            'speed': np.zeros(capacity),
+            'health': np.zeros(capacity),
+            'max_health': np.zeros(capacity),
+            'flash': np.zeros(capacity),  # Seconds of hit flash left
+            'yaw': np.zeros(capacity),  # Degrees about Y, facing the target
+            'lod_level': np.zeros(capacity, dtype=np.int64),  # Detail level drawn last frame
+            'last_hit': np.zeros(capacity),  # Time this enemy last hurt the player
+            'slot': np.zeros(capacity, dtype=np.int64),  # Slot owning each row
+        }
+
+        # Slot bookkeeping: where each slot's enemy lives and which slots are free
+        self.slot_row = np.full(capacity, -1, dtype=np.int64)
+        self.generation = np.zeros(capacity, dtype=np.int64)
+        self.free_slots = np.arange(capacity - 1, -1, -1, dtype=np.int64)  # Stack, lowest slot on top
+        self.free_count = capacity
+
+        # Shared by every enemy since they all use the same mesh
+        self.scale = scale
+        self.collision_radius = collision_radius
+        self.pitch = pitch  # X rotation that stands the skull upright
+        self.hover = hover  # Height kept above the terrain
+        self.separation = separation  # Distance enemies keep between their centers
+
+        self.grid = SpatialGrid(cell_size=max(separation, 1.0), max_per_cell=4)
+        self.grid_stale = False  # Enemies spawned since the grid was built
+        self.separation_cursor = 0  # First row separate() looks at next
+
+        self.refresh_views()
+
+    def refresh_views(self):
+        # Expose each field as a view of its live rows, e.g. self.position
+        for field in self.FIELDS:
+            setattr(self, field, self.pool[field][:self.count])
+
+    def __len__(self):
+        return self.count
+
+    def alive_count(self):
+        return self.count
+
+    def spawn(self, positions, health, speed=1.0):
+        """Add enemies at positions (N, 3) with the given health (scalar or (N,)).
+
+        Returns their handles. When the pool is full the extra enemies are
+        not spawned.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        count = min(len(positions), self.free_count)
+        if count < len(positions):
+            print(f"Enemy pool full, spawning {count} of {len(positions)} enemies")
+
+        start, end = self.count, self.count + count
+        slots = self.free_slots[self.free_count - count:self.free_count][::-1]
+        self.free_count -= count
+
+        pool = self.pool
+        pool['position'][start:end] = positions[:count]
+        pool['speed'][start:end] = speed
+        pool['health'][start:end] = np.broadcast_to(health, (len(positions),))[:count]
+        pool['max_health'][start:end] = pool['health'][start:end]
+        pool['flash'][start:end] = 0.0
+        pool['yaw'][start:end] = 0.0
+        pool['lod_level'][start:end] = 0
+        pool['last_hit'][start:end] = -np.inf
+        pool['slot'][start:end] = slots
+        self.slot_row[slots] = np.arange(start, end)
+
+        self.count = end
+        self.refresh_views()
+        self.grid_stale = True
+        return (self.generation[slots] << SLOT_BITS) | slots
+
+    def remove(self, row):
+        """Free a live enemy's row and slot, moving the last live row into the gap."""
+        slot = self.pool['slot'][row]
+        last = self.count - 1
+        if row != last:
+            for field in self.FIELDS:
+                array = self.pool[field]
+                array[row] = array[last]
+            self.slot_row[self.pool['slot'][row]] = row
+
+        self.grid.remove(row, moved_from=last)
+        self.slot_row[slot] = -1
+        self.generation[slot] += 1
+        self.free_slots[self.free_count] = slot
+        self.free_count += 1
+        self.count = last
+        self.refresh_views()
+
+    def clear(self):
+        while self.count:
+            self.remove(self.count - 1)
+
+    def refresh_grid(self):
+        if self.grid_stale:
+            self.grid.build(self.pool['position'], self.count)
+            self.grid_stale = False
+
+    def row(self, handle):
+        """Current row of the enemy a handle refers to, or -1 once it has died."""
+        slot = int(handle) & ((1 << SLOT_BITS) - 1)
+        if slot >= self.capacity or self.generation[slot] != int(handle) >> SLOT_BITS:
+            return -1
+        return int(self.slot_row[slot])
+
+    def handles(self, rows):
+        slots = self.pool['slot'][rows]
+        return (self.generation[slots] << SLOT_BITS) | slots
+
+    def update(self, delta_time, target, terrain, flow=None):
+        """Move every enemy toward target, face it and keep it above the terrain.
+
+        With a FlowField solved for target, enemies steer along it and only
+        head straight for target where the field does not reach.
+        """
+        if not self.count:
+            return
+        np.subtract(self.flash, delta_time, out=self.flash)
+        np.maximum(self.flash, 0.0, out=self.flash)
+
+        position = self.position
+        dx = target[0] - position[:, 0]
+        dz = target[2] - position[:, 2]
+        distance = np.hypot(dx, dz)
+        if flow is not None:
+            # Scaled to the distance left so the step below stays the same length
+            steer_x, steer_z, steered = flow.sample(position[:, 0], position[:, 2])
+            dx = np.where(steered, steer_x * distance, dx)
+            dz = np.where(steered, steer_z * distance, dz)
+
+        # Step toward the target without overshooting; the threshold stops jitter once there
+        step = np.minimum(self.speed * delta_time, distance) / np.maximum(distance, 0.1)
+        step[distance <= 0.1] = 0.0
+        position[:, 0] += dx * step
+        position[:, 2] += dz * step
+        self.separate(delta_time)
+
+        # Face the target
+        np.degrees(np.arctan2(position[:, 0] - target[0], position[:, 2] - target[2]), out=self.yaw)
+
+        # Float above the terrain, sampled for all enemies at once
+        position[:, 1] = terrain.sample_many(position[:, [0, 2]]) + self.hover
+
+        self.grid.build(self.pool['position'], self.count)
+        self.grid_stale = False
+
+    def separate(self, delta_time):
+        # Push apart enemies closer than the separation distance, half the overlap
+        # each, eased in over a few frames. Uses last update's grid; enemies move
+        # too little per frame for that to matter. Large swarms are done
+        # SEPARATION_BUDGET rows per update, in turn, each push covering the
+        # updates since those rows were last looked at.
+        self.refresh_grid()
+        passes = -(-self.count // SEPARATION_BUDGET)
+        if passes > 1:
+            start = self.separation_cursor % self.count
+            self.separation_cursor = start + SEPARATION_BUDGET
+            i, j = self.grid.pairs(self.separation, (start + np.arange(SEPARATION_BUDGET)) % self.count)
+        else:
+            i, j = self.grid.pairs(self.separation)
+        if not len(i):
+            return
+        position = self.position
+        x = position[:, 0].copy()
+        z = position[:, 2].copy()
+        dx = x[i] - x[j]
+        dz = z[i] - z[j]
+        distance = np.hypot(dx, dz)
+        overlap = self.separation - np.minimum(distance, self.separation)
+
+        # Enemies on the same spot get a unit direction from their rows, so they still part
+        stacked = distance < 1e-6
+        if stacked.any():
+            angle = (i[stacked] - j[stacked]) * 2.39996  # Golden angle spreads them evenly
+            dx[stacked] = np.cos(angle)
+            dz[stacked] = np.sin(angle)
+            distance[stacked] = 1.0
+
+        push = overlap / distance
+        push *= 0.5 * min(1.0, SEPARATION_RATE * delta_time * passes)
+        rows = np.concatenate([i, j])
+        position[:, 0] += np.bincount(rows, weights=np.concatenate([dx * push, -dx * push]), minlength=self.count)
+        position[:, 2] += np.bincount(rows, weights=np.concatenate([dz * push, -dz * push]), minlength=self.count)
+
+    def segment_hits(self, starts, ends, radii):
+        """Enemies touched by spheres moving from starts to ends, as (segment, handle, t) arrays.
+
+        Sorted by segment and then along it, nearest first; t is the
+        fraction of the way along the segment. Handles stay valid while
+        earlier hits kill enemies and move rows around.
+        """
+        self.refresh_grid()
+        segments, rows, t = self.grid.query_segments(starts, ends, self.collision_radius + np.asarray(radii))
+        return segments, self.handles(rows), t
+
+    def touching(self, point, distance):
+        """Rows of enemies within distance of point horizontally."""
+        self.refresh_grid()
+        return self.grid.query_radius(point, distance)
+
+    def take_damage(self, row, amount):
+        """Damage one enemy; returns True if this killed it, which frees its row."""
+        self.health[row] -= amount
+        self.flash[row] = 0.3  # Flash for 0.3 seconds
+
+        print(f"Enemy took {amount} damage! Health: {max(self.health[row], 0):.0f}/{self.max_health[row]:.0f}")
+
+        if self.health[row] <= 0:
+            self.remove(row)
+            print("Enemy defeated!")
+            return True
+        return False
+
+    def rotations(self):
+        """(N, 3) glRotate angles for every enemy: upright, turned to face the target."""
+        rotations = np.zeros((self.count, 3))
+        rotations[:, 0] = self.pitch
+        rotations[:, 1] = self.yaw
+        return rotations
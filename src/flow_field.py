@@ -0,0 +1,179 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Flow field leading every enemy to the player over the terrain.
+#
+# Seeking in a straight line walks enemies up cliffs, and giving each one
+# its own path search would cost a search per enemy. Instead one field is
+# solved per player position: over a square window of terrain lattice
+# vertices centered on the player's vertex, the cheapest cost to reach the
+# player is found from every vertex, with steps charged by distance plus
+# a penalty for the slope they climb and steps steeper than MAX_SLOPE not
+# allowed at all. Every vertex then stores the direction that descends
+# that cost fastest, so an enemy steers with one lookup of the vertex
+# nearest to it, whatever the number of enemies.
+#
+# The cost is relaxed over all vertices at once with array shifts (a
+# Bellman-Ford pass per iteration, until nothing changes) instead of a
+# priority queue, which keeps it in NumPy. A field is only solved when
+# the player reaches another vertex or the terrain changes, and on a
+# worker thread from a snapshot of the heights; until it finishes enemies
+# keep following the previous field.
+
+# Lattice steps to the eight neighbours, as (x, z)
+NEIGHBOUR_OFFSETS = ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+UPHILL_COST = 4.0  # Extra cost per unit climbed, relative to one unit walked
+DOWNHILL_COST = 1.0  # Extra cost per unit descended
+MAX_SLOPE = 2.0  # Rise over run of the steepest step enemies can take
+
+def solve_flow(heights, cell_size):
+    """Cost to reach the center vertex of an (N, N) height window, and the way down it.
+
+    Returns (cost, direction_x, direction_z) as (N, N) arrays; cost is
+    inf where the center cannot be reached and the direction is zero
+    there and at the center itself.
+    """
+    size = len(heights)
+    center = size // 2
+    padded = np.pad(heights, 1, constant_values=np.nan)
+
+    # Cost of the step from every vertex to each of its neighbours
+    edges = []
+    for offset_x, offset_z in NEIGHBOUR_OFFSETS:
+        run = cell_size * math.hypot(offset_x, offset_z)
+        rise = padded[1 + offset_z:1 + offset_z + size, 1 + offset_x:1 + offset_x + size] - heights
+        with np.errstate(invalid='ignore'):
+            edge = run + UPHILL_COST * np.maximum(rise, 0.0) - DOWNHILL_COST * np.minimum(rise, 0.0)
+            edge[~(np.abs(rise) <= MAX_SLOPE * run)] = np.inf  # Too steep, or off the window
+        edges.append(edge)
+
+    # A diagonal step is only allowed when both straight steps beside it
+    # are, so routes do not cut the corners of walls
+    for index, (offset_x, offset_z) in enumerate(NEIGHBOUR_OFFSETS):
+        if offset_x and offset_z:
+            beside = (NEIGHBOUR_OFFSETS.index((offset_x, 0)), NEIGHBOUR_OFFSETS.index((0, offset_z)))
+            edges[index] = np.where(np.isinf(edges[beside[0]]) | np.isinf(edges[beside[1]]), np.inf, edges[index])
+
+    # Relax every vertex against its neighbours until the costs settle; each
+    # pass extends the settled region by one step
+    total = np.full((size + 2, size + 2), np.inf)
+    cost = total[1:-1, 1:-1]
+    cost[center, center] = 0.0
+    best = np.empty((size, size))
+    for _ in range(4 * size):
+        best.fill(np.inf)
+        for (offset_x, offset_z), edge in zip(NEIGHBOUR_OFFSETS, edges):
+            np.minimum(best, edge + total[1 + offset_z:1 + offset_z + size, 1 + offset_x:1 + offset_x + size], out=best)
+        improved = best < cost
+        if not improved.any():
+            break
+        cost[improved] = best[improved]
+
+    # Head down the cost gradient, which gives smooth headings in open
+    # ground. Next to steep steps the gradient can point into them (and
+    # is undefined beside unreachable vertices), so there step toward the
+    # cheapest neighbour instead.
+    with np.errstate(invalid='ignore'):
+        gradient_z, gradient_x = np.gradient(cost)
+        direction_x = -gradient_x
+        direction_z = -gradient_z
+        length = np.hypot(direction_x, direction_z)
+        smooth = np.isfinite(length) & (length > 1e-9) & np.isfinite(sum(edges))
+
+        choice = np.argmin([edge + total[1 + offset_z:1 + offset_z + size, 1 + offset_x:1 + offset_x + size]
+                            for (offset_x, offset_z), edge in zip(NEIGHBOUR_OFFSETS, edges)], axis=0)
+        offsets = np.array(NEIGHBOUR_OFFSETS, dtype=np.float64)
+        offsets /= np.hypot(offsets[:, 0], offsets[:, 1])[:, np.newaxis]
+        direction_x = np.where(smooth, direction_x / np.where(smooth, length, 1.0), offsets[choice, 0])
+        direction_z = np.where(smooth, direction_z / np.where(smooth, length, 1.0), offsets[choice, 1])
+
+    stopped = ~np.isfinite(cost)
+    stopped[center, center] = True
+    direction_x[stopped] = 0.0
+    direction_z[stopped] = 0.0
+    return cost, direction_x, direction_z
+
+class FlowField:
+    """Directions toward a target over terrain (anything with cell_size,
+    grid_origin, vertex_heights and height_version, i.e. Terrain and
+    ChunkedTerrain), within radius of it.
+    """
+
+    def __init__(self, terrain, radius=48.0, threaded=True):
+        self.terrain = terrain
+        self.cell_size = terrain.cell_size
+        self.reach = int(math.ceil(radius / self.cell_size))  # Lattice steps from the target to the window edge
+        self.size = 2 * self.reach + 1
+        self.key = None  # (target vertex, height version) of the newest field asked for
+        self.corner = None  # Lattice vertex of the current field's window[0, 0], None before the first field
+        # Flat (size * size,) unit directions of the current field, contiguous for np.take
+        self.direction_x = np.zeros(0)
+        self.direction_z = np.zeros(0)
+        self.cost = np.zeros((0, 0))
+        self.pending = None  # (corner, Future) of the field being solved
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='flow field') if threaded else None
+
+    def vertex_of(self, x, z):
+        """Nearest lattice vertex to world (x, z), as integer arrays."""
+        origin_x, origin_z = self.terrain.grid_origin
+        return (np.rint((np.asarray(x) - origin_x) / self.cell_size).astype(np.int64),
+                np.rint((np.asarray(z) - origin_z) / self.cell_size).astype(np.int64))
+
+    def update(self, target):
+        """Start solving for target's vertex if it or the terrain changed, and take finished fields."""
+        if self.pending is not None:
+            if not self.pending[1].done():
+                return
+            corner, future = self.pending
+            self.pending = None
+            try:
+                self.install(corner, future.result())
+            except Exception as e:
+                print(f"Error solving flow field: {e}")
+
+        goal_x, goal_z = self.vertex_of(target[0], target[2])
+        key = (int(goal_x), int(goal_z), self.terrain.height_version)
+        if key == self.key:
+            return
+        self.key = key
+
+        # Heights are read here, on the thread that owns the terrain
+        corner = (key[0] - self.reach, key[1] - self.reach)
+        lattice_x, lattice_z = np.meshgrid(corner[0] + np.arange(self.size), corner[1] + np.arange(self.size))
+        heights = np.asarray(self.terrain.vertex_heights(lattice_x, lattice_z), dtype=np.float64)
+        if self.executor is None:
+            self.install(corner, solve_flow(heights, self.cell_size))
+        else:
+            self.pending = (corner, self.executor.submit(solve_flow, heights, self.cell_size))
+
+    def install(self, corner, field):
+        cost, direction_x, direction_z = field
+        self.corner = corner
+        self.cost = cost
+        self.direction_x = direction_x.ravel()
+        self.direction_z = direction_z.ravel()
+
+    def sample(self, x, z):
+        """Unit direction to follow at world points x, z (arrays), one lookup each.
+
+        Returns (direction_x, direction_z, steered); steered is False
+        outside the field, where the target cannot be reached and at the
+        target's own vertex, and the direction is zero there.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if self.corner is None:
+            zero = np.zeros(x.shape)
+            return zero, zero, np.zeros(x.shape, dtype=bool)
+        vertex_x, vertex_z = self.vertex_of(x, z)
+        vertex_x -= self.corner[0]
+        vertex_z -= self.corner[1]
+        inside = (vertex_x >= 0) & (vertex_x < self.size) & (vertex_z >= 0) & (vertex_z < self.size)
+        index = np.where(inside, vertex_z * self.size + vertex_x, 0)
+        direction_x = np.where(inside, np.take(self.direction_x, index), 0.0)
+        direction_z = np.where(inside, np.take(self.direction_z, index), 0.0)
+        return direction_x, direction_z, (direction_x != 0.0) | (direction_z != 0.0)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
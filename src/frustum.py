@@ -0,0 +1,96 @@
+import numpy as np
+from OpenGL.GL import *
+
+# View-frustum culling.
+#
+# The planes are taken once per frame from the projection and modelview
+# matrices (Gribb and Hartmann's row extraction), plus a far plane at
+# GL_FOG_END since anything past it is drawn in flat fog colour anyway.
+# Tests are vectorized over whole arrays of bounding spheres or boxes, and
+# every test records how many objects it kept and culled for the frame.
+# An optional HorizonOcclusion is applied to whatever passes the planes.
+
+class Frustum:
+    def __init__(self, occlusion=None):
+        self.planes = None  # (P, 4) world-space planes, inside where n . p + d >= 0
+        self.occlusion = occlusion  # Updated by its owner before the tests run
+        self.counts = {}  # Name -> [visible, culled, of which occluded] this frame
+
+    def update(self, projection=None, modelview=None, fog_end=None):
+        """Rebuild the planes, by default from the current GL matrices and fog.
+
+        Call right after the camera transform is applied, so the modelview
+        matrix is the view matrix.
+        """
+        if projection is None:
+            projection = np.array(glGetFloatv(GL_PROJECTION_MATRIX), dtype=np.float64).reshape(4, 4).T
+        if modelview is None:
+            modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX), dtype=np.float64).reshape(4, 4).T
+        if fog_end is None and glIsEnabled(GL_FOG):
+            fog_end = float(glGetFloatv(GL_FOG_END))
+
+        # Eye-space planes from the projection rows: left, right, bottom, top, near, far
+        rows = np.asarray(projection, dtype=np.float64)
+        planes = [rows[3] + rows[0], rows[3] - rows[0], rows[3] + rows[1],
+                  rows[3] - rows[1], rows[3] + rows[2], rows[3] - rows[2]]
+        if fog_end is not None:
+            # Eye depth -z no further than the fog end
+            planes.append(np.array([0.0, 0.0, 1.0, fog_end]))
+
+        # A plane transforms to world space as a row vector times the view matrix
+        planes = np.array(planes) @ np.asarray(modelview, dtype=np.float64)
+        planes /= np.maximum(np.linalg.norm(planes[:, :3], axis=1, keepdims=True), 1e-12)
+        self.planes = planes
+        self.counts = {}
+
+    def record(self, name, visible, occluded=0):
+        counts = self.counts.setdefault(name, [0, 0, 0])
+        kept = int(np.count_nonzero(visible))
+        counts[0] += kept
+        counts[1] += len(visible) - kept
+        counts[2] += occluded
+        return visible
+
+    def finish(self, name, visible, centers, radii, tops):
+        # Run what survived the planes through the occlusion test, then count
+        occluded = 0
+        if self.occlusion is not None and visible.any():
+            hidden = self.occlusion.occluded(centers[visible], radii[visible], tops[visible])
+            occluded = int(np.count_nonzero(hidden))
+            visible[np.flatnonzero(visible)[hidden]] = False
+        return self.record(name, visible, occluded) if name else visible
+
+    def spheres_visible(self, centers, radii, name=None):
+        """Mask of the (N, 3) spheres that are at least partly inside."""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        if self.planes is None:
+            return np.ones(len(centers), dtype=bool)
+
+        distances = centers @ self.planes[:, :3].T + self.planes[:, 3]
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), len(centers))
+        visible = (distances >= -radii[:, np.newaxis]).all(axis=1)
+        return self.finish(name, visible, centers, radii, centers[:, 1] + radii)
+
+    def boxes_visible(self, mins, maxs, name=None):
+        """Mask of the axis-aligned (N, 3) min/max boxes that are at least partly inside.
+
+        Conservative: a box that straddles two planes outside a corner of
+        the frustum is kept.
+        """
+        mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        if self.planes is None:
+            return np.ones(len(mins), dtype=bool)
+
+        # Per plane, the box corner furthest along its normal
+        normals = self.planes[:, :3]
+        furthest = np.where(normals[np.newaxis, :, :] >= 0, maxs[:, np.newaxis, :], mins[:, np.newaxis, :])
+        distances = (furthest * normals).sum(axis=2) + self.planes[:, 3]
+        visible = (distances >= 0).all(axis=1)
+        extent = (maxs - mins) / 2
+        return self.finish(name, visible, mins + extent, np.hypot(extent[:, 0], extent[:, 2]), maxs[:, 1])
+
+    def report(self):
+        """One line of this frame's counts, e.g. 'models 3/10 (2 occluded)' (visible/total)."""
+        return '  '.join(f"{name} {visible}/{visible + culled}" + (f" ({occluded} occluded)" if occluded else '')
+                         for name, (visible, culled, occluded) in self.counts.items())
@@ -1,31 +1,53 @@
 import pygame
-import os
 import math
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from .player import Player
 from .skybox import Skybox
 from .crosshair import Crosshair
-from .terrain import Terrain
+from .chunked_terrain import ChunkedTerrain
+from .heightmap_source import load_heightmap
+from .terrain_cache import TERRAIN_CACHE_DIR
+from .scatter import Scatter
 from .bullet import BulletManager
 from .hud import HUD
 from .enemy_manager import EnemyManager
+from .frustum import Frustum
+from .occlusion import HorizonOcclusion
+from .asset_manager import assets
 
 class Game:
-    def __init__(self, display_size):
+    def __init__(self, display_size, heightmap_path=None, loader=None):
+        """Set up the game; with a Loader the terrain, skull model and sounds
+        load in the background and the game is playable once loader.done."""
         self.display_size = display_size
-        self.terrain = Terrain(size=100, resolution=50)
         self.player = Player()
+        
+        # Streamed terrain; build the chunks around the spawn point up front.
+        # An external heightmap replaces the procedural noise if one is given.
+        # Generated chunks are cached on disk, next to the model and heightmap caches.
+        height_source = load_heightmap(heightmap_path) if heightmap_path else None
+        self.terrain = ChunkedTerrain(height_source=height_source, cache_dir=TERRAIN_CACHE_DIR)
+        if loader is None:
+            self.terrain.load_around(self.player.position)
         self.player.set_terrain(self.terrain)
+        
+        # Instanced trees, rocks and grass placed per terrain chunk; when
+        # loading in the background they wait for the shader warm-up
+        self.scatter = Scatter(self.terrain) if loader is None else None
         self.skybox = Skybox()
         self.crosshair = Crosshair(display_size)
         self.hud = HUD(display_size)
         
+        # View frustum and terrain horizon, rebuilt every frame for culling
+        self.occlusion = HorizonOcclusion(self.terrain)
+        self.frustum = Frustum(self.occlusion)
+        
         # Bullet system
-        self.bullet_manager = BulletManager()
+        self.bullet_manager = BulletManager(self.terrain)
         
         # Enemy manager for handling waves of skulls
-        self.enemy_manager = EnemyManager(self.terrain)
+        self.enemy_manager = EnemyManager(self.terrain, preload=loader is None)
         
         # Set up clear color - sky blue
         glClearColor(0.5, 0.7, 1.0, 1.0)
@@ -40,12 +62,36 @@ class Game:
         # Set up basic lighting
         self.setup_lighting()
         
-        # Initialize sound system
+        # Start sound and music
+        self.init_sounds()
+        
+        if loader is None:
+            self.player.weapon.load_sounds()
+        else:
+            loader.add('shaders', finish=self.warm_shaders)
+            loader.add('terrain', finish=self.stream_terrain, weight=3.0)
+            loader.add('skull model', self.enemy_manager.load_skull, self.enemy_manager.finish_skull, weight=2.0)
+            loader.add('sounds', self.player.weapon.load_sounds)
+    
+    def warm_shaders(self):
+        # Compile every registered program during loading rather than on first use.
+        # Scatter is built even if warming fails, since it copes with a
+        # missing program and the game starts once this task is done.
         try:
-            pygame.mixer.init()
-            self.init_sounds()
-        except Exception as e:
-            print(f"Could not initialize sound system: {e}")
+            yield from assets.warm_shaders()
+        finally:
+            self.scatter = Scatter(self.terrain)
+    
+    def stream_terrain(self):
+        # Let the chunk streamer generate the spawn area on its workers and
+        # upload a couple of chunks per frame until all of it is in
+        position = self.player.position
+        while True:
+            self.terrain.update(position)
+            progress = self.terrain.load_progress(position)
+            if progress >= 1.0:
+                return
+            yield progress
         
     def setup_fog(self):
         # Add fog to create depth perception
@@ -90,6 +136,9 @@ class Game:
                     print("R KEY PRESSED - DIRECT FROM MAIN")
                     if hasattr(self.player, 'weapon'):
                         self.player.weapon.start_reload()
+                elif event.key == pygame.K_F3:
+                    # Toggle the culling statistics overlay
+                    self.hud.show_stats = not self.hud.show_stats
         
     def update(self):
         # Calculate delta time
@@ -137,6 +186,9 @@ class Game:
         # Update player
         self.player.update(delta_time)
         
+        # Stream terrain chunks around the player
+        self.terrain.update(self.player.position)
+        
         # Update enemies
         self.enemy_manager.update(delta_time, self.player)
         
@@ -144,13 +196,10 @@ class Game:
         self.enemy_manager.check_collisions(self.player)
         
         # Update bullets
-        active_enemies = self.enemy_manager.get_active_enemies()
-        self.bullet_manager.update(delta_time, active_enemies)
+        kills = self.bullet_manager.update(delta_time, self.enemy_manager.swarm)
         
-        # Check for bullet hits and handle scoring
-        for enemy in active_enemies:
-            if not enemy.is_alive:
-                self.enemy_manager.handle_bullet_hit(enemy)
+        # Handle scoring for enemies the bullets killed
+        self.enemy_manager.handle_kills(kills)
         
         # Check game over conditions
         if not self.player.is_alive:
@@ -194,15 +243,26 @@ class Game:
         
         # Apply player's view
         self.player.apply_view()
+        self.occlusion.update(self.player.camera_position())
+        self.frustum.update()
+        
+        # Choose terrain detail and visible chunks for this frame's camera
+        self.terrain.select_lod(self.player.camera_position(), self.frustum)
+        if self.scatter is not None:
+            self.scatter.update(self.player.camera_position(), self.frustum)
         
         # Render terrain
         self.terrain.render()
         
+        # Render vegetation and rocks
+        if self.scatter is not None:
+            self.scatter.render()
+        
         # Render enemies
-        self.enemy_manager.render()
+        self.enemy_manager.render(self.player.camera_position(), self.frustum)
         
         # Render bullets
-        self.bullet_manager.render()
+        self.bullet_manager.render(self.frustum)
         
         glPopMatrix()
         
@@ -210,7 +270,7 @@ class Game:
         self.crosshair.render()
         
         # Render HUD
-        self.hud.render(self.player, self.enemy_manager)
+        self.hud.render(self.player, self.enemy_manager, self.frustum)
         
         # If game over, draw game over screen
         if self.game_over:
@@ -267,32 +327,20 @@ class Game:
     
     def init_sounds(self):
         """Initialize and load sound effects and music"""
-        try:
-            # Set up background music
-            self.music_path = os.path.join('assets', 'sound', 'music.mp3')
-            
-            # Check if the music file exists
-            if os.path.exists(self.music_path):
-                print(f"Loading music from: {self.music_path}")
-                pygame.mixer.music.load(self.music_path)
-                pygame.mixer.music.set_volume(0.3)  # 50% volume
-                pygame.mixer.music.play(-1)  # -1 means loop indefinitely
-                print("Background music started")
-            else:
-                print(f"Warning: Music file not found at {self.music_path}")
-            
-            # We could also load other sound effects here
-            # self.sound_shot = pygame.mixer.Sound(os.path.join('assets', 'sound', 'shot.wav'))
-            # self.sound_hit = pygame.mixer.Sound(os.path.join('assets', 'sound', 'hit.wav'))
-            # etc.
+        # Background music; a no-op if the menu already started it
+        assets.play_music()
         
-        except Exception as e:
-            print(f"Error loading sounds: {e}")
+        # We could also load other sound effects here
+        # self.sound_hit = assets.sound(os.path.join('src', 'assets', 'sound', 'hit.wav'))
+        # etc.
 
     def cleanup(self):
         """Stop music and release resources when game is exiting"""
-        try:
-            pygame.mixer.music.stop()
-            print("Background music stopped")
-        except:
-            pass
\ No newline at end of file
+        assets.stop_music()
+        print("Background music stopped")
+        
+        # Stop terrain and flow field workers and free chunk buffers
+        self.enemy_manager.close()
+        if self.scatter is not None:
+            self.scatter.delete()
+        self.terrain.close()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import hashlib
+import numpy as np
+import pygame
+
+# Pillow is optional; it is the only way to read 16-bit PNGs at full precision
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+class HeightmapSource:
+    """Height source backed by a memory-mapped 16-bit heightmap.
+
+    Plug it into ChunkedTerrain (or a Terrain patch) instead of the
+    procedural noise. One heightmap pixel becomes one lattice vertex, and
+    the map is centred on the world origin. Lookups index the memory map
+    directly, so only the pages under the chunks being generated and the
+    points being queried are ever read. Opening the map read-only lets
+    several processes on one host share the same page cache.
+    """
+
+    def __init__(self, data, height_range=40.0, height_offset=0.0, path=None):
+        self.data = data  # (rows, columns) uint16, usually an np.memmap
+        self.height_scale = height_range / 65535.0
+        self.height_offset = height_offset
+        self.path = path
+
+        rows, columns = data.shape
+        self.center = ((columns - 1) / 2, (rows - 1) / 2)
+
+    @classmethod
+    def from_raw(cls, path, width=None, height=None, byteorder='<', **kwargs):
+        """Map a headerless 16-bit raw file (e.g. .r16). Square if no size is given.
+
+        A missing dimension is derived from the file size. Raises ValueError
+        if the file is not exactly width * height samples.
+        """
+        size = os.path.getsize(path)
+        samples = size // 2
+        if width is None and height is None:
+            width = height = int(round(samples ** 0.5))
+        elif width is None:
+            width = samples // height if height > 0 else 0
+        elif height is None:
+            height = samples // width if width > 0 else 0
+        if width <= 0 or height <= 0 or width * height * 2 != size:
+            raise ValueError(f"Heightmap {path} is {size} bytes, which is not a {width}x{height} "
+                             f"16-bit map ({width * height * 2} bytes); pass its width and height")
+        data = np.memmap(path, dtype=np.dtype(byteorder + 'u2'), mode='r', shape=(height, width))
+        return cls(data, path=path, **kwargs)
+
+    @classmethod
+    def from_png(cls, path, cache_dir=os.path.join('.cache', 'heightmaps'), **kwargs):
+        """Decode a PNG once into a raw .npy sidecar, then memory-map that."""
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{digest[:16]}.npy")
+
+        if not os.path.exists(cache_path):
+            pixels = cls.decode_png(path)
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = cache_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                np.save(f, pixels)
+            os.replace(temp_path, cache_path)
+            print(f"Converted heightmap {path} -> {cache_path}")
+
+        data = np.load(cache_path, mmap_mode='r')
+        return cls(data, path=path, **kwargs)
+
+    @staticmethod
+    def decode_png(path):
+        # Returns a (rows, columns) uint16 array
+        if Image is not None:
+            with Image.open(path) as image:
+                pixels = np.array(image)
+            if pixels.ndim == 3:
+                pixels = pixels[..., 0]
+            if pixels.dtype == np.uint8:
+                return pixels.astype(np.uint16) * 257
+            return np.clip(pixels, 0, 65535).astype(np.uint16)
+
+        # pygame only decodes 8 bits per channel
+        print("Pillow not installed; reading heightmap PNG at 8-bit precision")
+        surface = pygame.image.load(path)
+        pixels = pygame.surfarray.array_red(surface).T
+        return pixels.astype(np.uint16) * 257
+
+    def cache_key(self):
+        stat = os.stat(self.path) if self.path else None
+        return {
+            'source': 'heightmap',
+            'path': os.path.abspath(self.path) if self.path else None,
+            'mtime': stat.st_mtime_ns if stat else None,
+            'shape': list(self.data.shape),
+            'scale': self.height_scale,
+            'offset': self.height_offset,
+        }
+
+    def __call__(self, gx, gz):
+        """Heights at lattice vertices, clamped to the edge of the map."""
+        gx, gz = np.broadcast_arrays(np.asarray(gx), np.asarray(gz))
+        rows, columns = self.data.shape
+        gx = np.clip(gx, 0, columns - 1).astype(np.intp)
+        gz = np.clip(gz, 0, rows - 1).astype(np.intp)
+        return self.data[gz, gx].astype(np.float64) * self.height_scale + self.height_offset
+
+def load_heightmap(path, **kwargs):
+    """Open a heightmap by extension: .png goes through a sidecar, anything else is raw 16-bit."""
+    if path.lower().endswith('.png'):
+        return HeightmapSource.from_png(path, **kwargs)
+    return HeightmapSource.from_raw(path, **kwargs)
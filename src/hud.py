@@ -1,25 +1,28 @@
 import pygame
 from OpenGL.GL import *
+from .asset_manager import assets
 
 class HUD:
     def __init__(self, display_size):
         self.display_size = display_size
         
         # Create fonts for text rendering
-        pygame.font.init()
-        self.font_large = pygame.font.SysFont('Arial', 32, bold=True)
-        self.font_medium = pygame.font.SysFont('Arial', 24, bold=True)
-        self.font_small = pygame.font.SysFont('Arial', 20, bold=True)
+        self.font_large = assets.font('Arial', 32, bold=True)
+        self.font_medium = assets.font('Arial', 24, bold=True)
+        self.font_small = assets.font('Arial', 20, bold=True)
         
         # Create surface for text rendering
         self.text_surface = pygame.Surface((display_size[0], display_size[1]), pygame.SRCALPHA)
+        
+        # Per-frame culling counts in the top left, toggled with F3
+        self.show_stats = False
     
-    def render(self, player, enemy_manager):
+    def render(self, player, enemy_manager, frustum=None):
         # Clear the text surface
         self.text_surface.fill((0, 0, 0, 0))
         
         # Draw wave and enemy counter at top center
-        active_enemies = len([e for e in enemy_manager.enemies if e.is_alive])
+        active_enemies = enemy_manager.active_count()
         wave_text = f"Wave {enemy_manager.wave}"
         enemies_text = f"{active_enemies}/{enemy_manager.enemies_per_wave} enemies remaining"
         
@@ -39,6 +42,12 @@ class HUD:
         score_rect = score_surf.get_rect(topright=(self.display_size[0] - 20, 20))
         self.text_surface.blit(score_surf, score_rect)
         
+        # Render visible/total counts from culling
+        if self.show_stats and frustum is not None:
+            stats_surf = self.font_small.render(frustum.report(), True, (255, 255, 255))
+            stats_rect = stats_surf.get_rect(topleft=(20, 20))
+            self.text_surface.blit(stats_surf, stats_rect)
+        
         # Switch to orthographic projection for 2D rendering
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
@@ -0,0 +1,257 @@
+import math
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from .vertex_buffer import VertexBuffer, InstanceBuffer
+from .shader import attribute_locations, register_program
+from .asset_manager import assets
+
+# Pre-rendered billboards standing in for a mesh far from the camera.
+#
+# The mesh is rendered once, lit, from a set of directions around it into
+# an RGBA atlas. Far instances are drawn as camera-facing quads showing the
+# frame closest to the direction they are seen from in model space, rolled
+# to follow the model's orientation, all in a single instanced call.
+
+IMPOSTOR_VERTEX_SHADER = """
+#version 120
+attribute vec2 corner;  // Quad corner in [-1, 1]
+attribute vec3 impostor_center;
+attribute vec3 impostor_up;  // World direction that is up in the frame's image
+attribute float impostor_size;  // Half the quad's width
+attribute vec2 impostor_frame;  // Atlas column and row
+attribute vec4 tint;
+
+uniform vec2 frame_count;
+
+varying vec2 v_texcoord;
+varying vec4 v_tint;
+varying float v_fog;
+
+void main()
+{
+    // Roll the quad so the frame's up follows the model on screen
+    vec2 up = (gl_ModelViewMatrix * vec4(impostor_up, 0.0)).xy;
+    up = length(up) > 1e-4 ? normalize(up) : vec2(0.0, 1.0);
+    vec2 right = vec2(up.y, -up.x);
+
+    // Expand the quad in eye space so it always faces the camera
+    vec4 eye = gl_ModelViewMatrix * vec4(impostor_center, 1.0);
+    eye.xy += (corner.x * right + corner.y * up) * impostor_size;
+    gl_Position = gl_ProjectionMatrix * eye;
+
+    v_texcoord = (impostor_frame + corner * 0.5 + 0.5) / frame_count;
+    v_tint = tint;
+    v_fog = clamp((gl_Fog.end - abs(eye.z)) * gl_Fog.scale, 0.0, 1.0);
+}
+"""
+
+IMPOSTOR_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D atlas;
+
+varying vec2 v_texcoord;
+varying vec4 v_tint;
+varying float v_fog;
+
+void main()
+{
+    vec4 color = texture2D(atlas, v_texcoord);
+    if (color.a < 0.5)
+        discard;
+    vec3 rgb = mix(color.rgb, v_tint.rgb, v_tint.a);
+    gl_FragColor = vec4(mix(gl_Fog.color.rgb, rgb, v_fog), 1.0);
+}
+"""
+
+IMPOSTOR_ATTRIBUTES = ('corner', 'impostor_center', 'impostor_up', 'impostor_size', 'impostor_frame', 'tint')
+register_program('impostor', IMPOSTOR_VERTEX_SHADER, IMPOSTOR_FRAGMENT_SHADER, IMPOSTOR_ATTRIBUTES)
+IMPOSTOR_LAYOUT = [('impostor_center', 3), ('impostor_up', 3), ('impostor_size', 1), ('impostor_frame', 2), ('tint', 4)]
+
+# View directions the model is captured from, in model space around its +y
+# axis: a column per azimuth and a row per elevation
+IMPOSTOR_AZIMUTHS = 8
+IMPOSTOR_ELEVATIONS = (-90.0, -60.0, -30.0, 0.0, 30.0, 60.0, 90.0)
+
+class Impostor:
+    def __init__(self, mesh, positions, material=None, frame_size=96):
+        """Capture mesh (a VertexBuffer) from every IMPOSTOR_AZIMUTHS x IMPOSTOR_ELEVATIONS direction.
+
+        positions are the mesh's model-space vertices, used for its bounds.
+        material is an optional dict of glMaterial parameters applied while
+        capturing.
+        """
+        self.columns = IMPOSTOR_AZIMUTHS
+        self.rows = len(IMPOSTOR_ELEVATIONS)
+        self.frame_size = frame_size
+        self.texture = None
+        self.enabled = False
+
+        # Bounding sphere in model space
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.center = (positions.min(axis=0) + positions.max(axis=0)) / 2 if len(positions) else np.zeros(3)
+        self.radius = float(np.linalg.norm(positions - self.center, axis=1).max()) if len(positions) else 0.0
+
+        self.frame_ups = np.array([[self.frame_up(column, row) for column in range(self.columns)]
+                                   for row in range(self.rows)])
+
+        if self.radius <= 0:
+            return
+        try:
+            self.capture(mesh, material or {})
+            self.program = assets.shader('impostor')
+            self.locations = attribute_locations(self.program, IMPOSTOR_ATTRIBUTES)
+        except Exception as e:
+            print(f"Could not create impostor, far models stay meshes: {e}")
+            if self.texture is not None:
+                glDeleteTextures([self.texture])
+                self.texture = None
+            return
+
+        glUseProgram(self.program)
+        glUniform1i(glGetUniformLocation(self.program, 'atlas'), 0)
+        glUseProgram(0)
+
+        corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float32)
+        self.quad = VertexBuffer(corners, [0, 1, 2, 0, 2, 3], [('corner', 2)])
+        self.instances = InstanceBuffer(IMPOSTOR_LAYOUT)
+        self.enabled = True
+
+    @staticmethod
+    def frame_direction(column, row):
+        """Model-space direction the camera looks at the model from in a frame."""
+        azimuth = 2 * math.pi * column / IMPOSTOR_AZIMUTHS
+        elevation = math.radians(IMPOSTOR_ELEVATIONS[row])
+        return np.array([math.cos(elevation) * math.sin(azimuth), math.sin(elevation),
+                         math.cos(elevation) * math.cos(azimuth)])
+
+    @classmethod
+    def frame_up(cls, column, row):
+        """Model-space vector that points up in a frame's image."""
+        direction = cls.frame_direction(column, row)
+        up = np.array([0.0, 1.0, 0.0]) - direction[1] * direction
+        if np.linalg.norm(up) < 1e-6:
+            # Looking along +-y; any perpendicular works as long as rendering uses the same one
+            azimuth = 2 * math.pi * column / IMPOSTOR_AZIMUTHS
+            up = np.array([math.sin(azimuth), 0.0, math.cos(azimuth)]) * -np.sign(direction[1])
+        return up / np.linalg.norm(up)
+
+    def capture(self, mesh, material):
+        width = self.frame_size * self.columns
+        height = self.frame_size * self.rows
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        previous_framebuffer = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
+        framebuffer = glGenFramebuffers(1)
+        depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self.texture, 0)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depth)
+
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_VIEWPORT_BIT | GL_LIGHTING_BIT | GL_DEPTH_BUFFER_BIT)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        try:
+            if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+                raise RuntimeError("impostor framebuffer incomplete")
+
+            glClearColor(0.0, 0.0, 0.0, 0.0)
+            glViewport(0, 0, width, height)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+            glDisable(GL_FOG)
+            glDisable(GL_COLOR_MATERIAL)
+            glEnable(GL_DEPTH_TEST)
+            glEnable(GL_LIGHTING)
+            glEnable(GL_LIGHT0)
+            for parameter, value in material.items():
+                glMaterialfv(GL_FRONT, parameter, value)
+
+            r = self.radius
+            glMatrixMode(GL_PROJECTION)
+            glLoadIdentity()
+            glOrtho(-r, r, -r, r, 0.0, 4 * r)
+            glMatrixMode(GL_MODELVIEW)
+
+            for row in range(self.rows):
+                for column in range(self.columns):
+                    glViewport(column * self.frame_size, row * self.frame_size, self.frame_size, self.frame_size)
+                    glLoadIdentity()
+                    eye = self.center + self.frame_direction(column, row) * 2 * r
+                    gluLookAt(*eye, *self.center, *self.frame_up(column, row))
+                    mesh.render()
+        finally:
+            glMatrixMode(GL_PROJECTION)
+            glPopMatrix()
+            glMatrixMode(GL_MODELVIEW)
+            glPopMatrix()
+            glPopAttrib()
+            glBindFramebuffer(GL_FRAMEBUFFER, previous_framebuffer)
+            glDeleteFramebuffers(1, [framebuffer])
+            glDeleteRenderbuffers(1, [depth])
+
+    def instance_data(self, positions, bases, tints, camera_position):
+        """Per-instance billboard rows for models at positions with (N, 3, 3) bases."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        data = np.zeros((len(positions), 13), dtype=np.float32)
+        if len(positions) == 0:
+            return data
+
+        data[:, 0:3] = positions + bases @ self.center
+        data[:, 6] = self.radius * np.linalg.norm(bases, axis=1).max(axis=1)  # Largest axis scale
+
+        # The direction to the camera in model space picks the nearest frame
+        to_camera = np.asarray(camera_position, dtype=np.float64) - data[:, 0:3]
+        local = np.linalg.solve(bases, to_camera[:, :, np.newaxis])[:, :, 0]
+        local /= np.maximum(np.linalg.norm(local, axis=1, keepdims=True), 1e-12)
+        azimuth = np.arctan2(local[:, 0], local[:, 2])
+        elevation = np.degrees(np.arcsin(np.clip(local[:, 1], -1, 1)))
+        data[:, 7] = np.round(azimuth / (2 * math.pi) * self.columns) % self.columns
+        data[:, 8] = np.abs(elevation[:, np.newaxis] - np.array(IMPOSTOR_ELEVATIONS)).argmin(axis=1)
+
+        # The frame's image-up in world space, so the shader can roll the quad to match
+        ups = self.frame_ups[data[:, 8].astype(np.intp), data[:, 7].astype(np.intp)]
+        data[:, 3:6] = (bases @ ups[:, :, np.newaxis])[:, :, 0]
+
+        data[:, 9:13] = tints
+        return data
+
+    def render(self, positions, bases, tints, camera_position):
+        if not self.enabled or len(positions) == 0:
+            return
+
+        self.instances.upload(self.instance_data(positions, bases, tints, camera_position))
+
+        # The program is shared between impostors, so the atlas layout is set per draw
+        glUseProgram(self.program)
+        glUniform2f(glGetUniformLocation(self.program, 'frame_count'), float(self.columns), float(self.rows))
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        self.quad.bind_attributes(self.locations)
+        self.instances.bind_attributes(self.locations)
+        self.quad.render_instanced(self.instances.instance_count)
+        self.instances.unbind_attributes(self.locations)
+        self.quad.unbind_attributes(self.locations)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glUseProgram(0)
+
+    def delete(self):
+        if self.enabled:
+            self.quad.delete()
+            self.instances.delete()
+            assets.release('shader', 'impostor')
+            glDeleteTextures([self.texture])
+            self.enabled = False
@@ -0,0 +1,93 @@
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+# Background loading while the menu stays responsive.
+#
+# A task is an optional work function, run on a worker thread (file
+# decoding, terrain generation, mesh processing: NumPy and Python only, no
+# GL), and an optional finish function run on the main thread with its
+# result. Finish functions that upload a lot can be generators: every
+# yield ends one batch, and may yield the task's progress so far (0-1).
+# update() runs one batch of each task whose work is done, once per frame,
+# stopping early when the frame's time budget is spent, so GL uploads are
+# drained a few at a time instead of stalling a single frame.
+
+class LoadTask:
+    def __init__(self, name, future, finish, weight):
+        self.name = name
+        self.future = future  # None when there is no background work
+        self.finish = finish
+        self.weight = weight  # Share of the overall progress bar
+        self.steps = None  # Generator returned by finish, once started
+        self.progress = 0.0
+        self.done = False
+
+class Loader:
+    def __init__(self, workers=2, budget=0.008):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loader')
+        self.budget = budget  # Seconds of main-thread finishing per frame
+        self.tasks = []
+        self.started = time.perf_counter()
+        self.finished = None  # Seconds from creation until every task was done
+
+    def add(self, name, work=None, finish=None, weight=1.0):
+        """Queue a task; work starts on a worker immediately."""
+        future = self.executor.submit(work) if work is not None else None
+        self.tasks.append(LoadTask(name, future, finish, weight))
+
+    def step(self, task):
+        if task.steps is None:
+            result = task.future.result() if task.future is not None else None
+            if task.finish is None:
+                task.done = True
+                return
+            steps = task.finish(result) if task.future is not None else task.finish()
+            if not isinstance(steps, types.GeneratorType):
+                task.done = True
+                return
+            task.steps = steps
+        try:
+            progress = next(task.steps)
+            if progress is not None:
+                task.progress = min(max(float(progress), 0.0), 1.0)
+        except StopIteration:
+            task.done = True
+
+    def update(self):
+        """Finish loaded tasks on the main thread within the frame budget; call once per frame."""
+        start = time.perf_counter()
+        for task in self.tasks:
+            if task.done or (task.future is not None and not task.future.done()):
+                continue
+            if time.perf_counter() - start > self.budget:
+                break
+            try:
+                self.step(task)
+            except Exception as e:
+                print(f"Error loading {task.name}: {e}")
+                task.done = True
+        if self.finished is None and self.done:
+            self.finished = time.perf_counter() - self.started
+            print(f"Loading finished in {self.finished * 1000:.0f} ms")
+            self.executor.shutdown(wait=False)
+
+    @property
+    def done(self):
+        return all(task.done for task in self.tasks)
+
+    @property
+    def progress(self):
+        """Overall progress from 0 to 1, weighted per task."""
+        total = sum(task.weight for task in self.tasks)
+        if total <= 0:
+            return 1.0
+        return sum(task.weight * (1.0 if task.done else task.progress) for task in self.tasks) / total
+
+    @property
+    def current(self):
+        """Name of the first unfinished task, for the progress screen."""
+        return next((task.name for task in self.tasks if not task.done), None)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -2,7 +2,7 @@ import pygame
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import math
-import os
+from .asset_manager import assets
 
 class MenuItem:
     def __init__(self, text, position, size=(300, 60), callback=None):
@@ -12,10 +12,10 @@ class MenuItem:
         self.callback = callback
         self.hover = False
         self.active = False
+        self.enabled = True  # Disabled buttons are greyed out and ignore clicks
         
-        # Create font for the button text
-        pygame.font.init()
-        self.font = pygame.font.SysFont('Arial', 32, bold=True)
+        # Font for the button text, shared by all buttons
+        self.font = assets.font('Arial', 32, bold=True)
     
     def is_point_inside(self, point):
         x, y = point
@@ -27,9 +27,11 @@ class MenuItem:
         return left <= x <= right and top <= y <= bottom
     
     def set_hover(self, is_hover):
-        self.hover = is_hover
+        self.hover = is_hover and self.enabled
     
     def activate(self):
+        if not self.enabled:
+            return
         self.active = True
         if self.callback:
             self.callback()
@@ -44,7 +46,11 @@ class MenuItem:
         bottom = self.position[1] + half_height
         
         # Choose color based on state
-        if self.active:
+        if not self.enabled:
+            # Disabled state - grey
+            bg_color = (70, 70, 75)
+            border_color = (120, 120, 120)
+        elif self.active:
             # Pressed state - darker red
             bg_color = (180, 40, 40)
             border_color = (255, 255, 255)
@@ -68,9 +74,10 @@ class MenuItem:
 
 
 class MainMenu:
-    def __init__(self, display_size, start_game_callback):
+    def __init__(self, display_size, start_game_callback, loader=None):
         self.display_size = display_size
         self.start_game_callback = start_game_callback
+        self.loader = loader  # Game loading in the background; Start waits for it
         self.active = True
         self.time_elapsed = 0
         
@@ -96,23 +103,14 @@ class MainMenu:
         )
         
         self.menu_items = [self.start_button, self.quit_button]
+        self.start_button.enabled = loader is None or loader.done
         
-        # Create logo text font
-        self.logo_font = pygame.font.SysFont('Impact', 120, bold=True)
-        
-        # Initialize sound
-        try:
-            pygame.mixer.init()
-            self.music_path = os.path.join('assets', 'sound', 'music.mp3')
-            
-            # Check if the music file exists and isn't already playing
-            if os.path.exists(self.music_path) and not pygame.mixer.music.get_busy():
-                pygame.mixer.music.load(self.music_path)
-                pygame.mixer.music.set_volume(0.3)  # 50% volume
-                pygame.mixer.music.play(-1)  # -1 means loop indefinitely
-                print("Menu music started")
-        except Exception as e:
-            print(f"Error setting up menu music: {e}")
+        # Logo and subtitle fonts
+        self.logo_font = assets.font('Impact', 120, bold=True)
+        self.subtitle_font = assets.font('Arial', 24)
+        
+        # Background music, unless it is already playing
+        assets.play_music()
     
     def start_game(self):
         self.active = False
@@ -139,6 +137,11 @@ class MainMenu:
     
     def update(self, delta_time):
         self.time_elapsed += delta_time
+        
+        # Finish a batch of background loading and unlock Start when it is done
+        if self.loader is not None and not self.start_button.enabled:
+            self.loader.update()
+            self.start_button.enabled = self.loader.done
     
     def render(self):
         # Clear the screen with a dark background
@@ -164,11 +167,14 @@ class MainMenu:
         self.surface.blit(scaled_logo, logo_rect)
         
         # Add subtitle
-        subtitle_font = pygame.font.SysFont('Arial', 24)
-        subtitle = subtitle_font.render("A First-Person Shooter Experience", True, (180, 180, 180))
+        subtitle = self.subtitle_font.render("A First-Person Shooter Experience", True, (180, 180, 180))
         subtitle_rect = subtitle.get_rect(center=(self.display_size[0] / 2, self.display_size[1] / 3 + 80))
         self.surface.blit(subtitle, subtitle_rect)
         
+        # Loading progress below the subtitle until the game is ready
+        if self.loader is not None and not self.start_button.enabled:
+            self.render_progress(self.display_size[1] / 3 + 125)
+        
         # Draw menu items
         for item in self.menu_items:
             item.render(self.surface)
@@ -176,6 +182,20 @@ class MainMenu:
         # Draw the surface to the screen using OpenGL
         self.render_surface_to_screen()
     
+    def render_progress(self, center_y):
+        width, height = 400, 14
+        left = self.display_size[0] / 2 - width / 2
+        top = center_y - height / 2
+        progress = self.loader.progress
+        
+        pygame.draw.rect(self.surface, (50, 50, 60), (left, top, width, height))
+        pygame.draw.rect(self.surface, (180, 20, 20), (left, top, width * progress, height))
+        pygame.draw.rect(self.surface, (180, 180, 180), (left, top, width, height), 1)
+        
+        label = f"Loading {self.loader.current or ''}... {progress * 100:.0f}%"
+        text = self.subtitle_font.render(label, True, (180, 180, 180))
+        self.surface.blit(text, text.get_rect(center=(self.display_size[0] / 2, center_y + 25)))
+    
     def render_surface_to_screen(self):
         # Save current states
         glMatrixMode(GL_PROJECTION)
@@ -0,0 +1,314 @@
+import os
+import sys
+import struct
+import hashlib
+import collections
+import numpy as np
+
+# Offline bake of Model meshes into a compact binary format.
+#
+# An OBJ goes through the same deduplication Model uses for its vertex
+# buffer, then:
+#   - positions are quantized to int16 snorm around the mesh centre, with
+#     one scale for all axes so the decode stays a similarity transform and
+#     normals need no correction
+#   - normals are stored as three signed bytes plus padding, which the
+#     fixed-function path (Model.render, impostor capture) can read too
+#   - triangles are reordered for the post-transform vertex cache
+#     (Tipsify) and clusters of them sorted outside-in to cut overdraw
+#   - vertices are renumbered in first-use order for fetch locality, which
+#     also lets most models use 16-bit indices
+# The result is a header followed by the raw vertex and index bytes, which
+# Model uploads as they are. Bake with:
+#
+#     python -m src.mesh_bake src/assets/models/skull.obj
+
+BAKED_EXTENSION = '.mesh'
+BAKED_MAGIC = b'BMSH'
+BAKED_VERSION = 1
+# magic, version, vertex count, index count, index size, flags, scale, offset
+BAKED_HEADER = struct.Struct('<4sIIIII4f')
+FLAG_TEXCOORDS = 1
+
+VERTEX_CACHE_SIZE = 16
+
+def vertex_dtype(texcoords):
+    fields = [('position', '<i2', 3), ('pad', '<i2'), ('normal', 'i1', 3), ('normal_pad', 'i1')]
+    if texcoords:
+        fields.append(('texcoord', '<f4', 2))
+    return np.dtype(fields)
+
+def quantize_positions(positions):
+    """Quantize (V, 3) positions to int16 snorm; returns (quantized, scale, offset)."""
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return np.zeros((0, 3), dtype=np.int16), 1.0, np.zeros(3)
+    low = positions.min(axis=0)
+    high = positions.max(axis=0)
+    offset = (low + high) / 2
+    scale = max(float((high - low).max()) / 2, 1e-12)
+    quantized = np.clip(np.round((positions - offset) / scale * 32767), -32767, 32767)
+    return quantized.astype(np.int16), scale, offset
+
+def pack_normals(normals):
+    """Quantize (V, 3) normals to int8 snorm after renormalizing them."""
+    normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+    normals = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    return np.clip(np.round(normals * 127), -127, 127).astype(np.int8)
+
+def unpack_normals(packed):
+    return (np.asarray(packed, dtype=np.float32) / 127.0).reshape(-1, 3)
+
+def tipsify(triangles, vertex_count, cache_size=VERTEX_CACHE_SIZE):
+    """Triangle order for a post-transform cache of cache_size entries.
+
+    Sander, Nehab and Barczak's Tipsify: emit every remaining triangle
+    around one vertex, then move on to the neighbour that is most recently
+    cached and still has triangles left. Returns the order and the places
+    in it where the walk continued from a vertex that had left the cache;
+    those split it into clusters for sort_clusters.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    flat = triangles.ravel()
+    counts = np.bincount(flat, minlength=vertex_count)
+
+    # Triangles around each vertex, as flat lists for the walk below
+    offsets = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    adjacency = (np.argsort(flat, kind='stable') // 3).tolist()
+    corners = triangles.tolist()
+    live = counts.tolist()
+
+    cache_time = [-cache_size - 1] * vertex_count
+    emitted = [False] * len(corners)
+    dead_end = []
+    order = []
+    breaks = []
+    time = 0
+    cursor = 0
+    fan = -1
+
+    while True:
+        if fan < 0:
+            # Dead end: back up to a recent vertex with triangles left,
+            # otherwise take the next one in input order
+            while dead_end and fan < 0:
+                vertex = dead_end.pop()
+                if live[vertex] > 0:
+                    fan = vertex
+            while fan < 0 and cursor < vertex_count:
+                if live[cursor] > 0:
+                    fan = cursor
+                cursor += 1
+            if fan < 0:
+                break
+        if time - cache_time[fan] > cache_size:
+            breaks.append(len(order))
+
+        candidates = []
+        for triangle in adjacency[offsets[fan]:offsets[fan + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            order.append(triangle)
+            for vertex in corners[triangle]:
+                dead_end.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if time - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = time
+                    time += 1
+
+        # Prefer the candidate that has been cached longest, as long as
+        # fanning around it will not push it out of the cache
+        fan = -1
+        best_priority = -1
+        for vertex in candidates:
+            if live[vertex] > 0:
+                priority = 0
+                if time - cache_time[vertex] + 2 * live[vertex] <= cache_size:
+                    priority = time - cache_time[vertex]
+                if priority > best_priority:
+                    fan = vertex
+                    best_priority = priority
+
+    return np.array(order, dtype=np.int64), np.array(breaks, dtype=np.int64)
+
+def sort_clusters(positions, triangles, order, breaks):
+    """Reorder tipsify's clusters so outward-facing ones are drawn first.
+
+    Clusters on the outside of the mesh that face away from its centre
+    tend to occlude the rest, so drawing them first lets the depth test
+    reject more fragments later (Sander et al.'s linear-speed overdraw
+    ordering). The order inside each cluster is kept.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    corners = positions[np.asarray(triangles, dtype=np.int64).reshape(-1, 3)[order]]
+    if len(corners) == 0 or len(breaks) < 2:
+        return order
+
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(face_normals, axis=1) + 1e-12
+    centroids = corners.mean(axis=1)
+    center = (centroids * areas[:, np.newaxis]).sum(axis=0) / areas.sum()
+
+    cluster = np.searchsorted(breaks, np.arange(len(order)), side='right') - 1
+    cluster_area = np.bincount(cluster, areas)
+    cluster_centroid = np.stack([np.bincount(cluster, centroids[:, axis] * areas) for axis in range(3)], axis=1)
+    cluster_centroid /= cluster_area[:, np.newaxis]
+    cluster_normal = np.stack([np.bincount(cluster, face_normals[:, axis]) for axis in range(3)], axis=1)
+    cluster_normal /= np.maximum(np.linalg.norm(cluster_normal, axis=1, keepdims=True), 1e-12)
+
+    facing = ((cluster_centroid - center) * cluster_normal).sum(axis=1)
+    rank = np.empty(len(facing), dtype=np.int64)
+    rank[np.argsort(-facing, kind='stable')] = np.arange(len(facing))
+    return order[np.argsort(rank[cluster], kind='stable')]
+
+def reorder_vertices(indices):
+    """Renumber vertices in order of first use; returns (old index per new vertex, new indices)."""
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    used, first = np.unique(indices, return_index=True)
+    vertex_order = used[np.argsort(first)]
+    remap = np.empty(used.max() + 1 if len(used) else 0, dtype=np.int64)
+    remap[vertex_order] = np.arange(len(vertex_order))
+    return vertex_order, remap[indices]
+
+def acmr(indices, cache_size=VERTEX_CACHE_SIZE):
+    """Average transformed vertices per triangle through a FIFO cache of cache_size."""
+    indices = np.asarray(indices).ravel().tolist()
+    if not indices:
+        return 0.0
+    fifo = collections.deque()
+    cached = set()
+    misses = 0
+    for vertex in indices:
+        if vertex not in cached:
+            misses += 1
+            fifo.append(vertex)
+            cached.add(vertex)
+            if len(fifo) > cache_size:
+                cached.discard(fifo.popleft())
+    return misses / (len(indices) / 3)
+
+class BakedMesh:
+    """Quantized vertices and optimised indices, ready to upload as they are."""
+
+    def __init__(self, vertices, indices, scale, offset, source_hash=None):
+        self.vertices = vertices  # (V,) structured array of vertex_dtype()
+        self.indices = indices  # uint16 or uint32
+        self.scale = float(scale)  # position = snorm16 position * scale + offset
+        self.offset = tuple(float(x) for x in offset)
+        self.source_hash = source_hash  # SHA-1 of the baked file, keys derived caches
+
+    @property
+    def has_texcoords(self):
+        return 'texcoord' in self.vertices.dtype.names
+
+    @property
+    def layout(self):
+        layout = [('position', 3, 'snorm16'), ('normal', 3, 'snorm8')]
+        if self.has_texcoords:
+            layout.append(('texcoord', 2))
+        return layout
+
+    def positions(self):
+        return (self.vertices['position'] / 32767.0 * self.scale + np.array(self.offset)).astype(np.float32)
+
+    def normals(self):
+        return unpack_normals(self.vertices['normal'])
+
+    def texcoords(self):
+        if not self.has_texcoords:
+            return np.zeros((0, 2), dtype=np.float32)
+        return np.ascontiguousarray(self.vertices['texcoord'])
+
+    def tobytes(self):
+        header = BAKED_HEADER.pack(BAKED_MAGIC, BAKED_VERSION, len(self.vertices), len(self.indices),
+                                   self.indices.itemsize, FLAG_TEXCOORDS if self.has_texcoords else 0,
+                                   self.scale, *self.offset)
+        return header + np.ascontiguousarray(self.vertices).tobytes() + np.ascontiguousarray(self.indices).tobytes()
+
+    def save(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.tobytes())
+        os.replace(temp_path, path)
+
+def load_baked_mesh(path):
+    """Read a .mesh file written by BakedMesh.save."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return parse_baked_mesh(data)
+
+def parse_baked_mesh(data, source_hash=None):
+    """BakedMesh whose arrays are views into data (bytes, memoryview or mmap), without copying."""
+    magic, version, vertex_count, index_count, index_size, flags, scale, *offset = \
+        BAKED_HEADER.unpack_from(data)
+    if magic != BAKED_MAGIC or version != BAKED_VERSION:
+        raise ValueError(f"not a version {BAKED_VERSION} baked mesh")
+
+    dtype = vertex_dtype(flags & FLAG_TEXCOORDS)
+    start = BAKED_HEADER.size
+    vertices = np.frombuffer(data, dtype=dtype, count=vertex_count, offset=start)
+    start += vertex_count * dtype.itemsize
+    indices = np.frombuffer(data, dtype=np.uint16 if index_size == 2 else np.uint32, count=index_count, offset=start)
+    return BakedMesh(vertices, indices, scale, offset, source_hash or hashlib.sha1(data).hexdigest())
+
+def preferred_model_path(obj_path):
+    """The baked version of obj_path if there is one at least as new, else obj_path."""
+    mesh_path = os.path.splitext(obj_path)[0] + BAKED_EXTENSION
+    try:
+        if os.path.getmtime(mesh_path) >= os.path.getmtime(obj_path):
+            return mesh_path
+        print(f"{mesh_path} is older than {obj_path}, loading the OBJ; re-run mesh_bake")
+    except OSError:
+        pass
+    return obj_path
+
+def bake_arrays(vertices, indices, layout, cache_size=VERTEX_CACHE_SIZE):
+    """Bake Model.mesh_arrays() output (float rows, triangle indices, layout) into a BakedMesh."""
+    columns = {}
+    start = 0
+    for attribute, components in layout:
+        columns[attribute] = vertices[:, start:start + components]
+        start += components
+
+    triangles = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    order, breaks = tipsify(triangles, len(vertices), cache_size)
+    order = sort_clusters(columns['position'], triangles, order, breaks)
+    vertex_order, new_indices = reorder_vertices(triangles[order])
+
+    quantized, scale, offset = quantize_positions(columns['position'][vertex_order])
+    baked = np.zeros(len(vertex_order), dtype=vertex_dtype('texcoord' in columns))
+    baked['position'] = quantized
+    baked['normal'] = pack_normals(columns['normal'][vertex_order])
+    if 'texcoord' in columns:
+        baked['texcoord'] = columns['texcoord'][vertex_order]
+
+    index_type = np.uint16 if len(vertex_order) <= 0x10000 else np.uint32
+    return BakedMesh(baked, new_indices.astype(index_type), scale, offset)
+
+def bake_obj(obj_path, mesh_path=None):
+    """Bake an OBJ to mesh_path (default: beside it with BAKED_EXTENSION) and report the savings."""
+    from .model import Model
+
+    mesh_path = mesh_path or os.path.splitext(obj_path)[0] + BAKED_EXTENSION
+    model = Model()
+    model.load_obj(obj_path)
+    vertices, indices, layout = model.mesh_arrays()
+    if len(indices) == 0:
+        raise ValueError(f"{obj_path} has no triangles")
+
+    baked = bake_arrays(vertices, indices, layout)
+    baked.save(mesh_path)
+
+    print(f"Baked {obj_path} -> {mesh_path}")
+    print(f"  Vertex data: {vertices.nbytes} -> {baked.vertices.nbytes} bytes")
+    print(f"  Index data: {len(indices) * 4} -> {baked.indices.nbytes} bytes")
+    print(f"  ACMR ({VERTEX_CACHE_SIZE}-entry FIFO): {acmr(indices):.3f} -> {acmr(baked.indices):.3f}")
+    return baked
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(f"usage: python -m src.mesh_bake model.obj [output{BAKED_EXTENSION}]")
+        sys.exit(1)
+    bake_obj(*sys.argv[1:])
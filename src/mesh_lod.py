@@ -0,0 +1,159 @@
+import os
+import json
+import numpy as np
+
+# Simplified versions of a mesh for drawing at a distance.
+#
+# Decimation is vertex clustering: vertices are snapped to a uniform grid
+# over the mesh bounds, every cell collapses to the mean of its vertices,
+# and triangles that lose a corner in the process are dropped. It is crude
+# next to quadric simplification but fully vectorised, and at the sizes
+# these levels are drawn the difference is not visible.
+
+# Bump whenever decimation or the cached layout changes
+LOD_CACHE_VERSION = 1
+
+# Grid cells along the longest side of the bounds, one per LOD level
+DEFAULT_LOD_GRIDS = (40, 20, 10)
+LOD_LAYOUT = [('position', 3), ('normal', 3)]
+
+# Camera distances where each level hands over to the next: the full mesh,
+# then one per grid, and past the last one the impostor if there is one
+DEFAULT_LOD_DISTANCES = (12.0, 20.0, 30.0, 45.0)
+
+def smooth_normals(positions, triangles):
+    """Area-weighted vertex normals for (F, 3) triangle vertex indices."""
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    corners = positions[triangles]
+
+    # The cross product's length is twice the face area, so summing
+    # unnormalised face normals weights them by area
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.zeros((len(positions), 3))
+    for axis in range(3):
+        normals[:, axis] = np.bincount(triangles.ravel(), np.repeat(face_normals[:, axis], 3), len(positions))
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    return normals
+
+def decimate(positions, triangles, grid):
+    """Cluster vertices on a grid with `grid` cells along the longest side.
+
+    Returns (positions, triangles) of the simplified mesh; triangles keep
+    their original winding.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    if len(triangles) == 0:
+        return positions[:0], triangles
+
+    low = positions.min(axis=0)
+    extent = positions.max(axis=0) - low
+    cell = max(extent.max() / grid, 1e-12)
+    cells = np.floor((positions - low) / cell).astype(np.int64)
+    cells = np.minimum(cells, grid)
+
+    # Cluster id per vertex, and each cluster's mean position
+    codes = (cells[:, 0] * (grid + 1) + cells[:, 1]) * (grid + 1) + cells[:, 2]
+    _, cluster = np.unique(codes, return_inverse=True)
+    cluster = cluster.ravel()
+    count = np.bincount(cluster)
+    clustered = np.stack([np.bincount(cluster, positions[:, axis]) for axis in range(3)], axis=1) / count[:, np.newaxis]
+
+    # Collapse triangles, dropping degenerate ones and duplicates
+    collapsed = cluster[triangles]
+    keep = ((collapsed[:, 0] != collapsed[:, 1]) & (collapsed[:, 1] != collapsed[:, 2])
+            & (collapsed[:, 0] != collapsed[:, 2]))
+    collapsed = collapsed[keep]
+    _, first = np.unique(np.sort(collapsed, axis=1), axis=0, return_index=True)
+    collapsed = collapsed[np.sort(first)]
+
+    # Compact to the clusters still in use
+    used, remap = np.unique(collapsed, return_inverse=True)
+    return clustered[used], remap.reshape(-1, 3)
+
+def lod_arrays(positions, triangles, grid):
+    """Interleaved LOD_LAYOUT vertices and uint32 indices for one decimated level."""
+    level_positions, level_triangles = decimate(positions, triangles, grid)
+    normals = smooth_normals(level_positions, level_triangles)
+    vertices = np.hstack([level_positions, normals]).astype(np.float32)
+    return vertices, level_triangles.astype(np.uint32).ravel()
+
+class LodCache:
+    """Decimated levels stored as .npy files beside the parsed OBJ cache.
+
+    Entries are keyed by the source OBJ's SHA-1 and the grid sizes, so
+    editing the model or changing the level settings rebuilds them.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path  # ObjCache.base_path() of the source OBJ
+
+    def paths(self, level):
+        return f"{self.base_path}.lod{level}.vertices.npy", f"{self.base_path}.lod{level}.indices.npy"
+
+    @staticmethod
+    def key(source_hash, grids):
+        return {'version': LOD_CACHE_VERSION, 'sha1': source_hash, 'grids': list(grids)}
+
+    def load(self, source_hash, grids):
+        """Return [(vertices, indices), ...] per level, or None if missing or stale."""
+        try:
+            with open(self.base_path + '.lod.key.json', 'r') as f:
+                if json.load(f) != self.key(source_hash, grids):
+                    return None
+            return [tuple(np.load(path, mmap_mode='r') for path in self.paths(level))
+                    for level in range(1, len(grids) + 1)]
+        except (OSError, ValueError):
+            return None
+
+    def save(self, source_hash, grids, levels):
+        key_path = self.base_path + '.lod.key.json'
+        try:
+            os.makedirs(os.path.dirname(key_path) or '.', exist_ok=True)
+            if os.path.exists(key_path):
+                os.remove(key_path)
+
+            # Arrays first, key last, so a partial write is never picked up
+            for level, arrays in enumerate(levels, start=1):
+                for path, array in zip(self.paths(level), arrays):
+                    temp_path = path + '.tmp'
+                    with open(temp_path, 'wb') as f:
+                        np.save(f, np.ascontiguousarray(array))
+                    os.replace(temp_path, path)
+
+            temp_path = key_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.key(source_hash, grids), f, sort_keys=True, indent=2)
+            os.replace(temp_path, key_path)
+        except OSError as e:
+            print(f"Could not write LOD cache {key_path}: {e}")
+
+def build_lod_levels(positions, triangles, grids=DEFAULT_LOD_GRIDS, cache=None, source_hash=None):
+    """Decimated (vertices, indices) per grid size, through the cache when possible."""
+    if cache and source_hash:
+        levels = cache.load(source_hash, grids)
+        if levels is not None:
+            return levels
+
+    levels = [lod_arrays(positions, triangles, grid) for grid in grids]
+    if cache and source_hash:
+        cache.save(source_hash, grids, levels)
+    return levels
+
+def select_levels(distances, current, thresholds, hysteresis=0.1):
+    """Pick a level per instance from its distance, sticking near the boundaries.
+
+    thresholds[i] is the distance where level i hands over to level i + 1.
+    An instance only switches once it is hysteresis (a fraction of the
+    threshold) past the boundary, so models hovering at a boundary do not
+    flicker between levels.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    distances = np.asarray(distances, dtype=np.float64)
+    current = np.asarray(current, dtype=np.int64)
+
+    coarser = np.searchsorted(thresholds * (1 + hysteresis), distances)
+    finer = np.searchsorted(thresholds * (1 - hysteresis), distances)
+    # Move out only past the far edge, back in only past the near edge
+    return np.clip(current, coarser, finer)
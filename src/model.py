@@ -1,12 +1,22 @@
-import pygame
-import math
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
-import copy
+from .obj_loader import load_obj, ObjCache
+from .mesh_bake import BAKED_EXTENSION, load_baked_mesh
+from .vertex_buffer import VertexBuffer
+from .mesh_lod import DEFAULT_LOD_GRIDS, LOD_LAYOUT, LodCache, build_lod_levels, smooth_normals
+from .impostor import Impostor
+
+# Bone-like material for the skulls
+BONE_MATERIAL = {
+    GL_AMBIENT: (0.4, 0.4, 0.4, 1.0),
+    GL_DIFFUSE: (0.8, 0.8, 0.75, 1.0),  # Slightly yellowish
+    GL_SPECULAR: (0.3, 0.3, 0.3, 1.0),
+    GL_SHININESS: (30.0,),
+}
 
 class Model:
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, upload=True, baked=None):
         self.vertices = []
         self.normals = []
         self.texcoords = []
@@ -15,33 +25,43 @@ class Model:
         self.rotation = [0, 0, 0]
         self.scale = [1, 1, 1]
         
-        # Add health and status
-        self.health = 100
-        self.max_health = 100
-        self.is_alive = True
-        self.damage_flash_time = 0
-        
-        # Add collision radius - separate from visual scale
-        self.collision_radius = 1.0
+        # Model-space bounding sphere of the mesh, for culling
+        self.bounding_center = (0.0, 0.0, 0.0)
+        self.bounding_radius = 0.0
         
-        # Add movement parameters
-        self.speed = 0.0  # Default is stationary
-        self.target_position = None  # Target to move towards
+        # Indexed vertex buffer, shared with clones
+        self.mesh = None
+        self.is_clone = False
+        self.file_path = None
+        self.source_hash = None
+        self.baked = None  # BakedMesh when loaded from a .mesh file
         
-        # Add unique ID
-        self.id = -1  # Will be set by EnemyManager
+        # Arrays built off the main thread, waiting for upload() and build_lods()
+        self.mesh_data = None
+        self.lod_data = None
         
-        # Display list for fast rendering
-        self.compiled_list = None
+        # Simplified meshes (lod_meshes[0] is the full mesh) and a billboard
+        # for the farthest band, shared with clones; lod_level is per copy
+        self.lod_meshes = []
+        self.impostor = None
+        self.lod_level = 0
         
-        # If a file path is provided, load the model
+        # If a file path is provided, load the model. Without upload the GL
+        # buffers are left to upload(), so loading can run on a worker thread.
+        # An already decoded BakedMesh (e.g. from the asset bundle) is used
+        # in place of reading file_path.
         if file_path:
-            self.load_obj(file_path)
-            self.compiled_list = self.create_display_list()
+            if baked is not None or file_path.endswith(BAKED_EXTENSION):
+                self.load_baked(file_path, baked)
+            else:
+                self.load_obj(file_path)
+            self.compute_bounds()
+            self.mesh_data = self.upload_arrays()
+            if upload:
+                self.upload()
     
     def clone(self):
-        """Create a copy of this model that shares the same geometry data but has independent 
-        transform, health, and other instance-specific properties."""
+        """Create a copy of this model that shares the same geometry data but has its own transform."""
         # Create a new model instance without loading from file
         new_model = Model()
         
@@ -51,167 +71,189 @@ class Model:
         new_model.texcoords = self.texcoords
         new_model.faces = self.faces
         
-        # Share the compiled display list for faster rendering
-        new_model.compiled_list = self.compiled_list
+        # Share the GPU buffers rather than uploading the mesh again
+        new_model.mesh = self.mesh
+        new_model.is_clone = True
+        new_model.file_path = self.file_path
+        new_model.source_hash = self.source_hash
+        new_model.lod_meshes = self.lod_meshes
+        new_model.impostor = self.impostor
+        new_model.bounding_center = self.bounding_center
+        new_model.bounding_radius = self.bounding_radius
         
         # Set default properties
         new_model.position = self.position.copy()
         new_model.rotation = self.rotation.copy()
         new_model.scale = self.scale.copy()
-        new_model.health = self.health
-        new_model.max_health = self.max_health
-        new_model.is_alive = True
-        new_model.damage_flash_time = 0
-        new_model.collision_radius = self.collision_radius
-        new_model.speed = 0.0
-        new_model.target_position = None
         
         return new_model
     
     def load_obj(self, file_path):
         try:
-            with open(file_path, 'r') as f:
-                lines = f.readlines()
-                
-            vertices = []
-            normals = []
-            texcoords = []
-            faces = []
-            
-            for line in lines:
-                if line.startswith('#'):  # Comment
-                    continue
-                    
-                values = line.split()
-                if not values:
-                    continue
-                    
-                if values[0] == 'v':  # Vertex
-                    vertices.append([float(x) for x in values[1:4]])
-                elif values[0] == 'vn':  # Normal
-                    normals.append([float(x) for x in values[1:4]])
-                elif values[0] == 'vt':  # Texture coordinate
-                    texcoords.append([float(x) for x in values[1:3]])
-                elif values[0] == 'f':  # Face
-                    # Handle different face formats
-                    face = []
-                    for v in values[1:]:
-                        w = v.split('/')
-                        # OBJ indices start at 1, so we subtract 1
-                        # Format: vertex/texcoord/normal
-                        face.append([
-                            int(w[0]) - 1 if len(w) > 0 and w[0] else -1,
-                            int(w[1]) - 1 if len(w) > 1 and w[1] else -1,
-                            int(w[2]) - 1 if len(w) > 2 and w[2] else -1
-                        ])
-                    faces.append(face)
+            mesh = load_obj(file_path)
+            self.file_path = file_path
+            self.source_hash = mesh.source_hash
             
-            self.vertices = vertices
-            self.normals = normals
-            self.texcoords = texcoords
-            self.faces = faces
+            self.vertices = mesh.positions
+            self.normals = mesh.normals
+            self.texcoords = mesh.texcoords
+            self.faces = mesh.triangles  # (F, 3, 3) corners of (vertex, texcoord, normal)
             
             print(f"Loaded model: {file_path}")
-            print(f"  Vertices: {len(vertices)}")
-            print(f"  Normals: {len(normals)}")
-            print(f"  TexCoords: {len(texcoords)}")
-            print(f"  Faces: {len(faces)}")
+            print(f"  Vertices: {len(self.vertices)}")
+            print(f"  Normals: {len(self.normals)}")
+            print(f"  TexCoords: {len(self.texcoords)}")
+            print(f"  Faces: {len(self.faces)}")
             
         except Exception as e:
             print(f"Error loading model {file_path}: {e}")
-            
-    def create_display_list(self):
-        """Create an OpenGL display list for faster rendering."""
-        display_list = glGenLists(1)
-        glNewList(display_list, GL_COMPILE)
-        
-        glBegin(GL_TRIANGLES)
-        for face in self.faces:
-            # For each vertex in the face
-            for vertex_data in face:
-                v_idx, t_idx, n_idx = vertex_data
-                
-                # Apply normal if available
-                if n_idx >= 0 and n_idx < len(self.normals):
-                    glNormal3fv(self.normals[n_idx])
-                
-                # Apply texture coordinate if available
-                if t_idx >= 0 and t_idx < len(self.texcoords):
-                    glTexCoord2fv(self.texcoords[t_idx])
-                
-                # Apply vertex position
-                if v_idx >= 0 and v_idx < len(self.vertices):
-                    glVertex3fv(self.vertices[v_idx])
-        
-        glEnd()
-        glEndList()
-        
-        return display_list
     
-    def set_position(self, x, y, z):
-        self.position = [x, y, z]
+    def load_baked(self, file_path, baked=None):
+        """Load a mesh baked by mesh_bake; its vertex data is uploaded without conversion."""
+        try:
+            if baked is None:
+                baked = load_baked_mesh(file_path)
+            self.baked = baked
+            self.file_path = file_path
+            self.source_hash = baked.source_hash
+            
+            # Decoded copies for the LOD chain and bounds. Baked vertices are
+            # already unique, so every corner uses one index for all three.
+            self.vertices = baked.positions()
+            self.normals = baked.normals()
+            self.texcoords = baked.texcoords()
+            triangles = baked.indices.astype(np.int32).reshape(-1, 3)
+            self.faces = np.repeat(triangles[:, :, np.newaxis], 3, axis=2)
+            if not baked.has_texcoords:
+                self.faces[:, :, 1] = -1
+            
+            print(f"Loaded baked model: {file_path}")
+            print(f"  Vertices: {len(self.vertices)}")
+            print(f"  Faces: {len(self.faces)}")
+            
+        except Exception as e:
+            print(f"Error loading model {file_path}: {e}")
+            
+    def mesh_arrays(self):
+        """Deduplicated interleaved vertices, triangle indices and layout for the VBO.
         
-    def set_rotation(self, x, y, z):
-        self.rotation = [x, y, z]
+        Corners sharing the same (vertex, texcoord, normal) triple become one
+        vertex. Corners without a normal get a smooth normal averaged from
+        the faces around their vertex, weighted by face area.
+        """
+        corners = np.asarray(self.faces, dtype=np.int64).reshape(-1, 3)
+        valid = (corners[:, 0] >= 0) & (corners[:, 0] < len(self.vertices))
+        corners = corners[valid.reshape(-1, 3).all(axis=1).repeat(3)]
+        corners[(corners[:, 1] >= len(self.texcoords)), 1] = -1
+        corners[(corners[:, 2] >= len(self.normals)), 2] = -1
         
-    def set_scale(self, x, y, z):
-        self.scale = [x, y, z]
+        positions = np.asarray(self.vertices, dtype=np.float32).reshape(-1, 3)
+        
+        # One code per distinct corner triple; -1 (missing) maps to 0
+        texcoord_count = len(self.texcoords) + 1
+        normal_count = len(self.normals) + 1
+        codes = (corners[:, 0] * texcoord_count + corners[:, 1] + 1) * normal_count + corners[:, 2] + 1
+        unique_codes, first, indices = np.unique(codes, return_index=True, return_inverse=True)
+        unique_corners = corners[first]
+        
+        normals = np.zeros((len(unique_corners), 3), dtype=np.float32)
+        has_normal = unique_corners[:, 2] >= 0
+        normals[has_normal] = np.asarray(self.normals, dtype=np.float32).reshape(-1, 3)[unique_corners[has_normal, 2]]
+        if not has_normal.all():
+            smooth = smooth_normals(positions, corners[:, 0].reshape(-1, 3))
+            normals[~has_normal] = smooth[unique_corners[~has_normal, 0]]
         
-    def set_collision_radius(self, radius):
-        self.collision_radius = radius
+        layout = [('position', 3), ('normal', 3)]
+        columns = [positions[unique_corners[:, 0]], normals]
+        if len(self.texcoords):
+            texcoords = np.zeros((len(unique_corners), 2), dtype=np.float32)
+            has_texcoord = unique_corners[:, 1] >= 0
+            texcoords[has_texcoord] = np.asarray(self.texcoords, dtype=np.float32).reshape(-1, 2)[unique_corners[has_texcoord, 1]]
+            layout.append(('texcoord', 2))
+            columns.append(texcoords)
+        
+        vertices = np.hstack(columns).astype(np.float32)
+        return vertices, indices.astype(np.uint32).ravel(), layout
+    
+    def compute_bounds(self):
+        """Bounding sphere around the centre of the vertices' box."""
+        positions = np.asarray(self.vertices, dtype=np.float64).reshape(-1, 3)
+        if len(positions) == 0:
+            return
+        center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+        self.bounding_center = tuple(center.tolist())
+        self.bounding_radius = float(np.linalg.norm(positions - center, axis=1).max())
+    
+    def upload_arrays(self):
+        """(vertices, indices, layout, position scale, position offset) for the vertex buffer."""
+        if self.baked is not None:
+            return self.baked.vertices, self.baked.indices, self.baked.layout, self.baked.scale, self.baked.offset
+        vertices, indices, layout = self.mesh_arrays()
+        return vertices, indices, layout, 1.0, (0.0, 0.0, 0.0)
+    
+    def create_mesh(self):
+        """Upload the geometry into an indexed vertex buffer."""
+        vertices, indices, layout, scale, offset = self.mesh_data or self.upload_arrays()
+        return VertexBuffer(vertices, indices, layout, position_scale=scale, position_offset=offset)
     
-    def set_speed(self, speed):
-        self.speed = speed
+    def upload(self):
+        """Create the GL buffers for a model loaded with upload=False; main thread only."""
+        if self.mesh is None:
+            self.mesh = self.create_mesh()
+        self.mesh_data = None
     
-    def set_target(self, target_position):
-        self.target_position = target_position
+    def prepare_lods(self, grids=DEFAULT_LOD_GRIDS):
+        """Decimate the LOD chain (cached next to the parsed OBJ) without touching GL."""
+        triangles = np.asarray(self.faces, dtype=np.int64).reshape(-1, 3, 3)[:, :, 0]
+        triangles = triangles[((triangles >= 0) & (triangles < len(self.vertices))).all(axis=1)]
+        cache = LodCache(ObjCache().base_path(self.file_path)) if self.file_path else None
+        self.lod_data = build_lod_levels(self.vertices, triangles, grids, cache, self.source_hash)
     
-    def take_damage(self, amount):
-        if not self.is_alive:
+    def build_lods(self, grids=DEFAULT_LOD_GRIDS, impostor=True):
+        """Upload the decimated LOD chain, decimating first unless prepare_lods() ran, and an impostor."""
+        if self.mesh is None:
             return
-            
-        self.health -= amount
-        self.damage_flash_time = 0.3  # Flash for 0.3 seconds
+        if self.lod_data is None:
+            self.prepare_lods(grids)
         
-        print(f"Enemy took {amount} damage! Health: {self.health}/{self.max_health}")
+        self.lod_meshes = [self.mesh]
+        for vertices, indices in self.lod_data:
+            if len(indices):
+                self.lod_meshes.append(VertexBuffer(vertices, indices, LOD_LAYOUT))
+        self.lod_data = None
+        print(f"  LOD triangles: {[mesh.index_count // 3 for mesh in self.lod_meshes]}")
         
-        if self.health <= 0:
-            self.health = 0
-            self.is_alive = False
-            print("Enemy defeated!")
+        if impostor:
+            self.build_impostor()
     
-    def update(self, delta_time):
-        # Update damage flash
-        if self.damage_flash_time > 0:
-            self.damage_flash_time -= delta_time
-        
-        # Move towards target if set and alive
-        if self.target_position and self.is_alive and self.speed > 0:
-            # Calculate direction vector to target
-            dx = self.target_position[0] - self.position[0]
-            dz = self.target_position[2] - self.position[2]
-            
-            # Calculate distance
-            distance = math.sqrt(dx*dx + dz*dz)
-            
-            # Only move if not at target
-            if distance > 0.1:  # Small threshold to prevent jitter
-                # Normalize direction vector
-                dx /= distance
-                dz /= distance
-                
-                # Move towards target
-                move_distance = self.speed * delta_time
-                if move_distance > distance:
-                    move_distance = distance  # Don't overshoot
-                
-                self.position[0] += dx * move_distance
-                self.position[2] += dz * move_distance
+    def build_impostor(self):
+        # The first simplified level is plenty for a billboard and much quicker to capture
+        if self.lod_meshes and self.impostor is None:
+            self.impostor = Impostor(self.lod_meshes[min(1, len(self.lod_meshes) - 1)], self.vertices, BONE_MATERIAL)
     
+    def delete(self):
+        # Only the model that loaded the geometry owns the buffers
+        if not self.is_clone:
+            for mesh in self.lod_meshes[1:]:
+                mesh.delete()
+            if self.impostor is not None:
+                self.impostor.delete()
+            if self.mesh is not None:
+                self.mesh.delete()
+        self.mesh = None
+        self.lod_meshes = []
+        self.impostor = None
+    
+    def set_position(self, x, y, z):
+        self.position = [x, y, z]
+        
+    def set_rotation(self, x, y, z):
+        self.rotation = [x, y, z]
+        
+    def set_scale(self, x, y, z):
+        self.scale = [x, y, z]
+        
     def render(self):
-        if not self.is_alive:
-            return  # Don't render if not alive
-            
         glPushMatrix()
         
         # Apply transformations
@@ -221,26 +263,14 @@ class Model:
         glRotatef(self.rotation[2], 0, 0, 1)
         glScalef(self.scale[0], self.scale[1], self.scale[2])
         
-        # Set material properties
-        if self.damage_flash_time > 0:
-            # Flash red when taking damage
-            glDisable(GL_LIGHTING)
-            glColor3f(1.0, 0.0, 0.0)  # Bright red
-        else:
-            # Normal rendering
-            glEnable(GL_LIGHTING)
-            glEnable(GL_LIGHT0)
-            
-            # Set material properties for skull (bone-like)
-            glMaterialfv(GL_FRONT, GL_AMBIENT, (0.4, 0.4, 0.4, 1.0))
-            glMaterialfv(GL_FRONT, GL_DIFFUSE, (0.8, 0.8, 0.75, 1.0))  # Slightly yellowish
-            glMaterialfv(GL_FRONT, GL_SPECULAR, (0.3, 0.3, 0.3, 1.0))
-            glMaterialf(GL_FRONT, GL_SHININESS, 30.0)
-        
-        # Render the model using the compiled display list
-        glCallList(self.compiled_list)
-        
-        # Restore state
+        # Set material properties for skull (bone-like)
         glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        for parameter, value in BONE_MATERIAL.items():
+            glMaterialfv(GL_FRONT, parameter, value)
+        
+        # Render the model from its vertex buffer
+        if self.mesh is not None:
+            self.mesh.render()
         
         glPopMatrix()
\ No newline at end of file
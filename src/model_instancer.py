@@ -0,0 +1,247 @@
+import numpy as np
+from OpenGL.GL import *
+from .vertex_buffer import InstanceBuffer
+from .shader import attribute_locations, register_program
+from .asset_manager import assets
+from .mesh_lod import DEFAULT_LOD_DISTANCES, select_levels
+from .model import BONE_MATERIAL
+
+# Draws every copy of one Model's mesh with a single instanced call.
+#
+# Model.render costs a push/pop, five transform calls and four material
+# calls per copy. Here the transforms of all copies are built with NumPy
+# and streamed to an instance buffer each frame, and the material and
+# hit flash are applied in the shader. Copies are grouped by the Model's
+# LOD chain, so each detail level (and the impostor band) is one call.
+
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec3 normal;
+attribute vec3 model_x;  // Columns of the rotation and scale
+attribute vec3 model_y;
+attribute vec3 model_z;
+attribute vec3 model_translation;
+attribute vec4 tint;  // rgb, and how much it replaces the lit colour
+
+uniform vec3 material_ambient;
+uniform vec3 material_diffuse;
+uniform vec3 material_specular;
+uniform float material_shininess;
+
+varying vec3 v_color;
+varying float v_fog;
+
+void main()
+{
+    mat3 basis = mat3(model_x, model_y, model_z);
+    vec4 eye = gl_ModelViewMatrix * vec4(basis * position + model_translation, 1.0);
+    gl_Position = gl_ProjectionMatrix * eye;
+
+    // Normals need the inverse transpose of the basis. Its columns are
+    // rotation times scale, so dividing each by its squared length gives
+    // rotation over scale.
+    mat3 normal_basis = mat3(model_x / dot(model_x, model_x),
+                             model_y / dot(model_y, model_y),
+                             model_z / dot(model_z, model_z));
+
+    // Fixed-function style lighting from light 0 with an infinite viewer
+    vec3 n = normalize(gl_NormalMatrix * (normal_basis * normal));
+    vec3 light = normalize(gl_LightSource[0].position.xyz);
+    float diffuse = max(dot(n, light), 0.0);
+    float specular = 0.0;
+    if (diffuse > 0.0)
+        specular = pow(max(dot(n, normalize(gl_LightSource[0].halfVector.xyz)), 0.0), material_shininess);
+
+    vec3 lit = (gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb) * material_ambient
+             + gl_LightSource[0].diffuse.rgb * material_diffuse * diffuse
+             + gl_LightSource[0].specular.rgb * material_specular * specular;
+    v_color = mix(lit, tint.rgb, tint.a);
+
+    v_fog = clamp((gl_Fog.end - abs(eye.z)) * gl_Fog.scale, 0.0, 1.0);
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+varying vec3 v_color;
+varying float v_fog;
+
+void main()
+{
+    gl_FragColor = vec4(mix(gl_Fog.color.rgb, v_color, v_fog), 1.0);
+}
+"""
+
+INSTANCE_ATTRIBUTES = ('position', 'normal', 'model_x', 'model_y', 'model_z', 'model_translation', 'tint')
+register_program('instance', INSTANCE_VERTEX_SHADER, INSTANCE_FRAGMENT_SHADER, INSTANCE_ATTRIBUTES)
+INSTANCE_LAYOUT = [('model_x', 3), ('model_y', 3), ('model_z', 3), ('model_translation', 3), ('tint', 4)]
+
+# Shader uniforms for the fixed-function bone material of Model
+MATERIAL_UNIFORMS = {
+    'material_ambient': GL_AMBIENT,
+    'material_diffuse': GL_DIFFUSE,
+    'material_specular': GL_SPECULAR,
+}
+FLASH_TINT = (1.0, 0.0, 0.0, 1.0)  # Bright red, unlit, while taking damage
+
+def model_transforms(rotations, scales):
+    """Rotation/scale bases (N, 3, 3) matching glRotate about x, y, z then glScale."""
+    radians = np.radians(np.asarray(rotations, dtype=np.float64))
+    cos = np.cos(radians)
+    sin = np.sin(radians)
+    count = len(radians)
+
+    rotate_x = np.zeros((count, 3, 3))
+    rotate_x[:, 0, 0] = 1
+    rotate_x[:, 1, 1] = cos[:, 0]
+    rotate_x[:, 1, 2] = -sin[:, 0]
+    rotate_x[:, 2, 1] = sin[:, 0]
+    rotate_x[:, 2, 2] = cos[:, 0]
+
+    rotate_y = np.zeros((count, 3, 3))
+    rotate_y[:, 1, 1] = 1
+    rotate_y[:, 0, 0] = cos[:, 1]
+    rotate_y[:, 0, 2] = sin[:, 1]
+    rotate_y[:, 2, 0] = -sin[:, 1]
+    rotate_y[:, 2, 2] = cos[:, 1]
+
+    rotate_z = np.zeros((count, 3, 3))
+    rotate_z[:, 2, 2] = 1
+    rotate_z[:, 0, 0] = cos[:, 2]
+    rotate_z[:, 0, 1] = -sin[:, 2]
+    rotate_z[:, 1, 0] = sin[:, 2]
+    rotate_z[:, 1, 1] = cos[:, 2]
+
+    basis = rotate_x @ rotate_y @ rotate_z
+    return basis * np.asarray(scales, dtype=np.float64)[:, np.newaxis, :]
+
+class ModelInstancer:
+    def __init__(self, model):
+        self.model = model  # Source of the shared vertex buffer
+        self.enabled = model.mesh is not None
+        if not self.enabled:
+            return
+
+        try:
+            self.program = assets.shader('instance')
+            self.locations = attribute_locations(self.program, INSTANCE_ATTRIBUTES)
+        except Exception as e:
+            print(f"Could not set up instancing shader, drawing models one by one: {e}")
+            self.enabled = False
+            return
+
+        glUseProgram(self.program)
+        for name, parameter in MATERIAL_UNIFORMS.items():
+            glUniform3f(glGetUniformLocation(self.program, name), *BONE_MATERIAL[parameter][:3])
+        glUniform1f(glGetUniformLocation(self.program, 'material_shininess'), BONE_MATERIAL[GL_SHININESS][0])
+        glUseProgram(0)
+
+        self.instances = InstanceBuffer(INSTANCE_LAYOUT)
+        self.lod_distances = DEFAULT_LOD_DISTANCES
+
+    def instance_tints(self, flashing):
+        """(N, 4) tints, FLASH_TINT where flashing is set."""
+        tints = np.zeros((len(flashing), 4), dtype=np.float32)
+        tints[np.asarray(flashing, dtype=bool)] = FLASH_TINT
+        return tints
+
+    def select_levels(self, positions, current, camera_position):
+        """Detail level per instance from its distance to the camera and its level last frame."""
+        level_count = len(self.model.lod_meshes) + (1 if self.model.impostor and self.model.impostor.enabled else 0)
+        if camera_position is None or level_count <= 1:
+            return np.zeros(len(positions), dtype=np.int64)
+
+        distances = np.linalg.norm(positions - np.asarray(camera_position, dtype=np.float64), axis=1)
+        current = np.minimum(current, level_count - 1)
+        return select_levels(distances, current, self.lod_distances[:level_count - 1])
+
+    def render(self, positions, basis, tints, levels, camera_position=None, frustum=None):
+        """Draw copies of the model, one instanced call per detail level.
+
+        positions (N, 3), basis (N, 3, 3) from model_transforms() and tints
+        (N, 4) describe the copies. levels holds each copy's detail level
+        from the previous frame; the updated levels are returned (culled
+        copies keep theirs). Without a camera position everything is drawn
+        at full detail, and with a frustum copies whose bounding sphere is
+        outside it are skipped. If instancing is unavailable the copies are
+        drawn one by one.
+        """
+        levels = np.array(levels, dtype=np.int64)
+        drawn = np.arange(len(positions))
+        if frustum is not None and len(drawn):
+            # The basis columns carry the scale, so the longest one scales the radius
+            centers = positions + basis @ np.asarray(self.model.bounding_center, dtype=np.float64)
+            radii = self.model.bounding_radius * np.linalg.norm(basis, axis=1).max(axis=1)
+            drawn = np.flatnonzero(frustum.spheres_visible(centers, radii, 'models'))
+            positions, basis, tints = positions[drawn], basis[drawn], tints[drawn]
+        if not len(drawn):
+            return levels
+
+        if not self.enabled:
+            self.render_fixed_function(positions, basis, tints)
+            return levels
+
+        levels[drawn] = self.select_levels(positions, levels[drawn], camera_position)
+        drawn_levels = levels[drawn]
+        meshes = self.model.lod_meshes or [self.model.mesh]
+
+        glUseProgram(self.program)
+        for level, mesh in enumerate(meshes):
+            selected = drawn_levels == level
+            if not selected.any():
+                continue
+            # Fold the mesh's position decode (quantized meshes) into the transform
+            level_basis = basis[selected]
+            offset = np.asarray(mesh.position_offset, dtype=np.float64)
+            data = np.zeros((int(selected.sum()), 16), dtype=np.float32)
+            data[:, 0:9] = (level_basis * mesh.position_scale).transpose(0, 2, 1).reshape(-1, 9)  # Column by column
+            data[:, 9:12] = positions[selected] + level_basis @ offset
+            data[:, 12:16] = tints[selected]
+            self.instances.upload(data)
+
+            mesh.bind_attributes(self.locations)
+            self.instances.bind_attributes(self.locations)
+            mesh.render_instanced(self.instances.instance_count)
+            self.instances.unbind_attributes(self.locations)
+            mesh.unbind_attributes(self.locations)
+        glUseProgram(0)
+
+        # Farthest band as billboards
+        selected = drawn_levels == len(meshes)
+        if selected.any():
+            self.model.impostor.render(positions[selected], basis[selected], tints[selected], camera_position)
+        return levels
+
+    def render_fixed_function(self, positions, basis, tints):
+        # One draw per copy with the fixed-function material, as Model.render does
+        mesh = self.model.mesh
+        if mesh is None:
+            return
+        # Column-major 4x4 transforms: basis columns, then the translation
+        matrices = np.zeros((len(positions), 4, 4), dtype=np.float32)
+        matrices[:, :3, :3] = basis.transpose(0, 2, 1)
+        matrices[:, 3, :3] = positions
+        matrices[:, 3, 3] = 1.0
+        for matrix, tint in zip(matrices, tints):
+            glPushMatrix()
+            glMultMatrixf(matrix)
+            if tint[3] > 0:
+                glDisable(GL_LIGHTING)
+                glColor3f(*tint[:3])
+            else:
+                glEnable(GL_LIGHTING)
+                glEnable(GL_LIGHT0)
+                # With colour material on, the current colour overrides the material
+                glColor3f(*BONE_MATERIAL[GL_DIFFUSE][:3])
+                for parameter, value in BONE_MATERIAL.items():
+                    glMaterialfv(GL_FRONT, parameter, value)
+            mesh.render()
+            glEnable(GL_LIGHTING)
+            glPopMatrix()
+
+    def delete(self):
+        if self.enabled:
+            self.instances.delete()
+            assets.release('shader', 'instance')
+            self.enabled = False
@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+
+# Wavefront OBJ parsing into flat NumPy arrays, with a binary sidecar cache.
+#
+# Lines are collected per keyword with one regex pass each and every group
+# is parsed in one go by NumPy's C text parser, instead of line by line in
+# Python. Faces are fan-triangulated, so the result is always a (F, 3, 3)
+# int32 array of triangle corners holding (position, texcoord, normal)
+# indices, with -1 where a corner has no texcoord or normal.
+
+# Bump whenever the parsed layout changes
+CACHE_VERSION = 3
+MESH_ARRAYS = ('positions', 'texcoords', 'normals', 'triangles')
+
+class ObjMesh:
+    def __init__(self, positions, texcoords, normals, triangles, source_hash=None):
+        self.positions = positions  # (V, 3) float32
+        self.texcoords = texcoords  # (T, 2) float32
+        self.normals = normals  # (N, 3) float32
+        self.triangles = triangles  # (F, 3, 3) int32 corners of (v, vt, vn)
+        self.source_hash = source_hash  # SHA-1 of the OBJ file, keys derived caches
+
+def _parse_floats(lines, components):
+    """Parse the value part of 'v x y z ...' style lines into an (N, components) float32 array."""
+    if not lines:
+        return np.zeros((0, components), dtype=np.float32)
+
+    body = b'\n'.join(lines)
+    values = np.fromstring(body, dtype=np.float64, sep=' ')
+
+    # Values per line, counted from the token boundaries in the raw bytes
+    chars = np.frombuffer(body, dtype=np.uint8)
+    space = (chars == ord(' ')) | (chars == ord('\t')) | (chars == ord('\r')) | (chars == ord('\n'))
+    starts = np.flatnonzero(~space & np.concatenate([[True], space[:-1]]))
+    counts = np.bincount(np.searchsorted(np.flatnonzero(chars == ord('\n')), starts), minlength=len(lines))
+    if len(values) != len(starts):
+        # A token that is not a number; parse line by line below
+        counts = None
+    elif counts.min() == counts.max() >= components:
+        # Every line has the same number of values (e.g. optional w or vertex colours)
+        return values.reshape(len(lines), -1)[:, :components].astype(np.float32)
+
+    result = np.zeros((len(lines), components), dtype=np.float32)
+    if counts is not None:
+        # Lines of different lengths: take the first components values of each, zero padded
+        first = np.cumsum(counts) - counts
+        for component in range(components):
+            has = counts > component
+            result[has, component] = values[first[has] + component]
+        return result
+
+    for i, line in enumerate(lines):
+        row = [float(x) for x in line.split()[:components]]
+        result[i, :len(row)] = row
+    return result
+
+def _parse_faces(lines):
+    """Parse the corner lists of 'f' lines into per-face corner counts and a (C, 3) int64 array.
+
+    Corners may be 'v', 'v/t', 'v//n' or 'v/t/n', mixed freely. Missing
+    fields come back as 0, which resolve_indices maps to -1.
+    """
+    body = b'\n'.join(lines).replace(b'//', b'/0/')
+    chars = np.frombuffer(body, dtype=np.uint8)
+
+    # Token boundaries, line numbers and slashes, found on the raw bytes
+    space = (chars == ord(' ')) | (chars == ord('\t')) | (chars == ord('\r')) | (chars == ord('\n'))
+    starts = np.flatnonzero(~space & np.concatenate([[True], space[:-1]]))
+    line_of_token = np.searchsorted(np.flatnonzero(chars == ord('\n')), starts)
+    token_of_slash = np.searchsorted(starts, np.flatnonzero(chars == ord('/')), side='right') - 1
+    fields = np.bincount(token_of_slash, minlength=len(starts)) + 1
+
+    values = np.fromstring(body.replace(b'/', b' '), dtype=np.int64, sep=' ')
+    if len(values) != fields.sum() or fields.max(initial=1) > 3:
+        raise ValueError("malformed face definition")
+
+    # Scatter each token's values into its row of (v, vt, vn)
+    corners = np.zeros((len(starts), 3), dtype=np.int64)
+    token_of_value = np.repeat(np.arange(len(starts)), fields)
+    field_of_value = np.arange(len(values)) - np.repeat(np.cumsum(fields) - fields, fields)
+    corners[token_of_value, field_of_value] = values
+
+    sizes = np.bincount(line_of_token, minlength=len(lines))
+    return sizes, corners
+
+def resolve_indices(indices, count):
+    """OBJ indices are 1-based, negative ones count back from the end; 0 means missing."""
+    return np.where(indices > 0, indices - 1, np.where(indices < 0, count + indices, -1))
+
+def _lines(data, keyword):
+    # Everything after the keyword on each line starting with it. Matching
+    # on a literal newline prefix lets the regex engine skip ahead quickly.
+    return re.findall(rb'\n' + keyword + rb'[ \t]([^\n]*)', data)
+
+def parse_obj(data):
+    """Parse OBJ file contents (bytes) into an ObjMesh."""
+    data = b'\n' + data
+    if re.search(rb'\n[ \t]', data):
+        # Drop indentation once so the keyword scans can match on the newline
+        data = re.sub(rb'\n[ \t]+', b'\n', data)
+    positions = _parse_floats(_lines(data, rb'v'), 3)
+    texcoords = _parse_floats(_lines(data, rb'vt'), 2)
+    normals = _parse_floats(_lines(data, rb'vn'), 3)
+
+    face_lines = _lines(data, rb'f')
+    if not face_lines:
+        return ObjMesh(positions, texcoords, normals, np.zeros((0, 3, 3), dtype=np.int32))
+
+    sizes, corners = _parse_faces(face_lines)
+    corners[:, 0] = resolve_indices(corners[:, 0], len(positions))
+    corners[:, 1] = resolve_indices(corners[:, 1], len(texcoords))
+    corners[:, 2] = resolve_indices(corners[:, 2], len(normals))
+
+    # Fan-triangulate: a face with n corners gives triangles (0, i, i + 1).
+    # Faces with fewer than three corners give none.
+    fans = np.maximum(sizes - 2, 0)
+    starts = np.cumsum(sizes) - sizes
+    face_of_triangle = np.repeat(np.arange(len(sizes)), fans)
+    fan_index = np.arange(len(face_of_triangle)) - np.repeat(np.cumsum(fans) - fans, fans) + 1
+    first = starts[face_of_triangle]
+    corner_indices = np.stack([first, first + fan_index, first + fan_index + 1], axis=1)
+
+    triangles = corners[corner_indices].astype(np.int32)
+    return ObjMesh(positions, texcoords, normals, triangles)
+
+class ObjCache:
+    """Parsed meshes stored as .npy files next to a JSON key, loaded memory-mapped.
+
+    The key records the OBJ's mtime, size and SHA-1. A matching mtime and
+    size is trusted as-is; otherwise the file is hashed, so a touched but
+    unchanged file (e.g. after a checkout) still hits the cache while any
+    edit forces a re-parse.
+    """
+
+    def __init__(self, cache_dir=os.path.join('.cache', 'models')):
+        self.cache_dir = cache_dir
+
+    def base_path(self, path):
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{stem}_{digest[:16]}")
+
+    @staticmethod
+    def file_hash(path):
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+    def load(self, path):
+        """Return the cached ObjMesh for path, or None if missing or stale."""
+        base = self.base_path(path)
+        key_path = base + '.key.json'
+        try:
+            with open(key_path, 'r') as f:
+                stored = json.load(f)
+            if stored.get('version') != CACHE_VERSION:
+                return None
+
+            stat = os.stat(path)
+            if stored.get('mtime') != stat.st_mtime_ns or stored.get('size') != stat.st_size:
+                if stored.get('sha1') != self.file_hash(path):
+                    return None
+                # Same contents under a new mtime; remember it to skip hashing next time
+                stored['mtime'] = stat.st_mtime_ns
+                stored['size'] = stat.st_size
+                self.write_key(key_path, stored)
+
+            arrays = [np.load(f"{base}.{name}.npy", mmap_mode='r') for name in MESH_ARRAYS]
+            return ObjMesh(*arrays, source_hash=stored.get('sha1'))
+        except (OSError, ValueError):
+            return None
+
+    def write_key(self, key_path, key):
+        temp_path = key_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(key, f, sort_keys=True, indent=2)
+        os.replace(temp_path, key_path)
+
+    def save(self, path, mesh, sha1):
+        base = self.base_path(path)
+        key_path = base + '.key.json'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if os.path.exists(key_path):
+                os.remove(key_path)
+
+            # Arrays first, key last, so a partial write is never picked up
+            for name in MESH_ARRAYS:
+                array_path = f"{base}.{name}.npy"
+                temp_path = array_path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(getattr(mesh, name)))
+                os.replace(temp_path, array_path)
+
+            stat = os.stat(path)
+            self.write_key(key_path, {'version': CACHE_VERSION, 'mtime': stat.st_mtime_ns,
+                                      'size': stat.st_size, 'sha1': sha1})
+        except OSError as e:
+            print(f"Could not write model cache {key_path}: {e}")
+
+def load_obj(path, cache_dir=os.path.join('.cache', 'models')):
+    """Load an OBJ as an ObjMesh, through the binary cache unless cache_dir is None."""
+    cache = ObjCache(cache_dir) if cache_dir else None
+    if cache:
+        mesh = cache.load(path)
+        if mesh is not None:
+            return mesh
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    mesh = parse_obj(data)
+    mesh.source_hash = hashlib.sha1(data).hexdigest()
+
+    if cache:
+        cache.save(path, mesh, mesh.source_hash)
+    return mesh
@@ -0,0 +1,160 @@
+import math
+import numpy as np
+from .terrain import block_reduce
+
+# Horizon occlusion culling against the terrain heightfield.
+#
+# Around the eye the terrain is split into square blocks of lattice cells,
+# each standing in as an occluder at its lowest corner height (the surface
+# is bilinear per cell, so it never dips below that). Every block is
+# rasterized into the azimuth bins it fully covers, as the tangent of the
+# lowest elevation a ray through it can have, and filed under the distance
+# ring of its far edge. A running max over the rings then gives, per bin,
+# the horizon made by everything closer than each ring. An object is
+# hidden when its highest elevation stays below that horizon in every bin
+# it touches. Works with anything exposing cell_size, grid_origin and
+# vertex_heights(ix, iz), i.e. Terrain and ChunkedTerrain.
+
+class HorizonOcclusion:
+    def __init__(self, terrain, radius=80.0, bins=256, ring_width=4.0, block=2):
+        self.terrain = terrain
+        self.radius = radius  # Occluders further than this are ignored
+        self.bins = bins  # Azimuth bins around the eye
+        self.bin_width = 2 * math.pi / bins
+        self.ring_width = ring_width  # Distance resolution of the horizon
+        self.rings = int(math.ceil(radius / ring_width)) + 1
+        self.block = block  # Lattice cells per occluder block side
+
+        self.eye = None
+        self.horizon = None  # (bins, rings) horizon tangent from everything within each ring
+
+        # Lowest height per block in a window around the eye, with a margin
+        # so it is only rebuilt every few blocks of movement or when the
+        # terrain changes
+        self.margin = 4
+        self.block_key = None
+        self.block_center = None  # Block the window is centred on
+        self.block_heights = None
+        self.block_start = None  # Lattice (x, z) of the window's first vertex
+
+    def update_blocks(self, gx, gz):
+        bx = math.floor(gx / self.block)
+        bz = math.floor(gz / self.block)
+        version = getattr(self.terrain, 'height_version', 0)
+        if (self.block_key == version and abs(bx - self.block_center[0]) <= self.margin
+                and abs(bz - self.block_center[1]) <= self.margin):
+            return
+        self.block_key = version
+        self.block_center = (bx, bz)
+
+        half = int(math.ceil(self.radius / (self.terrain.cell_size * self.block))) + 1 + self.margin
+        start_x = (bx - half) * self.block
+        start_z = (bz - half) * self.block
+        count = (2 * half + 1) * self.block + 1
+        ix, iz = np.meshgrid(np.arange(start_x, start_x + count), np.arange(start_z, start_z + count))
+        heights = block_reduce(self.terrain.vertex_heights(ix, iz), self.block, np.minimum)
+
+        # A bounded Terrain clamps lookups past its edge, which is not real ground
+        resolution = getattr(self.terrain, 'resolution', None)
+        if resolution is not None:
+            first = np.arange(2 * half + 1) * self.block
+            inside_x = (start_x + first >= 0) & (start_x + first + self.block <= resolution)
+            inside_z = (start_z + first >= 0) & (start_z + first + self.block <= resolution)
+            heights[~(inside_z[:, np.newaxis] & inside_x[np.newaxis, :])] = -np.inf
+
+        self.block_heights = heights
+        self.block_start = (start_x, start_z)
+
+    def update(self, eye):
+        """Rebuild the horizon for eye, a world (x, y, z) above the terrain; call once per frame."""
+        terrain = self.terrain
+        cell = terrain.cell_size
+        origin_x, origin_z = terrain.grid_origin
+        self.update_blocks((eye[0] - origin_x) / cell, (eye[2] - origin_z) / cell)
+        self.eye = np.array(eye, dtype=np.float64)
+
+        # Block grid lines relative to the eye; lines[i] is the low edge of
+        # block i and the high edge of block i - 1
+        size = self.block * cell
+        count = len(self.block_heights)
+        lines_x = origin_x + self.block_start[0] * cell + np.arange(count + 1) * size - eye[0]
+        lines_z = origin_z + self.block_start[1] * cell + np.arange(count + 1) * size - eye[2]
+
+        # Nearest and furthest distance of every block, from per-row and
+        # per-column offsets
+        near_x = np.maximum(np.maximum(lines_x[:-1], -lines_x[1:]), 0)
+        near_z = np.maximum(np.maximum(lines_z[:-1], -lines_z[1:]), 0)
+        far_x = np.maximum(np.abs(lines_x[:-1]), np.abs(lines_x[1:]))
+        far_z = np.maximum(np.abs(lines_z[:-1]), np.abs(lines_z[1:]))
+        near = np.sqrt(near_z[:, np.newaxis] ** 2 + near_x[np.newaxis, :] ** 2)
+        far = np.sqrt(far_z[:, np.newaxis] ** 2 + far_x[np.newaxis, :] ** 2)
+        rise = self.block_heights - eye[1]
+
+        row, column = np.nonzero((near > 0) & (far <= self.radius) & np.isfinite(rise))
+        near, far, rise = near[row, column], far[row, column], rise[row, column]
+
+        # Lowest tangent of elevation over the block: the far edge if it
+        # rises above the eye, the near edge if it is below
+        tangent = np.where(rise > 0, rise / far, rise / near)
+        ring = np.minimum(np.ceil(far / self.ring_width).astype(np.int64), self.rings - 1)
+
+        # Azimuth span of each block from the angles of its corners. A block
+        # never contains the eye, so its corners lie within half a turn of
+        # the first one.
+        angles = np.arctan2(lines_z[:, np.newaxis], lines_x[np.newaxis, :])
+        first_corner = angles[row, column]
+        corners = np.stack([angles[row, column + 1], angles[row + 1, column], angles[row + 1, column + 1]])
+        corners = (corners - first_corner + math.pi) % (2 * math.pi) - math.pi
+        low = first_corner + np.minimum(corners.min(axis=0), 0)
+        high = first_corner + np.maximum(corners.max(axis=0), 0)
+        first = np.ceil(low / self.bin_width).astype(np.int64)
+        covered = np.maximum(np.floor(high / self.bin_width).astype(np.int64) - first, 0)
+
+        # One entry per (block, fully covered bin)
+        block_of = np.repeat(np.arange(len(first)), covered)
+        step = np.arange(len(block_of)) - np.repeat(np.cumsum(covered) - covered, covered)
+        bins = (first[block_of] + step) % self.bins
+
+        horizon = np.full(self.bins * self.rings, -np.inf)
+        np.maximum.at(horizon, bins * self.rings + ring[block_of], tangent[block_of])
+        self.horizon = np.maximum.accumulate(horizon.reshape(self.bins, self.rings), axis=1)
+
+    def occluded(self, centers, radii, tops):
+        """Mask of objects hidden behind the terrain.
+
+        Objects are vertical cylinders given by world (N, 3) centers (only
+        x and z are used), horizontal radii and the world y of their tops.
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        hidden = np.zeros(len(centers), dtype=bool)
+        if self.horizon is None or len(centers) == 0:
+            return hidden
+
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), len(centers))
+        tops = np.broadcast_to(np.asarray(tops, dtype=np.float64), len(centers))
+        dx = centers[:, 0] - self.eye[0]
+        dz = centers[:, 2] - self.eye[2]
+        distance = np.sqrt(dx * dx + dz * dz)
+        near = distance - radii
+
+        # Only objects with at least one full ring of terrain in front can be hidden
+        candidates = np.flatnonzero(near >= self.ring_width)
+        if len(candidates) == 0:
+            return hidden
+        distance, near, radii, rise = distance[candidates], near[candidates], radii[candidates], tops[candidates] - self.eye[1]
+        ring = np.minimum(np.floor(near / self.ring_width).astype(np.int64), self.rings - 1)
+
+        # Highest tangent of elevation of the object, and the bins it touches
+        top = np.where(rise > 0, rise / near, rise / (distance + radii))
+        azimuth = np.arctan2(dz[candidates], dx[candidates])
+        spread = np.arcsin(np.minimum(radii / distance, 1.0))
+        first = np.floor((azimuth - spread) / self.bin_width).astype(np.int64)
+        width = np.floor((azimuth + spread) / self.bin_width).astype(np.int64) - first + 1
+
+        steps = np.arange(min(int(width.max()), self.bins))
+        bins = (first[:, np.newaxis] + steps) % self.bins
+        horizon = self.horizon[bins, ring[:, np.newaxis]]
+        horizon[steps >= width[:, np.newaxis]] = np.inf
+
+        hidden[candidates] = horizon.min(axis=1) > top
+        return hidden
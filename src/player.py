@@ -166,6 +166,10 @@ class Player:
         
         return distance_sq < collision_distance * collision_distance
     
+    def camera_position(self):
+        """World position of the eye"""
+        return [self.position[0], self.position[1] + self.camera_height, self.position[2]]
+    
     def apply_view(self):
         """Apply first-person view transform"""
         # Apply a red tint if recently damaged
@@ -200,4 +204,5 @@ class Player:
         glRotatef(self.rotation[2], 0, 0, 1)  # Roll (usually 0)
         
         # Position the camera at player's view position
-        glTranslatef(-self.position[0], -(self.position[1] + self.camera_height), -self.position[2])
\ No newline at end of file
+        camera = self.camera_position()
+        glTranslatef(-camera[0], -camera[1], -camera[2])
\ No newline at end of file
@@ -0,0 +1,137 @@
+import numpy as np
+
+# Ray queries against a terrain heightfield.
+#
+# Rays are walked cell by cell across the height grid (a 2D DDA on the
+# x/z plane). Inside each cell the surface is the same bilinear patch that
+# get_height interpolates, so along a ray it is a quadratic in t and the
+# first crossing can be solved exactly. Works with anything exposing
+# cell_size, grid_origin and vertex_heights(ix, iz), i.e. Terrain and
+# ChunkedTerrain.
+
+def _first_crossing(f0, f1, f2, t_start, t_end):
+    """Smallest t in [t_start, t_end] with f0 + f1 t + f2 t^2 <= 0, or inf."""
+    hit = np.full(f0.shape, np.inf)
+
+    # Already at or below the surface when entering the cell
+    f_start = f0 + f1 * t_start + f2 * t_start * t_start
+    below = f_start <= 0
+    hit[below] = t_start[below]
+
+    # Linear case
+    with np.errstate(divide='ignore', invalid='ignore'):
+        linear = np.abs(f2) < 1e-12
+        root_linear = np.where(f1 != 0, -f0 / f1, np.inf)
+
+        # Quadratic case: both roots, keep the first one inside the segment
+        discriminant = f1 * f1 - 4 * f2 * f0
+        sqrt_disc = np.sqrt(np.maximum(discriminant, 0))
+        root_a = (-f1 - sqrt_disc) / (2 * f2)
+        root_b = (-f1 + sqrt_disc) / (2 * f2)
+        valid = discriminant >= 0
+        root_a = np.where(valid & ~linear, root_a, np.inf)
+        root_b = np.where(valid & ~linear, root_b, np.inf)
+
+    roots = np.stack([np.where(linear, root_linear, np.inf), root_a, root_b])
+    inside = (roots >= t_start) & (roots <= t_end)
+    first_root = np.where(inside, roots, np.inf).min(axis=0)
+
+    return np.where(below, hit, first_root)
+
+def raycast_many(terrain, origins, directions, max_distances):
+    """Batched terrain ray test.
+
+    origins and directions are (N, 3) arrays, max_distances is a scalar or
+    (N,) array in units of the direction length (use unit directions to
+    get world distances). Returns (hits, distances): a boolean (N,) mask
+    and the ray parameter of the first terrain crossing (inf for misses).
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    count = len(origins)
+    t_end = np.broadcast_to(np.asarray(max_distances, dtype=np.float64), (count,)).copy()
+    distances = np.full(count, np.inf)
+    if count == 0:
+        return np.zeros(0, dtype=bool), distances
+
+    # Work in lattice units on the x/z plane
+    cell = terrain.cell_size
+    gx = (origins[:, 0] - terrain.grid_origin[0]) / cell
+    gz = (origins[:, 2] - terrain.grid_origin[1]) / cell
+    dx = directions[:, 0] / cell
+    dz = directions[:, 2] / cell
+    y0 = origins[:, 1]
+    dy = directions[:, 1]
+
+    ix = np.floor(gx).astype(np.int64)
+    iz = np.floor(gz).astype(np.int64)
+    step_x = np.where(dx >= 0, 1, -1)
+    step_z = np.where(dz >= 0, 1, -1)
+
+    # Ray parameter of the next x/z cell boundary, and the spacing between them
+    with np.errstate(divide='ignore', invalid='ignore'):
+        next_x = np.where(dx > 0, ix + 1 - gx, gx - ix) / np.abs(dx)
+        next_z = np.where(dz > 0, iz + 1 - gz, gz - iz) / np.abs(dz)
+        delta_x = 1 / np.abs(dx)
+        delta_z = 1 / np.abs(dz)
+    next_x[dx == 0] = np.inf
+    next_z[dz == 0] = np.inf
+
+    t = np.zeros(count)
+    active = np.arange(count)
+
+    while len(active):
+        a = active
+        t_exit = np.minimum(np.minimum(next_x[a], next_z[a]), t_end[a])
+
+        # Bilinear patch of the current cell: h = h00 + bu u + bv v + k u v
+        cx = ix[a]
+        cz = iz[a]
+        corners = terrain.vertex_heights(np.stack([cx, cx + 1, cx, cx + 1]),
+                                         np.stack([cz, cz, cz + 1, cz + 1]))
+        h00, h10, h01, h11 = corners
+        bu = h10 - h00
+        bv = h01 - h00
+        k = h00 - h10 - h01 + h11
+
+        # Local cell coordinates along the ray: u = u0 + du t, v = v0 + dv t
+        u0 = gx[a] - cx
+        v0 = gz[a] - cz
+        du = dx[a]
+        dv = dz[a]
+
+        # f(t) = ray height - surface height as a quadratic in t
+        f0 = y0[a] - (h00 + bu * u0 + bv * v0 + k * u0 * v0)
+        f1 = dy[a] - (bu * du + bv * dv + k * (u0 * dv + v0 * du))
+        f2 = -k * du * dv
+
+        crossing = _first_crossing(f0, f1, f2, t[a], t_exit)
+        hit = np.isfinite(crossing)
+        distances[a[hit]] = crossing[hit]
+
+        # Step into the neighbouring cell; rays that hit or ran out stop here
+        done = hit | (t_exit >= t_end[a])
+        stepping = a[~done]
+        go_x = next_x[stepping] <= next_z[stepping]
+        sx = stepping[go_x]
+        sz = stepping[~go_x]
+        t[sx] = next_x[sx]
+        ix[sx] += step_x[sx]
+        next_x[sx] += delta_x[sx]
+        t[sz] = next_z[sz]
+        iz[sz] += step_z[sz]
+        next_z[sz] += delta_z[sz]
+
+        active = stepping
+
+    return np.isfinite(distances), distances
+
+def raycast(terrain, origin, direction, max_distance):
+    """Single ray test; returns the hit distance along direction or None."""
+    hits, distances = raycast_many(terrain, [origin], [direction], max_distance)
+    return float(distances[0]) if hits[0] else None
+
+def line_of_sight(terrain, start, end):
+    """True if the straight segment from start to end stays above the terrain."""
+    direction = [end[i] - start[i] for i in range(3)]
+    return raycast(terrain, start, direction, 1.0) is None
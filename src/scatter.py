@@ -0,0 +1,299 @@
+import math
+import zlib
+import numpy as np
+from OpenGL.GL import *
+from .vertex_buffer import VertexBuffer, InstanceBuffer
+from .shader import attribute_locations, register_program
+from .asset_manager import assets
+
+# Instanced vegetation and rocks scattered over the terrain.
+#
+# Props are placed procedurally per terrain chunk from its heights and
+# slope, and kept as compact float32 rows of (x, y, z, yaw, scale, rank).
+# The rows within draw distance are picked with NumPy whenever the camera
+# moves, then culled against the view frustum every frame and streamed to
+# one instance buffer per prop kind, which is drawn with a single
+# instanced call. rank thins props out with distance so the far field
+# stays sparse. When a patch's heights change (a crater), its props
+# keep their place and are dropped or lifted onto the new ground.
+
+PROP_VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec3 normal;
+attribute vec3 color;
+attribute vec4 instance_transform;  // x, y, z, yaw (radians)
+attribute float instance_scale;
+
+varying vec3 v_color;
+varying float v_fog;
+
+void main()
+{
+    float c = cos(instance_transform.w);
+    float s = sin(instance_transform.w);
+    vec3 p = position * instance_scale;
+    vec3 world = vec3(c * p.x + s * p.z, p.y, -s * p.x + c * p.z) + instance_transform.xyz;
+    vec3 n = vec3(c * normal.x + s * normal.z, normal.y, -s * normal.x + c * normal.z);
+
+    vec4 eye = gl_ModelViewMatrix * vec4(world, 1.0);
+    gl_Position = gl_ProjectionMatrix * eye;
+
+    // Same directional sun as the fixed-function terrain
+    vec3 light = normalize(gl_LightSource[0].position.xyz);
+    float diffuse = max(dot(normalize(gl_NormalMatrix * n), light), 0.0);
+    v_color = color * (gl_LightSource[0].ambient.rgb + gl_LightSource[0].diffuse.rgb * diffuse);
+
+    // Linear fog matching glFog
+    v_fog = clamp((gl_Fog.end - abs(eye.z)) * gl_Fog.scale, 0.0, 1.0);
+}
+"""
+
+PROP_FRAGMENT_SHADER = """
+#version 120
+varying vec3 v_color;
+varying float v_fog;
+
+void main()
+{
+    gl_FragColor = vec4(mix(gl_Fog.color.rgb, v_color, v_fog), 1.0);
+}
+"""
+
+PROP_ATTRIBUTES = ('position', 'normal', 'color', 'instance_transform', 'instance_scale')
+register_program('props', PROP_VERTEX_SHADER, PROP_FRAGMENT_SHADER, PROP_ATTRIBUTES)
+MESH_LAYOUT = [('position', 3), ('normal', 3), ('color', 3)]
+INSTANCE_LAYOUT = [('instance_transform', 4), ('instance_scale', 1)]
+
+def flat_mesh(triangles, colors):
+    """Vertex/index arrays for flat-shaded triangles given as (T, 3, 3) corners."""
+    triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-9)
+
+    vertices = np.empty((len(triangles), 3, 9), dtype=np.float32)
+    vertices[..., 0:3] = triangles
+    vertices[..., 3:6] = normals[:, np.newaxis, :]
+    vertices[..., 6:9] = np.asarray(colors, dtype=np.float64).reshape(-1, 1, 3)
+    return vertices.reshape(-1, 9), np.arange(len(triangles) * 3, dtype=np.uint32)
+
+def lathe(radius0, y0, radius1, y1, sides):
+    """Side triangles of a cone or cylinder segment around the y axis."""
+    angles = np.linspace(0, 2 * math.pi, sides + 1)
+    ring0 = np.stack([np.cos(angles) * radius0, np.full_like(angles, y0), np.sin(angles) * radius0], axis=1)
+    ring1 = np.stack([np.cos(angles) * radius1, np.full_like(angles, y1), np.sin(angles) * radius1], axis=1)
+    triangles = []
+    for i in range(sides):
+        triangles.append((ring0[i], ring1[i], ring0[i + 1]))
+        if radius1 > 0:
+            triangles.append((ring0[i + 1], ring1[i], ring1[i + 1]))
+    return triangles
+
+def tree_mesh():
+    trunk = lathe(0.15, 0.0, 0.12, 0.8, 6)
+    foliage = lathe(0.9, 0.6, 0.0, 2.0, 8) + lathe(0.65, 1.4, 0.0, 2.7, 8)
+    colors = [(0.35, 0.22, 0.1)] * len(trunk) + [(0.15, 0.4, 0.15)] * len(foliage)
+    return flat_mesh(trunk + foliage, colors)
+
+def rock_mesh():
+    # Squashed octahedron, sunk a little into the ground
+    top, bottom = (0, 0.6, 0), (0, -0.3, 0)
+    ring = [(0.8, 0.05, 0), (0, 0.1, 0.6), (-0.7, 0.0, 0), (0, 0.05, -0.65)]
+    triangles = []
+    for i in range(4):
+        a, b = ring[i], ring[(i + 1) % 4]
+        triangles += [(a, top, b), (a, b, bottom)]
+    return flat_mesh(triangles, [(0.45, 0.44, 0.42)] * len(triangles))
+
+def grass_mesh():
+    # Three crossed blades
+    triangles = []
+    for angle in (0.0, 2.1, 4.2):
+        dx, dz = math.cos(angle) * 0.2, math.sin(angle) * 0.2
+        tip = (dz * 0.5, 0.6, -dx * 0.5)
+        triangles += [((-dx, 0, -dz), tip, (dx, 0, dz)), ((dx, 0, dz), tip, (-dx, 0, -dz))]
+    return flat_mesh(triangles, [(0.3, 0.55, 0.2)] * len(triangles))
+
+class PropKind:
+    """One kind of scattered prop and the rules for placing it."""
+
+    def __init__(self, name, mesh, spacing, probability, min_flatness, max_flatness,
+                 scale_range, draw_distance):
+        self.name = name
+        self.mesh_data = mesh  # (vertices, indices), uploaded by Scatter
+        self.spacing = spacing  # Distance between candidate points
+        self.probability = probability  # Chance a suitable candidate gets a prop
+        self.min_flatness = min_flatness  # Range of normal.y the prop accepts
+        self.max_flatness = max_flatness
+        self.scale_range = scale_range
+        self.draw_distance = draw_distance  # Density fades to zero here
+
+        # Bounding sphere at unit scale, centred on the y axis so any yaw fits in it
+        positions = mesh[0][:, :3].astype(np.float64)
+        self.bound_height = (positions[:, 1].min() + positions[:, 1].max()) / 2
+        self.bound_radius = np.sqrt(positions[:, 0] ** 2 + (positions[:, 1] - self.bound_height) ** 2
+                                    + positions[:, 2] ** 2).max()
+
+DEFAULT_PROPS = [
+    PropKind('tree', tree_mesh(), 5.0, 0.45, 0.6, 1.0, (0.8, 1.4), 90.0),
+    PropKind('rock', rock_mesh(), 6.0, 0.25, 0.0, 1.0, (0.5, 1.2), 70.0),
+    PropKind('grass', grass_mesh(), 1.5, 0.6, 0.5, 1.0, (0.7, 1.3), 30.0),
+]
+
+class Scatter:
+    def __init__(self, terrain, props=None):
+        self.terrain = terrain
+        self.props = props or DEFAULT_PROPS
+        self.enabled = True
+
+        # Per chunk key: {prop name: (M, 6) float32 rows}
+        self.patches = {}
+        self.patch_versions = {}  # Chunk key -> the patch's height_version its rows were placed on
+        self.patch_keys = None  # Chunk set the merged arrays were built from
+        self.height_version = None  # Terrain height_version the merged arrays were built from
+        self.merged = {}  # Prop name -> all rows of the current chunk set
+        self.nearby = {}  # Prop name -> rows left after distance thinning, as uploaded (x, y, z, yaw, scale)
+        self.shown = {}  # Prop name -> frustum mask of nearby rows currently in the instance buffer
+        self.last_cull_position = None
+        self.visible_count = 0
+
+        try:
+            self.program = assets.shader('props')
+            self.locations = attribute_locations(self.program, PROP_ATTRIBUTES)
+        except Exception as e:
+            print(f"Could not set up prop shader, props disabled: {e}")
+            self.enabled = False
+            return
+
+        self.meshes = {kind.name: VertexBuffer(*kind.mesh_data, MESH_LAYOUT) for kind in self.props}
+        self.instances = {kind.name: InstanceBuffer(INSTANCE_LAYOUT) for kind in self.props}
+
+    def populate(self, key, patch):
+        """Place props on one terrain patch; deterministic per patch key."""
+        rows = {}
+        min_x, min_z = patch.origin
+        for kind in self.props:
+            seed = zlib.crc32(repr((key, kind.name)).encode('utf-8'))
+            rng = np.random.default_rng(seed)
+
+            # Jittered grid of candidate points over the patch
+            count = max(1, int(patch.size / kind.spacing))
+            grid = (np.arange(count) + 0.5) * (patch.size / count)
+            gx, gz = np.meshgrid(grid, grid)
+            points = np.stack([gx.ravel() + min_x, gz.ravel() + min_z], axis=1)
+            points += rng.uniform(-0.5, 0.5, points.shape) * (patch.size / count)
+
+            heights, normals = patch.sample_many(points, normals=True)
+            flatness = normals[:, 1]
+            keep = ((flatness >= kind.min_flatness) & (flatness <= kind.max_flatness)
+                    & (rng.random(len(points)) < kind.probability))
+
+            n = int(keep.sum())
+            data = np.empty((n, 6), dtype=np.float32)
+            data[:, 0] = points[keep, 0]
+            data[:, 1] = heights[keep]
+            data[:, 2] = points[keep, 1]
+            data[:, 3] = rng.uniform(0, 2 * math.pi, n)  # Yaw
+            data[:, 4] = rng.uniform(*kind.scale_range, n)  # Scale
+            data[:, 5] = rng.random(n)  # Rank for distance thinning
+            rows[kind.name] = data
+        return rows
+
+    def settle(self, rows, patch):
+        """Move a patch's props onto its current ground, after it was deformed."""
+        for data in rows.values():
+            if len(data):
+                data[:, 1] = patch.sample_many(data[:, [0, 2]])
+
+    def current_patches(self):
+        # Chunked terrain exposes its visible chunks; a plain Terrain is one patch
+        if hasattr(self.terrain, 'visible_keys'):
+            return {key: self.terrain.chunks[key] for key in self.terrain.visible_keys}
+        return {None: self.terrain}
+
+    def update(self, camera_position, frustum=None):
+        """Refresh placement for new chunks, thin by distance when the camera
+        moves and cull against the frustum, if given, every frame."""
+        if not self.enabled:
+            return
+
+        patches = self.current_patches()
+        keys = frozenset(patches)
+        version = self.terrain.height_version
+        if keys != self.patch_keys or version != self.height_version:
+            changed = keys != self.patch_keys
+            for key, patch in patches.items():
+                if key not in self.patches:
+                    self.patches[key] = self.populate(key, patch)
+                elif self.patch_versions[key] != patch.height_version:
+                    self.settle(self.patches[key], patch)
+                    changed = True
+                self.patch_versions[key] = patch.height_version
+            for key in list(self.patches):
+                if key not in keys:
+                    del self.patches[key]
+                    del self.patch_versions[key]
+
+            if changed:
+                for kind in self.props:
+                    arrays = [self.patches[key][kind.name] for key in keys]
+                    self.merged[kind.name] = np.concatenate(arrays) if arrays else np.zeros((0, 6), np.float32)
+                self.last_cull_position = None
+            self.patch_keys = keys
+            self.height_version = version
+
+        # Distance thinning only changes when the camera moves a bit
+        camera = np.array([camera_position[0], camera_position[2]])
+        if self.last_cull_position is None or np.hypot(*(camera - self.last_cull_position)) >= 0.5:
+            self.last_cull_position = camera
+            for kind in self.props:
+                rows = self.merged[kind.name]
+                distance = np.hypot(rows[:, 0] - camera[0], rows[:, 2] - camera[1])
+
+                # Full density up close, fading linearly to nothing at the draw distance
+                density = np.clip(1.0 - distance / kind.draw_distance, 0.0, 1.0) * 1.5
+                self.nearby[kind.name] = rows[rows[:, 5] < density, :5]
+                self.shown[kind.name] = None
+
+        # The frustum turns with the camera, so this runs every frame; the
+        # upload is skipped while the same props stay in view
+        self.visible_count = 0
+        for kind in self.props:
+            rows = self.nearby[kind.name]
+            if frustum is not None:
+                centers = rows[:, :3].astype(np.float64)
+                centers[:, 1] += kind.bound_height * rows[:, 4]
+                visible = frustum.spheres_visible(centers, kind.bound_radius * rows[:, 4], 'props')
+            else:
+                visible = np.ones(len(rows), dtype=bool)
+            shown = self.shown[kind.name]
+            if shown is None or not np.array_equal(visible, shown):
+                self.instances[kind.name].upload(rows[visible])
+                self.shown[kind.name] = visible
+            self.visible_count += int(visible.sum())
+
+    def render(self):
+        if not self.enabled:
+            return
+
+        glUseProgram(self.program)
+        for kind in self.props:
+            instances = self.instances[kind.name]
+            if instances.instance_count == 0:
+                continue
+            mesh = self.meshes[kind.name]
+            mesh.bind_attributes(self.locations)
+            instances.bind_attributes(self.locations)
+            mesh.render_instanced(instances.instance_count)
+            instances.unbind_attributes(self.locations)
+            mesh.unbind_attributes(self.locations)
+        glUseProgram(0)
+
+    def delete(self):
+        if not self.enabled:
+            return
+        for mesh in self.meshes.values():
+            mesh.delete()
+        for instances in self.instances.values():
+            instances.delete()
+        assets.release('shader', 'props')
@@ -0,0 +1,215 @@
+import os
+import re
+import struct
+import ctypes
+import hashlib
+import numpy as np
+from OpenGL.GL import *
+
+# Small GLSL helpers. Shaders target GLSL 1.20 on the compatibility
+# profile, so they can keep reading the fixed-function matrices, light
+# and fog state (gl_ModelViewMatrix, gl_LightSource, gl_Fog) that the rest
+# of the game sets up.
+#
+# Programs the game uses are registered by name at import time, so the
+# loading screen can warm all of them up front. ProgramCache links them
+# through an on-disk cache of program binaries (.cache/shaders), keyed by
+# the preprocessed sources and the driver string; when the driver has no
+# binary formats, or rejects a cached binary after an update, it compiles
+# from source. Compiles are started without waiting on the result, so on
+# drivers with KHR_parallel_shader_compile they run on driver threads
+# while the caller polls ready().
+
+SHADER_DIR = os.path.join('src', 'assets', 'shaders')
+SHADER_CACHE_DIR = os.path.join('.cache', 'shaders')
+BINARY_MAGIC = b'GLPB'
+BINARY_VERSION = 1
+# magic, version, SHA-1 key, binary format
+BINARY_HEADER = struct.Struct('<4sI40sI')
+GL_COMPLETION_STATUS_KHR = 0x91B1
+
+INCLUDE_PATTERN = re.compile(r'^[ \t]*#[ \t]*include[ \t]+"([^"]+)"[ \t]*$', re.MULTILINE)
+VERSION_PATTERN = re.compile(r'^[ \t]*#[ \t]*version[^\n]*$', re.MULTILINE)
+
+# Name -> (vertex source, fragment source, attribute names)
+PROGRAMS = {}
+
+def register_program(name, vertex_source, fragment_source, attributes=()):
+    """Make a program known to the shader warm-up; sources may #include files from SHADER_DIR."""
+    PROGRAMS[name] = (vertex_source, fragment_source, tuple(attributes))
+
+def read_shader_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def preprocess(source, defines=None, read=read_shader_file, include_dir=SHADER_DIR, depth=0):
+    """Expand #include "file" lines and put #version, then defines, first as GLSL requires."""
+    if depth > 8:
+        raise RuntimeError("Shader includes nested too deeply")
+
+    def include(match):
+        text = read(os.path.join(include_dir, match.group(1)))
+        if text is None:
+            raise RuntimeError(f"Shader include not found: {match.group(1)}")
+        return preprocess(text, None, read, include_dir, depth + 1)
+    source = INCLUDE_PATTERN.sub(include, source)
+    if depth:
+        return source
+
+    version = VERSION_PATTERN.search(source)
+    header = []
+    if version:
+        header.append(version.group(0).strip())
+        source = source[:version.start()] + source[version.end():]
+    header.extend(f"#define {name} {value}" for name, value in (defines or {}).items())
+    return '\n'.join(header + [source]) if header else source
+
+def driver_string():
+    return ' | '.join(str(glGetString(name), 'utf-8', 'replace') for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+
+def start_shader(source, shader_type):
+    # Compile without asking for the status, which would wait for the compile
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    return shader
+
+def info_log(log):
+    return log.decode('utf-8', 'replace') if isinstance(log, bytes) else log
+
+class PendingProgram:
+    def __init__(self, name, key, program, shaders=()):
+        self.name = name
+        self.key = key
+        self.program = program
+        self.shaders = shaders  # Attached shader objects; empty when loaded from a binary
+
+class ProgramCache:
+    def __init__(self, cache_dir=SHADER_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.driver = None
+        self.binary_formats = None  # Whether the driver can save and load program binaries
+        self.parallel = None  # Whether completion can be polled without blocking
+
+    def check_driver(self):
+        if self.driver is not None:
+            return
+        self.driver = driver_string()
+        try:
+            self.binary_formats = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+        except Exception:
+            self.binary_formats = False
+        try:
+            from OpenGL.GL.KHR import parallel_shader_compile
+            self.parallel = bool(parallel_shader_compile.glInitParallelShaderCompileKHR())
+        except Exception:
+            self.parallel = False
+
+    def key(self, vertex_source, fragment_source, attributes):
+        sha1 = hashlib.sha1()
+        for part in (self.driver, vertex_source, fragment_source, ','.join(attributes)):
+            sha1.update(part.encode('utf-8'))
+            sha1.update(b'\0')
+        return sha1.hexdigest()
+
+    def binary_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}_{key[:16]}.bin")
+
+    def load_binary(self, name, key):
+        # A linked program from the cached binary, or None
+        try:
+            with open(self.binary_path(name, key), 'rb') as f:
+                data = f.read()
+            magic, version, stored_key, binary_format = BINARY_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != BINARY_MAGIC or version != BINARY_VERSION or stored_key != key.encode('ascii'):
+            return None
+
+        binary = np.frombuffer(data, dtype=np.uint8, offset=BINARY_HEADER.size)
+        program = glCreateProgram()
+        glProgramBinary(program, binary_format, binary, len(binary))
+        if glGetProgramiv(program, GL_LINK_STATUS):
+            return program
+        glDeleteProgram(program)
+        print(f"Driver rejected the cached binary for shader {name}, compiling from source")
+        return None
+
+    def save_binary(self, name, key, program):
+        try:
+            length = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+            if length <= 0:
+                return
+            binary = np.empty(length, dtype=np.uint8)
+            written = GLsizei()
+            binary_format = GLenum()
+            glGetProgramBinary(program, length, ctypes.byref(written), ctypes.byref(binary_format),
+                               binary.ctypes.data_as(ctypes.c_void_p))
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.binary_path(name, key)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, key.encode('ascii'), binary_format.value))
+                f.write(binary[:written.value].tobytes())
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Could not write shader cache for {name}: {e}")
+
+    def start(self, name, vertex_source, fragment_source, attributes=(), read=read_shader_file):
+        """Begin linking a program, from the binary cache if possible; finish() completes it."""
+        self.check_driver()
+        vertex_source = preprocess(vertex_source, read=read)
+        fragment_source = preprocess(fragment_source, read=read)
+        key = self.key(vertex_source, fragment_source, attributes)
+
+        if self.binary_formats:
+            program = self.load_binary(name, key)
+            if program is not None:
+                return PendingProgram(name, key, program)
+
+        shaders = (start_shader(vertex_source, GL_VERTEX_SHADER), start_shader(fragment_source, GL_FRAGMENT_SHADER))
+        program = glCreateProgram()
+        for shader in shaders:
+            glAttachShader(program, shader)
+        for location, attribute in enumerate(attributes):
+            glBindAttribLocation(program, location, attribute)
+        if self.binary_formats:
+            glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+        return PendingProgram(name, key, program, shaders)
+
+    def ready(self, pending):
+        """Whether finish() would return without waiting on the driver."""
+        if not pending.shaders or not self.parallel:
+            return True
+        # PyOpenGL has no output size for this query, so pass the output array
+        status = np.zeros(1, dtype=np.int32)
+        glGetProgramiv(pending.program, GL_COMPLETION_STATUS_KHR, status)
+        return bool(status[0])
+
+    def finish(self, pending):
+        """The linked program; raises RuntimeError with the driver's log if it failed."""
+        program = pending.program
+        if not pending.shaders:
+            return program
+
+        linked = glGetProgramiv(program, GL_LINK_STATUS)
+        if not linked:
+            logs = [info_log(glGetShaderInfoLog(shader)) for shader in pending.shaders
+                    if not glGetShaderiv(shader, GL_COMPILE_STATUS)]
+            logs.append(info_log(glGetProgramInfoLog(program)))
+        for shader in pending.shaders:
+            glDetachShader(program, shader)
+            glDeleteShader(shader)
+        if not linked:
+            glDeleteProgram(program)
+            raise RuntimeError(f"Shader {pending.name} failed: " + ' '.join(log.strip() for log in logs if log))
+
+        if self.binary_formats:
+            self.save_binary(pending.name, pending.key, program)
+        return program
+
+def attribute_locations(program, names):
+    """Map attribute names to their locations in a linked program (-1 if unused)."""
+    return {name: glGetAttribLocation(program, name) for name in names}
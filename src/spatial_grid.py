@@ -0,0 +1,200 @@
+import numpy as np
+
+# Uniform grid over the XZ plane for collision queries.
+#
+# Items are bucketed by the grid cell their center is in. Cells are hashed
+# into a table of buckets sized to the item count, so memory does not
+# depend on how far apart items are; a hash collision only adds
+# candidates that the exact distance tests then reject. build() assigns
+# cells and sorts items by bucket with array operations, so rebuilding
+# every frame is cheaper than tracking movement. Each query only looks at
+# the buckets of the cells it overlaps, keeping collision cost roughly
+# linear in the number of items and queries.
+
+HASH_X = 73856093
+HASH_Z = 19349663
+MAX_TABLE_SIZE = 1 << 16  # Bucket ids stay 16-bit, which NumPy sorts in linear time
+
+class SpatialGrid:
+    def __init__(self, cell_size=2.0, max_per_cell=32):
+        self.cell_size = cell_size
+        self.max_per_cell = max_per_cell  # Neighbours taken from one bucket by pairs()
+        self.positions = np.zeros((0, 3))  # Item positions, read at query time
+        self.count = 0  # Items at the last build
+        self.table_size = 1
+        self.bucket_starts = np.zeros(2, dtype=np.int64)  # Bucket b holds order[bucket_starts[b]:bucket_starts[b + 1]]
+        self.order = np.zeros(0, dtype=np.int64)  # Item indices sorted by bucket, -1 once removed
+        self.where = np.zeros(0, dtype=np.int64)  # Index into order of each item
+        self.cells = np.zeros((0, 2), dtype=np.int64)  # Cell of each item
+        self.valid = np.zeros(0, dtype=bool)
+
+    def cell_of(self, x, z):
+        return (np.floor(np.asarray(x) / self.cell_size).astype(np.int64),
+                np.floor(np.asarray(z) / self.cell_size).astype(np.int64))
+
+    def bucket(self, cell_x, cell_z):
+        return ((cell_x * HASH_X) ^ (cell_z * HASH_Z)) & (self.table_size - 1)
+
+    def build(self, positions, count=None):
+        """Bucket the first count rows (all by default) of the (N, 3) positions.
+
+        positions is kept and read by the queries, so it may be updated in
+        place between builds (see remove()).
+        """
+        self.positions = positions
+        self.count = count = len(positions) if count is None else count
+        self.table_size = min(max(64, 1 << int(2 * count).bit_length()), MAX_TABLE_SIZE)
+
+        cell_x, cell_z = self.cell_of(positions[:count, 0], positions[:count, 2])
+        self.cells = np.column_stack([cell_x, cell_z])
+        buckets = self.bucket(cell_x, cell_z).astype(np.uint16)
+
+        self.order = np.argsort(buckets, kind='stable')
+        self.bucket_starts = np.zeros(self.table_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(buckets, minlength=self.table_size), out=self.bucket_starts[1:])
+        self.where = np.empty(count, dtype=np.int64)
+        self.where[self.order] = np.arange(count)
+        self.valid = np.ones(count, dtype=bool)
+
+    def remove(self, index, moved_from=None):
+        """Forget item index; with moved_from, that item has since moved to index.
+
+        Matches removal by swapping the last item into the gap, so the grid
+        stays usable until the next build.
+        """
+        if index < self.count and self.valid[index]:
+            self.order[self.where[index]] = -1
+            self.valid[index] = False
+        if moved_from is None or moved_from == index or moved_from >= self.count or not self.valid[moved_from]:
+            return
+        if index < self.count:
+            self.order[self.where[moved_from]] = index
+            self.where[index] = self.where[moved_from]
+            self.cells[index] = self.cells[moved_from]
+            self.valid[index] = True
+        else:
+            self.order[self.where[moved_from]] = -1
+        self.valid[moved_from] = False
+
+    def expand(self, buckets):
+        """Items in each of the given buckets, as (index of the bucket in buckets, item) arrays."""
+        first = self.bucket_starts[buckets]
+        lengths = self.bucket_starts[buckets + 1] - first
+        return self.expand_ranges(first, lengths)
+
+    def expand_ranges(self, first, lengths):
+        # Concatenate order[first[k]:first[k] + lengths[k]] for every k, remembering k
+        total = int(lengths.sum())
+        ends = np.cumsum(lengths)
+        owners = np.repeat(np.arange(len(first)), lengths)
+        return owners, self.order[np.repeat(first - (ends - lengths), lengths) + np.arange(total)]
+
+    def candidates(self, cell_x, cell_z):
+        """Items bucketed with any of the given cells (may include others sharing a bucket)."""
+        _, items = self.expand(np.unique(self.bucket(np.asarray(cell_x), np.asarray(cell_z))))
+        return items[items >= 0]
+
+    def query_radius(self, point, radius):
+        """Sorted items whose center is within radius of point on the XZ plane."""
+        if not self.count:
+            return np.zeros(0, dtype=np.int64)
+        (low_x, high_x), (low_z, high_z) = self.cell_of([point[0] - radius, point[0] + radius],
+                                                        [point[2] - radius, point[2] + radius])
+        cell_x, cell_z = np.meshgrid(np.arange(low_x, high_x + 1), np.arange(low_z, high_z + 1))
+        items = self.candidates(cell_x.ravel(), cell_z.ravel())
+
+        dx = self.positions[items, 0] - point[0]
+        dz = self.positions[items, 2] - point[2]
+        return np.sort(items[dx * dx + dz * dz < radius * radius])
+
+    def query_segments(self, starts, ends, radius):
+        """Items whose center is within radius of 3D segments, all queried at once.
+
+        starts and ends are (N, 3); radius is a scalar or one per segment.
+        Returns (segments, items, t) sorted by segment and then by t, the
+        fraction of the way along the segment to the item's closest point.
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(ends, dtype=np.float64).reshape(-1, 3) - starts
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (len(starts),))
+        if not self.count or not len(starts):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+
+        # Cells within radius of points spaced at most a cell apart along each segment
+        steps = int(np.ceil(np.hypot(directions[:, 0], directions[:, 2]).max() / self.cell_size)) + 1
+        samples = starts[:, np.newaxis] + np.linspace(0.0, 1.0, steps)[:, np.newaxis] * directions[:, np.newaxis]
+        reach = int(np.ceil(radius.max() / self.cell_size))
+        offsets = np.arange(-reach, reach + 1)
+        sample_x, sample_z = self.cell_of(samples[..., 0], samples[..., 2])
+        buckets = self.bucket(sample_x[..., np.newaxis, np.newaxis] + offsets[:, np.newaxis],
+                              sample_z[..., np.newaxis, np.newaxis] + offsets)
+
+        # Each segment visits each of its buckets once
+        keys = np.unique(np.arange(len(starts))[:, np.newaxis] * self.table_size + buckets.reshape(len(starts), -1))
+        owners, items = self.expand(keys % self.table_size)
+        segments = keys[owners] // self.table_size
+        valid = items >= 0
+        segments, items = segments[valid], items[valid]
+
+        # Closest point on each segment to its candidates
+        offset = self.positions[items] - starts[segments]
+        direction = directions[segments]
+        length_sq = np.einsum('ij,ij->i', direction, direction)
+        t = np.clip(np.einsum('ij,ij->i', offset, direction) / np.maximum(length_sq, 1e-12), 0.0, 1.0)
+        closest = offset - t[:, np.newaxis] * direction
+        hit = np.einsum('ij,ij->i', closest, closest) < radius[segments] ** 2
+
+        segments, items, t = segments[hit], items[hit], t[hit]
+        along = np.lexsort((items, t, segments))
+        return segments[along], items[along], t[along]
+
+    def pairs(self, radius, sources=None):
+        """(i, j) arrays of the pairs of items within radius of each other on the XZ plane.
+
+        Each pair is listed once (rarely twice, when the cells it spans share
+        buckets with others). radius should not exceed the cell size, so
+        neighbours are in adjacent cells. At most max_per_cell neighbours are
+        taken from each bucket, bounding the cost where items pile up. With
+        sources, only pairs listed under those items are found, so splitting
+        the items into groups over several calls still finds every pair once.
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if sources is None:
+            sources = np.flatnonzero(self.valid)
+        else:
+            sources = np.asarray(sources, dtype=np.int64)
+            sources = sources[self.valid[sources]]
+        if not len(sources):
+            return empty, empty
+        cells = self.cells[sources]
+
+        # Later items in the source's own bucket, then every item in the four
+        # cells ahead of it, together cover each neighbouring pair once
+        own = self.bucket(cells[:, 0], cells[:, 1])
+        ranges = [(self.where[sources] + 1, self.bucket_starts[own + 1])]
+        seen = [own]
+        for offset_x, offset_z in ((1, -1), (1, 0), (1, 1), (0, 1)):
+            buckets = self.bucket(cells[:, 0] + offset_x, cells[:, 1] + offset_z)
+            fresh = np.logical_and.reduce([buckets != previous for previous in seen])
+            seen.append(buckets)
+            ranges.append((self.bucket_starts[buckets], np.where(fresh, self.bucket_starts[buckets + 1], 0)))
+
+        found_i, found_j = [], []
+        for first, end in ranges:
+            # Expand each source's bucket range into (source, neighbour) pairs
+            owners, neighbours = self.expand_ranges(first, np.clip(end - first, 0, self.max_per_cell))
+            found_i.append(sources[owners])
+            found_j.append(neighbours)
+
+        i = np.concatenate(found_i)
+        j = np.concatenate(found_j)
+
+        # Contiguous columns gather far faster than fancy indexing the (N, 3)
+        # array; removed items (-1) are dropped along with the distant ones
+        x = self.positions[:self.count, 0].copy()
+        z = self.positions[:self.count, 2].copy()
+        dx = x[i] - x[j]
+        dz = z[i] - z[j]
+        close = (dx * dx + dz * dz < radius * radius) & (j >= 0)
+        return i[close], j[close]
@@ -1,74 +1,236 @@
-import pygame
 import math
-import random
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
+from .vertex_buffer import VertexBuffer
+from .terrain_lod import lod_levels, build_lod_indices, max_lod_level
+from .terrain_cache import TerrainCache, CACHE_VERSION
+
+def block_reduce(grid, block, reduce):
+    """Reduce (np.minimum or np.maximum) a vertex grid over square blocks of cells.
+    
+    grid has shape (n * block + 1, m * block + 1); every block includes the
+    vertices it shares with its neighbours. Returns an (n, m) array.
+    """
+    starts = np.arange(0, len(grid) - 1, block)
+    rows = reduce(reduce.reduceat(grid[:-1], starts, axis=0), grid[block::block])
+    starts = np.arange(0, grid.shape[1] - 1, block)
+    return reduce(reduce.reduceat(rows[:, :-1], starts, axis=1), rows[:, block::block])
+
+def interpolate_cells(h1, h2, h3, h4, fx, fz, cell_size, normals=False):
+    """Bilinear interpolation inside grid cells, shared by the batched queries.
+    
+    h1..h4 are the (x, z), (x + 1, z), (x, z + 1) and (x + 1, z + 1) corner
+    heights and fx/fz the fractional position inside each cell.
+    """
+    height1 = h1 * (1 - fx) + h2 * fx
+    height2 = h3 * (1 - fx) + h4 * fx
+    heights = height1 * (1 - fz) + height2 * fz
+    
+    if not normals:
+        return heights
+    
+    # Surface normal from the partial derivatives of the bilinear patch
+    dh_dx = ((h2 - h1) * (1 - fz) + (h4 - h3) * fz) / cell_size
+    dh_dz = (height2 - height1) / cell_size
+    surface_normals = np.stack([-dh_dx, np.ones_like(dh_dx), -dh_dz], axis=1)
+    surface_normals /= np.linalg.norm(surface_normals, axis=1, keepdims=True)
+    
+    return heights, surface_normals
+
+
+def crater_falloff(origin, cell_size, resolution, x, z, radius):
+    """Vertices of a (resolution + 1)^2 grid at origin within radius of world (x, z).
+    
+    Returns ((z0, z1, x0, x1), falloff), the window of the grid the crater
+    covers and a smooth 1-at-the-centre, 0-at-the-rim weight for each of
+    its vertices, or None if it misses the grid.
+    """
+    x0 = max(0, math.ceil((x - radius - origin[0]) / cell_size))
+    x1 = min(resolution, math.floor((x + radius - origin[0]) / cell_size)) + 1
+    z0 = max(0, math.ceil((z - radius - origin[1]) / cell_size))
+    z1 = min(resolution, math.floor((z + radius - origin[1]) / cell_size)) + 1
+    if x0 >= x1 or z0 >= z1:
+        return None
+    
+    world_x = origin[0] + np.arange(x0, x1) * cell_size
+    world_z = origin[1] + np.arange(z0, z1) * cell_size
+    distance_sq = (world_x[np.newaxis, :] - x) ** 2 + (world_z[:, np.newaxis] - z) ** 2
+    falloff = np.clip(1.0 - distance_sq / (radius * radius), 0.0, 1.0) ** 2
+    if not falloff.any():
+        return None
+    return (z0, z1, x0, x1), falloff
+
+
+class ProceduralHeights:
+    """Layered noise heights on an integer vertex lattice.
+    
+    Lattice vertex (gx, gz) maps to the normalized noise coordinates
+    (gx / resolution - 0.5, gz / resolution - 0.5), so a Terrain patch at
+    grid offset (0, 0) reproduces the classic map and neighbouring patches
+    sample exactly the same vertices along their shared edges.
+    """
+    # Parameters for our noise
+    NOISE_SCALE = 15.0      # Higher values = more stretched out
+    NOISE_OCTAVES = 4       # Number of layers of detail
+    NOISE_PERSISTENCE = 0.5 # How much each octave contributes
+    NOISE_LACUNARITY = 2.0  # How frequency increases each octave
+    
+    def __init__(self, seed=None, resolution=50):
+        self.seed = seed  # None keeps the classic unseeded layout
+        self.resolution = resolution
+        
+        # Lattice vertex that sits at the world origin
+        self.center = (resolution / 2, resolution / 2)
+        
+        # Per-octave offsets into noise space, derived from the seed
+        self.offsets = self.make_offsets(seed)
+    
+    @classmethod
+    def make_offsets(cls, seed):
+        if seed is None:
+            return np.zeros((cls.NOISE_OCTAVES, 2))
+        rng = np.random.default_rng(seed)
+        return rng.uniform(-1000.0, 1000.0, size=(cls.NOISE_OCTAVES, 2))
+    
+    def cache_key(self):
+        # Everything that affects the generated heights
+        return {
+            'source': 'procedural',
+            'seed': self.seed,
+            'resolution': self.resolution,
+            'scale': self.NOISE_SCALE,
+            'octaves': self.NOISE_OCTAVES,
+            'persistence': self.NOISE_PERSISTENCE,
+            'lacunarity': self.NOISE_LACUNARITY,
+        }
+    
+    def __call__(self, gx, gz):
+        """Heights at lattice vertices; gx and gz broadcast against each other."""
+        nx = np.asarray(gx) / self.resolution - 0.5
+        ny = np.asarray(gz) / self.resolution - 0.5
+        return self.noise_heights(nx, ny)
+    
+    def noise_heights(self, nx, ny):
+        """Evaluate the layered noise height for normalized coordinates.
+        
+        nx and ny are broadcast against each other, so passing a row and a
+        column vector yields a full grid of heights.
+        """
+        nx = np.asarray(nx, dtype=np.float64)
+        ny = np.asarray(ny, dtype=np.float64)
+        height = np.zeros(np.broadcast_shapes(nx.shape, ny.shape))
+        amplitude = 1.0
+        frequency = 1.0
+        
+        # Apply several octaves of noise for more natural terrain
+        for i in range(self.NOISE_OCTAVES):
+            sx = nx * frequency * self.NOISE_SCALE + self.offsets[i, 0]
+            sy = ny * frequency * self.NOISE_SCALE + self.offsets[i, 1]
+            height += self.noise2d_array(sx, sy) * amplitude
+            amplitude *= self.NOISE_PERSISTENCE
+            frequency *= self.NOISE_LACUNARITY
+        
+        # Scale and offset the height
+        height *= 2.0  # Scale height by 2 units
+        
+        # Create valleys where height is below a threshold
+        valleys = height < -0.3
+        height[valleys] = -0.3 + (height[valleys] + 0.3) * 0.3  # Flatten valleys
+        
+        return height
+    
+    @staticmethod
+    def noise2d_array(x, y):
+        # Simple coherent noise: a sine hash of the position, element-wise
+        n = x * 12.9898 + y * 78.233
+        return np.mod(np.sin(n) * 43758.5453, 1.0)
+
 
 class Terrain:
-    def __init__(self, size=100, resolution=50):
+    # Level of detail: patches closer than LOD_DISTANCE use full resolution,
+    # each doubling of distance halves the detail, and patches further than
+    # VIEW_DISTANCE (past the fog) are not drawn at all
+    LOD_DISTANCE = 24.0
+    VIEW_DISTANCE = 100.0
+    
+    def __init__(self, size=100, resolution=50, seed=None, grid_offset=(0, 0),
+                 height_source=None, heights=None, create_mesh=True, patch_size=16,
+                 cache_dir=None):
         self.size = size  # Size of the terrain in world units
         self.resolution = resolution  # Grid resolution
+        self.seed = seed
         self.heights = None
         self.cell_size = size / resolution
+        self.mesh = None
+        
+        # Split the grid into LOD patches; the patch size has to be a power of
+        # two that divides the resolution, otherwise LOD is effectively off
+        while patch_size > 1 and resolution % patch_size:
+            patch_size //= 2
+        self.patch_size = patch_size if patch_size > 1 else resolution
+        self.patch_count = resolution // self.patch_size
+        self.max_lod = max_lod_level(self.patch_size) if patch_size > 1 else 0
+        self.lod_key = None  # Levels the current index buffer was built for
+        self.triangle_count = 0
+        self.patch_bounds_cache = None  # World AABBs per patch, rebuilt after deformation
+        self.height_version = 0  # Bumped whenever the heights change
+        
+        # Where the heights come from, and where this patch sits on its lattice
+        self.height_source = height_source or ProceduralHeights(seed, resolution)
+        self.grid_offset = grid_offset
+        center = self.height_source.center
+        self.origin = ((grid_offset[0] - center[0]) * self.cell_size,
+                       (grid_offset[1] - center[1]) * self.cell_size)  # World x/z of vertex (0, 0)
+        
+        # Optional on-disk cache of the generated heights and baked vertices
+        self.cache = TerrainCache(cache_dir) if cache_dir else None
+        self.cached_vertices = None
+        
+        # Generate heightmap unless one was handed to us or is cached
+        if heights is not None:
+            self.heights = heights
+        elif not self.load_cache():
+            self.generate_heightmap()
         
-        # Generate heightmap
-        self.generate_heightmap()
-        self.create_display_list()
+        # Building the GPU mesh needs a GL context, so background workers skip it
+        if create_mesh:
+            self.create_mesh()
         
     def generate_heightmap(self):
-        # Create a random heightmap using Perlin-like noise
-        self.heights = np.zeros((self.resolution + 1, self.resolution + 1))
-        
-        # Parameters for our noise
-        scale = 15.0  # Higher values = more stretched out
-        octaves = 4   # Number of layers of detail
-        persistence = 0.5  # How much each octave contributes
-        lacunarity = 2.0   # How frequency increases each octave
-        
-        # Generate height values
-        for y in range(self.resolution + 1):
-            for x in range(self.resolution + 1):
-                nx = x / self.resolution - 0.5
-                ny = y / self.resolution - 0.5
-                
-                # Apply several octaves of noise for more natural terrain
-                height = 0
-                amplitude = 1.0
-                frequency = 1.0
-                
-                for i in range(octaves):
-                    sx = nx * frequency * scale
-                    sy = ny * frequency * scale
-                    
-                    # Simple coherent noise function
-                    value = self.noise2d(sx, sy)
-                    
-                    height += value * amplitude
-                    amplitude *= persistence
-                    frequency *= lacunarity
-                
-                # Scale and offset the height
-                height = height * 2.0  # Scale height by 2 units
-                
-                # Create valleys where height is below a threshold
-                if height < -0.3:
-                    height = -0.3 + (height + 0.3) * 0.3  # Flatten valleys
-                
-                # Store the height
-                self.heights[y, x] = height
-    
-    def noise2d(self, x, y):
-        # Simple coherent noise function
-        # In a real implementation, you would use a proper noise library
-        # This is a simple approximation
-        n = x * 12.9898 + y * 78.233
-        return math.sin(n) * 43758.5453 % 1.0
+        # Create a random heightmap using Perlin-like noise.
+        # Every octave is evaluated over the whole grid at once with NumPy.
+        gx = self.grid_offset[0] + np.arange(self.resolution + 1)
+        gz = self.grid_offset[1] + np.arange(self.resolution + 1)
+        self.heights = self.height_source(gx[np.newaxis, :], gz[:, np.newaxis])
+    
+    def cache_slot(self):
+        return f"terrain_{self.size}_{self.resolution}_{self.grid_offset[0]}_{self.grid_offset[1]}"
+    
+    def cache_key(self):
+        key = {
+            'version': CACHE_VERSION,
+            'size': self.size,
+            'resolution': self.resolution,
+            'grid_offset': list(self.grid_offset),
+        }
+        key.update(self.height_source.cache_key())
+        return key
+    
+    def load_cache(self):
+        # Memory-map heights and vertices from disk if the cached key matches
+        if self.cache is None:
+            return False
+        cached = self.cache.load(self.cache_slot(), self.cache_key())
+        if cached is None:
+            return False
+        self.heights, self.cached_vertices = cached
+        return True
     
     def get_height(self, x, z):
         # Convert world coordinates to grid coordinates
-        grid_x = (x + self.size / 2) / self.cell_size
-        grid_z = (z + self.size / 2) / self.cell_size
+        grid_x = (x - self.origin[0]) / self.cell_size
+        grid_z = (z - self.origin[1]) / self.cell_size
         
         # Clamp to grid boundaries
         grid_x = max(0, min(self.resolution, grid_x))
@@ -101,94 +263,222 @@ class Terrain:
         
         return height
     
-    def create_display_list(self):
-        # Create display list for faster rendering
-        self.display_list = glGenLists(1)
-        glNewList(self.display_list, GL_COMPILE)
-        
-        # Base terrain colors
-        grass_color = (0.3, 0.5, 0.2)  # Darker grass
-        dirt_color = (0.6, 0.5, 0.3)   # Brown dirt
-        stone_color = (0.5, 0.5, 0.5)   # Gray stone
-        
-        # Render ground as triangle strips
-        half_size = self.size / 2
-        
-        for z in range(self.resolution):
-            glBegin(GL_TRIANGLE_STRIP)
-            for x in range(self.resolution + 1):
-                # Calculate world coordinates
-                world_x1 = x * self.cell_size - half_size
-                world_z1 = z * self.cell_size - half_size
-                world_z2 = (z + 1) * self.cell_size - half_size
-                
-                # Get heights
-                height1 = self.heights[z, x]
-                height2 = self.heights[z + 1, x]
-                
-                # Calculate normal for lighting
-                # Simple normal calculation based on neighbors
-                nx1 = self.heights[z, min(x+1, self.resolution)] - self.heights[z, max(x-1, 0)]
-                nz1 = self.heights[min(z+1, self.resolution), x] - self.heights[max(z-1, 0), x]
-                normal1 = [-nx1, 2.0, -nz1]
-                
-                nx2 = self.heights[z+1, min(x+1, self.resolution)] - self.heights[z+1, max(x-1, 0)]
-                nz2 = self.heights[min(z+2, self.resolution), x] - self.heights[z, x]
-                normal2 = [-nx2, 2.0, -nz2]
-                
-                # Normalize normals
-                length1 = math.sqrt(normal1[0]**2 + normal1[1]**2 + normal1[2]**2)
-                length2 = math.sqrt(normal2[0]**2 + normal2[1]**2 + normal2[2]**2)
-                
-                if length1 > 0:
-                    normal1 = [n / length1 for n in normal1]
-                if length2 > 0:
-                    normal2 = [n / length2 for n in normal2]
-                
-                # Color based on height and slope
-                slope1 = abs(normal1[1])  # How flat the surface is (0-1)
-                slope2 = abs(normal2[1])
-                
-                # Choose color based on height and slope
-                if height1 > 0.9:  # Mountain peaks
-                    color1 = stone_color
-                elif slope1 < 0.8:  # Steep slope = dirt
-                    color1 = dirt_color
-                else:  # Flatter areas = grass
-                    color1 = grass_color
-                    
-                if height2 > 0.9:
-                    color2 = stone_color
-                elif slope2 < 0.8:
-                    color2 = dirt_color
-                else:
-                    color2 = grass_color
-                
-                # Add some height-based color variation
-                color1 = (color1[0] * (0.8 + height1 * 0.4),
-                          color1[1] * (0.8 + height1 * 0.4),
-                          color1[2] * (0.8 + height1 * 0.4))
-                
-                color2 = (color2[0] * (0.8 + height2 * 0.4),
-                          color2[1] * (0.8 + height2 * 0.4),
-                          color2[2] * (0.8 + height2 * 0.4))
-                
-                # Draw vertices with calculated normals and colors
-                glNormal3fv(normal1)
-                glColor3fv(color1)
-                glVertex3f(world_x1, height1, world_z1)
-                
-                glNormal3fv(normal2)
-                glColor3fv(color2)
-                glVertex3f(world_x1, height2, world_z2)
-            
-            glEnd()
-        
-        glEndList()
+    @property
+    def grid_origin(self):
+        # World x/z of lattice vertex (0, 0), for lattice-space queries
+        return self.origin
+    
+    def vertex_heights(self, ix, iz):
+        """Heights at integer grid vertices, clamped to the grid like get_height."""
+        ix = np.clip(ix, 0, self.resolution)
+        iz = np.clip(iz, 0, self.resolution)
+        return self.heights[iz, ix]
+    
+    def sample_many(self, points, normals=False):
+        """Batched version of get_height.
+        
+        points is an (N, 2) array-like of world (x, z) pairs. Returns an (N,)
+        array of heights, or (heights, normals) with (N, 3) unit surface
+        normals when normals=True.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        
+        # Convert world coordinates to grid coordinates and clamp to the grid
+        grid_x = np.clip((points[:, 0] - self.origin[0]) / self.cell_size, 0, self.resolution)
+        grid_z = np.clip((points[:, 1] - self.origin[1]) / self.cell_size, 0, self.resolution)
+        
+        # Determine grid cells, keeping the last row/column inside the grid
+        cell_x = np.minimum(grid_x.astype(np.intp), self.resolution - 1)
+        cell_z = np.minimum(grid_z.astype(np.intp), self.resolution - 1)
+        
+        # Get fractional parts for interpolation
+        fx = grid_x - cell_x
+        fz = grid_z - cell_z
+        
+        # Corner heights of each cell
+        h1 = self.heights[cell_z, cell_x]
+        h2 = self.heights[cell_z, cell_x + 1]
+        h3 = self.heights[cell_z + 1, cell_x]
+        h4 = self.heights[cell_z + 1, cell_x + 1]
+        
+        return interpolate_cells(h1, h2, h3, h4, fx, fz, self.cell_size, normals)
+    
+    # Base terrain colors
+    GRASS_COLOR = (0.3, 0.5, 0.2)  # Darker grass
+    DIRT_COLOR = (0.6, 0.5, 0.3)   # Brown dirt
+    STONE_COLOR = (0.5, 0.5, 0.5)  # Gray stone
+    
+    # Vertex layout of the terrain mesh: position, normal, color
+    MESH_LAYOUT = [('position', 3), ('normal', 3), ('color', 3)]
+    
+    def build_vertices(self, z0=0, z1=None, x0=0, x1=None):
+        """Interleaved position/normal/color data for grid rows z0..z1 and columns x0..x1.
+        
+        Both ranges are exclusive at the end and default to the whole grid.
+        Returns a float32 array of shape ((z1 - z0) * (x1 - x0), 9) in the
+        same row-major order as the vertex buffer, so a sub-range can be
+        patched in place when the heights change.
+        """
+        if z1 is None:
+            z1 = self.resolution + 1
+        if x1 is None:
+            x1 = self.resolution + 1
+        
+        # Take one extra row and column on each side (clamped at the edges) for the normals
+        rows = np.clip(np.arange(z0 - 1, z1 + 1), 0, self.resolution)
+        columns = np.clip(np.arange(x0 - 1, x1 + 1), 0, self.resolution)
+        block = np.asarray(self.heights[np.ix_(rows, columns)], dtype=np.float64)
+        heights = block[1:-1, 1:-1]
+        
+        # Normals from central differences of the neighbouring heights
+        nx = block[1:-1, 2:] - block[1:-1, :-2]
+        nz = block[2:, 1:-1] - block[:-2, 1:-1]
+        normals = np.stack([-nx, np.full_like(nx, 2.0), -nz], axis=-1)
+        normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+        
+        # Color based on height and slope (flatness is the normal's y component)
+        slope = np.abs(normals[..., 1])
+        colors = np.where((slope < 0.8)[..., np.newaxis], self.DIRT_COLOR, self.GRASS_COLOR)
+        colors = np.where((heights > 0.9)[..., np.newaxis], self.STONE_COLOR, colors)
+        
+        # Add some height-based color variation
+        colors = colors * (0.8 + heights * 0.4)[..., np.newaxis]
+        
+        # World coordinates of every vertex
+        world_x = self.origin[0] + np.arange(x0, x1) * self.cell_size
+        world_z = self.origin[1] + np.arange(z0, z1) * self.cell_size
+        
+        vertices = np.empty(heights.shape + (9,), dtype=np.float32)
+        vertices[..., 0] = world_x[np.newaxis, :]
+        vertices[..., 1] = heights
+        vertices[..., 2] = world_z[:, np.newaxis]
+        vertices[..., 3:6] = normals
+        vertices[..., 6:9] = colors
+        
+        return vertices.reshape(-1, 9)
+    
+    def build_indices(self):
+        """Two triangles per grid cell, indexing the row-major vertex grid."""
+        row = self.resolution + 1
+        x, z = np.meshgrid(np.arange(self.resolution), np.arange(self.resolution))
+        a = (z * row + x).ravel()  # Top-left corner of each cell
+        b = a + 1
+        c = a + row
+        d = c + 1
+        return np.stack([a, c, b, b, c, d], axis=1).astype(np.uint32).ravel()
+    
+    def bake_vertices(self):
+        """Vertex data for the whole grid, taken from (or written to) the disk cache."""
+        if self.cached_vertices is not None:
+            return self.cached_vertices
+        vertices = self.build_vertices()
+        if self.cache is not None:
+            self.cache.save(self.cache_slot(), self.cache_key(), self.heights, vertices)
+        return vertices
+    
+    def create_mesh(self, vertices=None):
+        # Upload the whole grid into one interleaved VBO with an index buffer.
+        # Vertices baked ahead of time (e.g. on a worker thread) can be passed in.
+        if vertices is None:
+            vertices = self.bake_vertices()
+        self.mesh = VertexBuffer(vertices, self.build_indices(), self.MESH_LAYOUT)
+        self.lod_key = None
+        self.triangle_count = self.resolution * self.resolution * 2
+    
+    def deform(self, x, z, radius, depth):
+        """Dent the terrain around world point (x, z).
+        
+        Vertices within radius are lowered by depth times a smooth falloff
+        (negative depth raises them). Only the touched vertices and their
+        direct neighbours get new normals and colors, and only those rows
+        of the vertex buffer are re-uploaded. Returns True if any vertex
+        changed.
+        """
+        window = crater_falloff(self.origin, self.cell_size, self.resolution, x, z, radius)
+        if window is None:
+            return False
+        (z0, z1, x0, x1), falloff = window
+        
+        if not self.heights.flags.writeable:
+            self.heights = np.array(self.heights)
+        self.heights[z0:z1, x0:x1] -= depth * falloff
+        self.patch_bounds_cache = None
+        self.height_version += 1
+        
+        # Normals of the neighbouring ring change too
+        self.update_region(max(0, z0 - 1), min(self.resolution + 1, z1 + 1),
+                           max(0, x0 - 1), min(self.resolution + 1, x1 + 1))
+        return True
+    
+    def update_region(self, z0, z1, x0, x1):
+        # Re-bake a window of vertices and patch just those spans of the VBO
+        if self.mesh is None:
+            return
+        row_length = self.resolution + 1
+        vertices = self.build_vertices(z0, z1, x0, x1).reshape(z1 - z0, x1 - x0, 9)
+        if x0 == 0 and x1 == row_length:
+            self.mesh.update(vertices, first_vertex=z0 * row_length)
+            return
+        for row in range(z0, z1):
+            self.mesh.update(vertices[row - z0], first_vertex=row * row_length + x0)
+    
+    def patch_bounds(self):
+        """World-space AABB corners (mins, maxs) of every LOD patch, each (patches, patches, 3)."""
+        if self.patch_bounds_cache is not None:
+            return self.patch_bounds_cache
+        
+        P, count = self.patch_size, self.patch_count
+        corners = np.arange(count) * P * self.cell_size
+        mins = np.empty((count, count, 3))
+        mins[..., 0] = self.origin[0] + corners[np.newaxis, :]
+        mins[..., 1] = block_reduce(self.heights, P, np.minimum)
+        mins[..., 2] = self.origin[1] + corners[:, np.newaxis]
+        maxs = mins + P * self.cell_size
+        maxs[..., 1] = block_reduce(self.heights, P, np.maximum)
+        self.patch_bounds_cache = (mins, maxs)
+        return self.patch_bounds_cache
+    
+    def bounds(self):
+        """World-space AABB (min, max) of the whole grid."""
+        mins, maxs = self.patch_bounds()
+        return mins.reshape(-1, 3).min(axis=0), maxs.reshape(-1, 3).max(axis=0)
+    
+    def select_lod(self, camera_position, frustum=None):
+        """Pick a LOD level per patch from the camera and rebuild the indices if needed.
+        
+        With a frustum, patches outside it are left out of the index buffer.
+        """
+        # Patch corners, including one ring of neighbours outside this grid
+        corners = np.arange(-1, self.patch_count + 1) * self.patch_size * self.cell_size
+        patch_x = self.origin[0] + corners[np.newaxis, :]
+        patch_z = self.origin[1] + corners[:, np.newaxis]
+        levels = lod_levels(patch_x, patch_z, self.patch_size * self.cell_size,
+                            camera_position[0], camera_position[2],
+                            self.LOD_DISTANCE, self.VIEW_DISTANCE, self.max_lod)
+        
+        # Culled patches are dropped like ones past the view distance. The
+        # neighbour ring is left alone, so seams still match other chunks.
+        if frustum is not None:
+            mins, maxs = self.patch_bounds()
+            visible = frustum.boxes_visible(mins.reshape(-1, 3), maxs.reshape(-1, 3), 'terrain patches')
+            levels[1:-1, 1:-1][~visible.reshape(self.patch_count, self.patch_count)] = -1
+        
+        key = levels.tobytes()
+        if key != self.lod_key:
+            indices = build_lod_indices(levels, self.patch_size, self.resolution + 1)
+            self.mesh.set_indices(indices)
+            self.lod_key = key
+            self.triangle_count = len(indices) // 3
     
     def render(self):
-        # Render the terrain using the display list
-        glCallList(self.display_list)
+        # Render the whole terrain in a single indexed draw call
+        self.mesh.render()
+    
+    def delete(self):
+        # Release the GPU buffers
+        if self.mesh is not None:
+            self.mesh.delete()
+            self.mesh = None
     
     def check_collision(self, position):
         # Get terrain height at position
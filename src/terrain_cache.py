@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Bump whenever the baked vertex layout or colouring changes
+CACHE_VERSION = 1
+TERRAIN_CACHE_DIR = os.path.join('.cache', 'terrain')
+
+class TerrainCache:
+    """Generated terrain arrays stored as .npy files and loaded memory-mapped.
+
+    Each cache entry lives in a slot named after the terrain's size,
+    resolution and grid offset. A JSON key next to the arrays records every
+    generation parameter; if the stored key differs from the requested one
+    the entry is treated as stale and rebuilt.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def paths(self, slot):
+        base = os.path.join(self.cache_dir, slot)
+        return base + '.key.json', base + '.heights.npy', base + '.vertices.npy'
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def load(self, slot, key):
+        """Return memory-mapped (heights, vertices) for slot, or None if missing or stale."""
+        key_path, heights_path, vertices_path = self.paths(slot)
+        try:
+            with open(key_path, 'r') as f:
+                stored = json.load(f)
+            if stored.get('digest') != self.digest(key):
+                return None
+
+            # Copy-on-write maps: edits (e.g. deformation) never touch the file
+            heights = np.load(heights_path, mmap_mode='c')
+            vertices = np.load(vertices_path, mmap_mode='c')
+            return heights, vertices
+        except (OSError, ValueError):
+            return None
+
+    def save(self, slot, key, heights, vertices):
+        key_path, heights_path, vertices_path = self.paths(slot)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # Invalidate the old entry before its arrays are replaced
+            if os.path.exists(key_path):
+                os.remove(key_path)
+
+            # Write the arrays first and the key last, each via a rename, so a
+            # crash mid-write never leaves a valid key pointing at bad data
+            for path, array in ((heights_path, heights), (vertices_path, vertices)):
+                temp_path = path + '.tmp'
+                with open(temp_path, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(temp_path, path)
+
+            temp_path = key_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({'digest': self.digest(key), 'key': key}, f, sort_keys=True, indent=2)
+            os.replace(temp_path, key_path)
+        except OSError as e:
+            print(f"Could not write terrain cache {key_path}: {e}")
@@ -0,0 +1,134 @@
+import math
+import numpy as np
+
+# Geomipmapping helpers for Terrain.
+#
+# The grid is split into square patches of patch_size cells. A patch at
+# LOD level L samples every 2**L-th vertex. Along an edge shared with a
+# coarser neighbour the patch switches to the neighbour's step, and a ring
+# of "zipper" triangles joins that edge to the patch interior. Both sides
+# of every seam then use exactly the same vertices, so no cracks appear.
+
+# (patch_size, step, north, east, south, west edge steps) -> (T, 3, 2) local x/z
+_templates = {}
+
+def max_lod_level(patch_size):
+    # Keep at least two steps across a patch so the stitching ring has an interior
+    return max(0, int(math.log2(patch_size)) - 1)
+
+def lod_levels(patch_min_x, patch_min_z, patch_extent, camera_x, camera_z,
+               lod_distance, view_distance, max_level):
+    """LOD level of every patch from its horizontal distance to the camera.
+
+    patch_min_x/patch_min_z give the world-space corner of each patch. The
+    level only depends on world positions, so separate Terrain objects
+    (e.g. neighbouring chunks) agree on the level of any shared patch.
+    Patches beyond view_distance get level -1 (not drawn).
+    """
+    dx = np.maximum(np.maximum(patch_min_x - camera_x, camera_x - (patch_min_x + patch_extent)), 0)
+    dz = np.maximum(np.maximum(patch_min_z - camera_z, camera_z - (patch_min_z + patch_extent)), 0)
+    distance = np.hypot(dx, dz)
+
+    levels = np.floor(np.log2(np.maximum(distance, 1e-6) / lod_distance)).astype(np.int64) + 1
+    levels = np.clip(levels, 0, max_level)
+    levels[distance > view_distance] = -1
+    return levels
+
+def _zipper(outer, inner):
+    """Triangulate the strip between two polylines sorted along the same axis."""
+    triangles = []
+    i = j = 0
+    while i < len(outer) - 1 or j < len(inner) - 1:
+        advance_outer = j == len(inner) - 1 or (i < len(outer) - 1 and outer[i + 1][0] <= inner[j + 1][0])
+        if advance_outer:
+            triangles.append((outer[i], outer[i + 1], inner[j]))
+            i += 1
+        else:
+            triangles.append((outer[i], inner[j + 1], inner[j]))
+            j += 1
+    return triangles
+
+def patch_template(patch_size, step, edge_steps):
+    """Triangles of one patch in local vertex coordinates.
+
+    edge_steps is the (north, east, south, west) vertex step along each
+    edge, i.e. max(step, neighbour step). Returns an int array of shape
+    (T, 3, 2) holding (x, z) per corner, wound like Terrain.build_indices.
+    """
+    key = (patch_size, step) + tuple(edge_steps)
+    template = _templates.get(key)
+    if template is not None:
+        return template
+
+    P, s = patch_size, step
+    triangles = []
+
+    # Interior cells at the patch's own step
+    for z in range(s, P - s, s):
+        for x in range(s, P - s, s):
+            a, b, c, d = (x, z), (x + s, z), (x, z + s), (x + s, z + s)
+            triangles += [(a, c, b), (b, c, d)]
+
+    # Four trapezoids between the outer edge and the interior ring. Points
+    # are (t, x, z) so the zipper can walk along t on every side.
+    inner_t = range(s, P - s + 1, s)
+    north, east, south, west = edge_steps
+    sides = [
+        ([(t, t, 0) for t in range(0, P + 1, north)], [(t, t, s) for t in inner_t]),
+        ([(t, P, t) for t in range(0, P + 1, east)], [(t, P - s, t) for t in inner_t]),
+        ([(t, t, P) for t in range(0, P + 1, south)], [(t, t, P - s) for t in inner_t]),
+        ([(t, 0, t) for t in range(0, P + 1, west)], [(t, s, t) for t in inner_t]),
+    ]
+    for outer, inner in sides:
+        for triangle in _zipper(outer, inner):
+            triangles.append(tuple(point[1:] for point in triangle))
+
+    template = np.array(triangles, dtype=np.int64).reshape(-1, 3, 2)
+
+    # Match the winding of the full-resolution grid (negative area in x/z)
+    edge1 = template[:, 1] - template[:, 0]
+    edge2 = template[:, 2] - template[:, 0]
+    flip = edge1[:, 0] * edge2[:, 1] - edge1[:, 1] * edge2[:, 0] > 0
+    template[flip] = template[flip][:, [0, 2, 1]]
+
+    _templates[key] = template
+    return template
+
+def build_lod_indices(levels, patch_size, row_length):
+    """Index buffer for a grid of patches at the given LOD levels.
+
+    levels is a (patches + 2, patches + 2) array that includes a ring of
+    neighbour levels around the patches of this grid (-1 means not drawn).
+    row_length is the number of vertices per grid row.
+    """
+    inner = levels[1:-1, 1:-1]
+    pz, px = np.nonzero(inner >= 0)
+    if len(pz) == 0:
+        return np.zeros(0, dtype=np.uint32)
+
+    own = inner[pz, px]
+    steps = 1 << own
+    neighbours = np.stack([
+        levels[pz, px + 1],      # North (z - 1)
+        levels[pz + 1, px + 2],  # East (x + 1)
+        levels[pz + 2, px + 1],  # South (z + 1)
+        levels[pz + 1, px],      # West (x - 1)
+    ], axis=1)
+    # Hidden neighbours never show a seam, so just use our own step there
+    neighbour_steps = np.where(neighbours >= 0, 1 << np.maximum(neighbours, 0), steps[:, np.newaxis])
+    edge_steps = np.maximum(neighbour_steps, steps[:, np.newaxis])
+
+    keys = np.column_stack([steps, edge_steps])
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    chunks = []
+    for i, key in enumerate(unique_keys.tolist()):
+        template = patch_template(patch_size, key[0], key[1:])
+        members = inverse == i
+        origin_x = (px[members] * patch_size)[:, np.newaxis, np.newaxis]
+        origin_z = (pz[members] * patch_size)[:, np.newaxis, np.newaxis]
+        indices = (origin_z + template[np.newaxis, :, :, 1]) * row_length + origin_x + template[np.newaxis, :, :, 0]
+        chunks.append(indices.ravel())
+
+    return np.concatenate(chunks).astype(np.uint32)
@@ -0,0 +1,225 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# Fixed-function array setup for each named vertex attribute
+ATTRIBUTE_ARRAYS = {
+    'position': GL_VERTEX_ARRAY,
+    'normal': GL_NORMAL_ARRAY,
+    'color': GL_COLOR_ARRAY,
+    'texcoord': GL_TEXTURE_COORD_ARRAY,
+}
+
+# Storage formats a layout attribute can use: GL type, bytes per component,
+# whether shaders see it normalized, and the stored value of 1.0
+VERTEX_FORMATS = {
+    'float': (GL_FLOAT, 4, GL_FALSE, 1.0),
+    'snorm16': (GL_SHORT, 2, GL_TRUE, 32767.0),
+    'snorm8': (GL_BYTE, 1, GL_TRUE, 127.0),
+}
+
+class VertexBuffer:
+    """Interleaved vertex data in a VBO plus a uint32 (or uint16) index buffer.
+
+    layout is a list of (attribute, components) pairs such as
+    [('position', 3), ('normal', 3), ('color', 3)] describing one row of
+    the vertex array. Drawing goes through the fixed-function client
+    arrays, so lighting, fog and glColorMaterial keep working unchanged.
+
+    Attributes are float32 unless given a third, VERTEX_FORMATS entry, e.g.
+    ('position', 3, 'snorm16'). Each attribute starts on a 4-byte boundary.
+    Packed vertices are uploaded as raw rows of stride bytes. Quantized
+    positions decode to position * position_scale + position_offset, which
+    render() applies to the modelview matrix; shader users apply it
+    themselves.
+    """
+
+    def __init__(self, vertices, indices, layout, mode=GL_TRIANGLES, usage=GL_STATIC_DRAW,
+                 position_scale=1.0, position_offset=(0.0, 0.0, 0.0)):
+        self.layout = layout
+        self.mode = mode
+        self.usage = usage
+        self.position_scale = position_scale
+        self.position_offset = tuple(position_offset)
+
+        # (attribute, components, GL type, normalized, stored 1.0, byte offset) per layout entry
+        self.attributes = []
+        offset = 0
+        for attribute, components, *format in layout:
+            gl_type, size, normalized, unit = VERTEX_FORMATS[format[0] if format else 'float']
+            self.attributes.append((attribute, components, gl_type, normalized, unit, offset))
+            offset += (components * size + 3) // 4 * 4
+        self.stride = offset
+        self.packed = any(gl_type != GL_FLOAT for _, _, gl_type, _, _, _ in self.attributes)
+        self.floats_per_vertex = self.stride // 4
+        self.vertex_count = 0
+        self.index_count = 0
+        self.index_type = GL_UNSIGNED_INT
+        self.index_size = 4
+
+        self.vbo = glGenBuffers(1)
+        self.ibo = glGenBuffers(1)
+
+        self.upload(vertices)
+        self.set_indices(indices)
+
+    def rows(self, vertices):
+        if self.packed:
+            return np.ascontiguousarray(vertices).view(np.uint8).reshape(-1, self.stride)
+        return np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, self.floats_per_vertex)
+
+    def upload(self, vertices):
+        """Replace the whole vertex array."""
+        vertices = self.rows(vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, self.usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.vertex_count = len(vertices)
+
+    def update(self, vertices, first_vertex=0):
+        """Overwrite a contiguous range of vertices starting at first_vertex."""
+        vertices = self.rows(vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferSubData(GL_ARRAY_BUFFER, first_vertex * self.stride, vertices.nbytes, vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def set_indices(self, indices):
+        # uint16 indices are kept as they are, anything else becomes uint32
+        indices = np.asarray(indices)
+        dtype = np.uint16 if indices.dtype == np.uint16 else np.uint32
+        indices = np.ascontiguousarray(indices, dtype=dtype).ravel()
+        self.index_type = GL_UNSIGNED_SHORT if dtype == np.uint16 else GL_UNSIGNED_INT
+        self.index_size = indices.itemsize
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, self.usage)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.index_count = len(indices)
+
+    def bind(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+
+        for attribute, components, gl_type, _, _, offset in self.attributes:
+            pointer = ctypes.c_void_p(offset)
+            glEnableClientState(ATTRIBUTE_ARRAYS[attribute])
+            if attribute == 'position':
+                glVertexPointer(components, gl_type, self.stride, pointer)
+            elif attribute == 'normal':
+                glNormalPointer(gl_type, self.stride, pointer)
+            elif attribute == 'color':
+                glColorPointer(components, gl_type, self.stride, pointer)
+            elif attribute == 'texcoord':
+                glTexCoordPointer(components, gl_type, self.stride, pointer)
+
+    def unbind(self):
+        for attribute, *_ in self.layout:
+            glDisableClientState(ATTRIBUTE_ARRAYS[attribute])
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def bind_attributes(self, locations):
+        """Bind the vertex data to shader attributes instead of the fixed-function arrays.
+
+        locations maps layout attribute names to shader attribute locations;
+        attributes missing from it are skipped.
+        """
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+
+        for attribute, components, gl_type, normalized, _, offset in self.attributes:
+            location = locations.get(attribute, -1)
+            if location >= 0:
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, components, gl_type, normalized, self.stride, ctypes.c_void_p(offset))
+
+    def unbind_attributes(self, locations):
+        for attribute, *_ in self.layout:
+            location = locations.get(attribute, -1)
+            if location >= 0:
+                glDisableVertexAttribArray(location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def render_instanced(self, instance_count):
+        """Draw every index instance_count times; attributes must already be bound."""
+        if instance_count > 0 and self.index_count > 0:
+            glDrawElementsInstanced(self.mode, self.index_count, self.index_type, None, instance_count)
+
+    def render(self, count=None, first_index=0):
+        """Draw count indices (all by default) in a single call."""
+        if count is None:
+            count = self.index_count - first_index
+        if count <= 0:
+            return
+
+        # Fixed-function arrays cannot normalize positions, so the stored
+        # integers are scaled back through the modelview matrix
+        unit = next((unit for attribute, _, _, _, unit, _ in self.attributes if attribute == 'position'), 1.0)
+        decode = self.position_scale != 1.0 or any(self.position_offset) or unit != 1.0
+        if decode:
+            glPushMatrix()
+            glTranslatef(*self.position_offset)
+            scale = self.position_scale / unit
+            glScalef(scale, scale, scale)
+
+        self.bind()
+        glDrawElements(self.mode, count, self.index_type, ctypes.c_void_p(first_index * self.index_size))
+        self.unbind()
+
+        if decode:
+            glPopMatrix()
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(2, [self.vbo, self.ibo])
+            self.vbo = None
+            self.ibo = None
+
+
+class InstanceBuffer:
+    """Per-instance float32 attributes streamed to the GPU every frame.
+
+    layout works like VertexBuffer's; each attribute advances once per
+    instance (divisor 1) when bound to a shader.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.floats_per_instance = sum(components for _, components in layout)
+        self.stride = self.floats_per_instance * 4
+        self.instance_count = 0
+        self.vbo = glGenBuffers(1)
+
+    def upload(self, instances):
+        instances = np.ascontiguousarray(instances, dtype=np.float32).reshape(-1, self.floats_per_instance)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        # Orphan the old storage so the driver does not stall on the previous frame
+        glBufferData(GL_ARRAY_BUFFER, max(instances.nbytes, 4), None, GL_STREAM_DRAW)
+        if instances.nbytes:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, instances.nbytes, instances)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.instance_count = len(instances)
+
+    def bind_attributes(self, locations):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        offset = 0
+        for attribute, components in self.layout:
+            location = locations.get(attribute, -1)
+            if location >= 0:
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, components, GL_FLOAT, GL_FALSE, self.stride, ctypes.c_void_p(offset))
+                glVertexAttribDivisor(location, 1)
+            offset += components * 4
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def unbind_attributes(self, locations):
+        for attribute, _ in self.layout:
+            location = locations.get(attribute, -1)
+            if location >= 0:
+                glVertexAttribDivisor(location, 0)
+                glDisableVertexAttribArray(location)
+
+    def delete(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
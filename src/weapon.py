@@ -1,5 +1,6 @@
 import pygame
 import os
+from .asset_manager import assets
 
 class Weapon:
     def __init__(self):
@@ -17,35 +18,21 @@ class Weapon:
         self.last_shot_time = 0
         self.cooldown = 0.3  # 300ms between shots - slightly faster
         
-        # Sound effects
+        # Sound effects, filled in by load_sounds() during game loading
         self.sound_shot = None
         self.sound_empty = None
         self.sound_reload = None
         
-        # Load sound effects
-        self.load_sounds()
-        
         print("Weapon initialized with damage:", self.damage)
     
     def load_sounds(self):
-        """Load weapon sound effects"""
-        try:
-            pygame.mixer.init()
-            
-            # Load Desert Eagle shot sound
-            shot_path = os.path.join('src', 'assets', 'sound', 'deserteagle.mp3')
-            if os.path.exists(shot_path):
-                self.sound_shot = pygame.mixer.Sound(shot_path)
-                self.sound_shot.set_volume(1.0)  # 40% volume to not overpower music
-                print(f"Loaded weapon sound: {shot_path}")
-            else:
-                print(f"Warning: Weapon sound file not found at {shot_path}")
-            
-            # We could also load empty and reload sounds here
-            # empty_path = os.path.join('src', 'assets', 'sound', 'empty.mp3')
-            # reload_path = os.path.join('src', 'assets', 'sound', 'reload.mp3')
-        except Exception as e:
-            print(f"Error loading weapon sounds: {e}")
+        """Load weapon sound effects; safe to run on a loader thread"""
+        # Load Desert Eagle shot sound; None if sound is unavailable
+        self.sound_shot = assets.sound(os.path.join('src', 'assets', 'sound', 'deserteagle.mp3'), 1.0)
+        
+        # We could also load empty and reload sounds here
+        # self.sound_empty = assets.sound(os.path.join('src', 'assets', 'sound', 'empty.mp3'))
+        # self.sound_reload = assets.sound(os.path.join('src', 'assets', 'sound', 'reload.mp3'))
     
     def shoot(self, current_time):
         # Check if we're reloading
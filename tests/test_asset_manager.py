@@ -0,0 +1,58 @@
+import threading
+import pytest
+from src.asset_manager import AssetManager
+
+def test_other_assets_load_while_one_is_decoding():
+    assets = AssetManager()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5.0)
+        return 'skull'
+
+    worker = threading.Thread(target=assets.acquire, args=('model', 'skull.obj', slow))
+    worker.start()
+    try:
+        assert started.wait(5.0)
+        # The slow load must not hold up an unrelated asset
+        assert assets.acquire('shader', 'props', lambda: 'program') == 'program'
+    finally:
+        release.set()
+        worker.join()
+    assert assets.references('model', 'skull.obj') == 1
+
+def test_callers_of_one_asset_share_a_single_load():
+    assets = AssetManager()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow():
+        loads.append(1)
+        started.set()
+        release.wait(5.0)
+        return object()
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(assets.acquire('model', 'skull.obj', slow)))
+    first.start()
+    assert started.wait(5.0)
+    second = threading.Thread(target=lambda: results.append(assets.acquire('model', 'skull.obj', slow)))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+
+    assert len(loads) == 1
+    assert results[0] is results[1]
+    assert assets.references('model', 'skull.obj') == 2
+
+def test_failed_load_is_retried():
+    assets = AssetManager()
+
+    def broken():
+        raise OSError('missing')
+
+    with pytest.raises(OSError):
+        assets.acquire('sound', 'shot.wav', broken)
+    assert assets.acquire('sound', 'shot.wav', lambda: 'sound') == 'sound'
@@ -0,0 +1,49 @@
+import numpy as np
+from src.bullet import Bullet, BulletManager
+from src.enemy_swarm import EnemySwarm
+
+class FlatGround:
+    # Terrain at height 0 that records the craters made in it
+    cell_size = 1.0
+    grid_origin = (-50.0, -50.0)
+    height_version = 0
+
+    def __init__(self):
+        self.craters = []
+
+    def get_height(self, x, z):
+        return 0.0
+
+    def sample_many(self, points, normals=False):
+        return np.zeros(len(np.asarray(points).reshape(-1, 2)))
+
+    def vertex_heights(self, ix, iz):
+        return np.zeros(np.shape(ix))
+
+    def deform(self, x, z, radius, depth):
+        self.craters.append((x, z))
+        return True
+
+def fire(enemy_x):
+    # One bullet heading down into the ground about 10 units ahead, past an enemy at enemy_x
+    ground = FlatGround()
+    bullets = BulletManager(ground)
+    swarm = EnemySwarm(capacity=16)
+    swarm.spawn([(enemy_x, 1.0, 0.0)], 10)
+    direction = np.array([1.0, -0.15, 0.0])
+    bullet = Bullet(np.array([0.0, 1.5, 0.0]), direction / np.linalg.norm(direction), speed=40.0)
+    bullets.bullets.append(bullet)
+    kills = bullets.update(0.3, swarm)
+    return kills, ground.craters, bullets.bullets
+
+def test_target_before_the_ground_is_hit():
+    kills, craters, remaining = fire(2.0)
+    assert kills == 1
+    assert craters == []
+    assert remaining == []
+
+def test_ground_before_the_target_stops_the_bullet():
+    kills, craters, remaining = fire(12.0)
+    assert kills == 0
+    assert len(craters) == 1 and abs(craters[0][0] - 10.0) < 0.2
+    assert remaining == []
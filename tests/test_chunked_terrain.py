@@ -0,0 +1,46 @@
+import numpy as np
+import src.chunked_terrain as chunked_terrain
+from src.chunked_terrain import ChunkedTerrain
+
+def make_terrain(seed=4):
+    terrain = ChunkedTerrain(seed=seed, view_distance=40.0)
+    terrain.load_around((0.0, 0.0, 0.0))
+    return terrain
+
+def test_dense_lattice_matches_per_chunk_lookup(monkeypatch):
+    terrain = make_terrain()
+    try:
+        terrain.deform(3.0, 4.0, 3.0, 1.0)
+        rng = np.random.default_rng(2)
+        points = rng.uniform(-90.0, 90.0, (2000, 2))  # Reaches chunks that are not loaded
+        gx, gz = rng.integers(-120, 120, (2, 2000))
+        dense = terrain.sample_many(points, normals=True), terrain.vertex_heights(gx, gz)
+
+        monkeypatch.setattr(chunked_terrain, 'DENSE_CHUNK_SPAN', 0)
+        grouped = terrain.sample_many(points, normals=True), terrain.vertex_heights(gx, gz)
+        assert np.allclose(dense[0][0], grouped[0][0])
+        assert np.allclose(dense[0][1], grouped[0][1])
+        assert np.allclose(dense[1], grouped[1])
+    finally:
+        terrain.close()
+
+def test_craters_survive_regeneration_and_bump_version_once():
+    terrain = make_terrain()
+    try:
+        version = terrain.height_version
+        rng = np.random.default_rng(0)
+        for x, z in rng.uniform(-15.0, 15.0, (50, 2)):
+            terrain.deform(x, z, 2.5, 0.2)
+        assert terrain.height_version == version
+        terrain.update((0.0, 0.0, 0.0))
+        assert terrain.height_version == version + 1
+
+        # Chunks generated after the craters get the same heights
+        fresh = ChunkedTerrain(seed=4, view_distance=40.0)
+        fresh.crater_deltas = terrain.crater_deltas
+        fresh.load_around((0.0, 0.0, 0.0))
+        for key, chunk in fresh.chunks.items():
+            assert np.allclose(chunk.heights, terrain.chunks[key].heights)
+        fresh.close()
+    finally:
+        terrain.close()
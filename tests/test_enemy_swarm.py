@@ -0,0 +1,64 @@
+import numpy as np
+from src.enemy_swarm import EnemySwarm
+
+class FlatGround:
+    def sample_many(self, points, normals=False):
+        return np.zeros(len(np.asarray(points).reshape(-1, 2)))
+
+def spawn_line(swarm, count, health=100):
+    return swarm.spawn([(float(i) * 3.0, 0.0, 0.0) for i in range(count)], health)
+
+def test_handles_find_their_enemy_after_rows_move():
+    swarm = EnemySwarm(capacity=8)
+    handles = spawn_line(swarm, 4)
+    swarm.health[:] = [10, 20, 30, 40]
+
+    swarm.remove(swarm.row(handles[0]))
+    assert len(swarm) == 3
+    assert swarm.row(handles[0]) == -1
+    # The last enemy was moved into the freed row and still resolves
+    assert swarm.health[swarm.row(handles[3])] == 40
+    assert sorted(swarm.health.tolist()) == [20, 30, 40]
+
+def test_reused_slot_does_not_revive_old_handles():
+    swarm = EnemySwarm(capacity=2)
+    old = spawn_line(swarm, 2)
+    swarm.remove(swarm.row(old[1]))
+    new = swarm.spawn([(0.0, 0.0, 5.0)], 50)
+
+    assert new[0] != old[1]
+    assert new[0] & 0xFFFFFF == old[1] & 0xFFFFFF  # Same slot, next generation
+    assert swarm.row(old[1]) == -1
+    assert swarm.health[swarm.row(new[0])] == 50
+
+def test_full_pool_spawns_what_fits():
+    swarm = EnemySwarm(capacity=3)
+    assert len(spawn_line(swarm, 5)) == 3
+    assert len(swarm) == 3
+    assert len(swarm.spawn([(0.0, 0.0, 0.0)], 10)) == 0
+
+def test_take_damage_frees_the_row_on_death():
+    swarm = EnemySwarm(capacity=4)
+    handles = spawn_line(swarm, 2, health=50)
+    assert not swarm.take_damage(swarm.row(handles[0]), 30)
+    assert swarm.take_damage(swarm.row(handles[0]), 30)
+    assert swarm.row(handles[0]) == -1
+    assert len(swarm) == 1 and swarm.row(handles[1]) == 0
+
+def test_grid_follows_removals():
+    swarm = EnemySwarm(capacity=16)
+    handles = spawn_line(swarm, 6)
+    swarm.update(0.0, (0.0, 0.0, 0.0), FlatGround())
+    swarm.remove(swarm.row(handles[2]))
+    touching = swarm.touching((15.0, 0.0, 0.0), 0.5)
+    assert swarm.handles(touching).tolist() == [handles[5]]
+    assert len(swarm.touching((6.0, 0.0, 0.0), 0.5)) == 0
+
+def test_stacked_enemies_are_pushed_apart():
+    swarm = EnemySwarm(capacity=16)
+    swarm.spawn(np.zeros((5, 3)), 100, speed=0.0)
+    for _ in range(120):
+        swarm.update(1 / 60, (50.0, 0.0, 0.0), FlatGround())
+    x, z = swarm.position[:, 0], swarm.position[:, 2]
+    distance = np.hypot(x[:, None] - x, z[:, None] - z) + np.eye(len(x)) * 10
+    assert distance.min() > 0.5 * swarm.separation
@@ -0,0 +1,103 @@
+import heapq
+import math
+import time
+import numpy as np
+from src.flow_field import FlowField, solve_flow, NEIGHBOUR_OFFSETS, UPHILL_COST, DOWNHILL_COST, MAX_SLOPE
+
+def step_cost(heights, cell_size, x, z, offset_x, offset_z):
+    # Cost of one step from (x, z), inf where it is too steep or leaves the grid
+    size = len(heights)
+    to_x, to_z = x + offset_x, z + offset_z
+    if not (0 <= to_x < size and 0 <= to_z < size):
+        return math.inf
+    run = cell_size * math.hypot(offset_x, offset_z)
+    rise = heights[to_z, to_x] - heights[z, x]
+    if abs(rise) > MAX_SLOPE * run:
+        return math.inf
+    if offset_x and offset_z and math.inf in (step_cost(heights, cell_size, x, z, offset_x, 0),
+                                              step_cost(heights, cell_size, x, z, 0, offset_z)):
+        return math.inf  # Would cut a corner
+    return run + UPHILL_COST * max(rise, 0.0) + DOWNHILL_COST * max(-rise, 0.0)
+
+def dijkstra(heights, cell_size):
+    # Cost from every vertex to the center with a priority queue, walking the steps backwards
+    size = len(heights)
+    center = size // 2
+    cost = np.full((size, size), np.inf)
+    cost[center, center] = 0.0
+    queue = [(0.0, center, center)]
+    while queue:
+        current, z, x = heapq.heappop(queue)
+        if current > cost[z, x]:
+            continue
+        for offset_x, offset_z in NEIGHBOUR_OFFSETS:
+            from_x, from_z = x + offset_x, z + offset_z
+            if not (0 <= from_x < size and 0 <= from_z < size):
+                continue
+            step = step_cost(heights, cell_size, from_x, from_z, -offset_x, -offset_z)
+            if current + step < cost[from_z, from_x]:
+                cost[from_z, from_x] = current + step
+                heapq.heappush(queue, (current + step, from_z, from_x))
+    return cost
+
+def walled_heights(size=21):
+    heights = np.zeros((size, size))
+    heights[3:size - 3, size // 2 - 4] = 100.0  # Wall across the field, open at both ends
+    return heights
+
+def test_costs_match_dijkstra():
+    rng = np.random.default_rng(1)
+    heights = rng.normal(0.0, 1.0, (25, 25)).cumsum(axis=0) * 0.4
+    heights[5:20, 8] = 50.0
+    cost, _, _ = solve_flow(heights, 2.0)
+    assert np.allclose(cost, dijkstra(heights, 2.0))
+
+def test_directions_lead_around_a_wall():
+    heights = walled_heights()
+    cost, direction_x, direction_z = solve_flow(heights, 1.0)
+    center = len(heights) // 2
+    assert direction_x[center, center] == 0.0 and direction_z[center, center] == 0.0
+
+    # Follow the field from behind the wall; every step stays off the wall and ends at the center
+    x, z = 2.0, float(center)
+    for _ in range(200):
+        ix, iz = int(round(x)), int(round(z))
+        assert heights[iz, ix] == 0.0
+        if (ix, iz) == (center, center):
+            break
+        x += direction_x[iz, ix] * 0.5
+        z += direction_z[iz, ix] * 0.5
+    assert (int(round(x)), int(round(z))) == (center, center)
+
+class WalledGround:
+    cell_size = 1.0
+    grid_origin = (-10.0, -10.0)
+    height_version = 0
+
+    def vertex_heights(self, ix, iz):
+        ix, iz = np.asarray(ix), np.asarray(iz)
+        return np.where((ix == 6) & (iz >= 3) & (iz <= 17), 100.0, 0.0)
+
+def test_sample_steers_only_inside_the_field():
+    field = FlowField(WalledGround(), radius=10.0, threaded=False)
+    field.update((0.0, 0.0, 0.0))
+    direction_x, direction_z, steered = field.sample(np.array([-8.0, 0.0, 40.0]), np.array([3.0, 0.0, 0.0]))
+    # Outside the window and at the target's own vertex enemies head straight in
+    assert steered.tolist() == [True, False, False]
+    # Behind the wall the way round is sideways, toward its nearer end
+    assert direction_z[0] > 0.5
+
+def test_threaded_field_is_installed_once_solved():
+    field = FlowField(WalledGround(), radius=10.0)
+    try:
+        field.update((0.0, 0.0, 0.0))
+        deadline = time.time() + 5.0
+        while field.corner is None and time.time() < deadline:
+            time.sleep(0.01)
+            field.update((0.0, 0.0, 0.0))
+        assert field.corner == (0, 0)
+        # The same target vertex and heights do not start another solve
+        field.update((0.2, 0.0, 0.1))
+        assert field.pending is None
+    finally:
+        field.close()
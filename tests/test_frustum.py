@@ -0,0 +1,59 @@
+import math
+import numpy as np
+from src.frustum import Frustum
+
+def perspective(fovy, aspect, near, far):
+    # gluPerspective as a row-major matrix
+    f = 1.0 / math.tan(math.radians(fovy) / 2)
+    return np.array([
+        [f / aspect, 0.0, 0.0, 0.0],
+        [0.0, f, 0.0, 0.0],
+        [0.0, 0.0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0.0, 0.0, -1.0, 0.0],
+    ])
+
+def translation(x, y, z):
+    matrix = np.eye(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+def test_planes_from_explicit_matrices():
+    # Camera at z = 10 looking down -z, with a 90 degree field of view
+    frustum = Frustum()
+    frustum.update(perspective(90.0, 1.0, 1.0, 100.0), translation(0.0, 0.0, -10.0), fog_end=50.0)
+    planes = frustum.planes
+    assert planes.shape == (7, 4)
+    assert np.allclose(np.linalg.norm(planes[:, :3], axis=1), 1.0)
+
+    root = math.sqrt(0.5)
+    assert np.allclose(planes[0], [root, 0.0, -root, 10 * root])  # Left: x >= z - 10
+    assert np.allclose(planes[4], [0.0, 0.0, -1.0, 9.0])  # Near: z <= 9
+    assert np.allclose(planes[6], [0.0, 0.0, 1.0, 40.0])  # Fog end: z >= -40
+
+def test_spheres_and_boxes_against_the_planes():
+    frustum = Frustum()
+    frustum.update(perspective(90.0, 1.0, 1.0, 100.0), translation(0.0, 0.0, -10.0), fog_end=50.0)
+    centers = [
+        (0.0, 0.0, 0.0),  # Straight ahead
+        (0.0, 0.0, -35.0),  # Ahead, before the fog end
+        (0.0, 0.0, -45.0),  # Past the fog end
+        (0.0, 0.0, 20.0),  # Behind the camera
+        (30.0, 0.0, 0.0),  # Off to the right
+    ]
+    assert frustum.spheres_visible(centers, 1.0, 'spheres').tolist() == [True, True, False, False, False]
+    # A big enough sphere off to the right reaches into view
+    assert frustum.spheres_visible([(30.0, 0.0, 0.0)], 20.0).tolist() == [True]
+    assert frustum.counts['spheres'] == [2, 3, 0]
+
+    mins = [(-1.0, -1.0, -45.0), (-1.0, -1.0, -48.0)]
+    maxs = [(1.0, 1.0, -38.0), (1.0, 1.0, -42.0)]
+    assert frustum.boxes_visible(mins, maxs).tolist() == [True, False]
+
+def test_view_rotation_turns_the_planes():
+    # Camera at the origin turned to look down +x
+    view = np.eye(4)
+    view[:3, :3] = [[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [-1.0, 0.0, 0.0]]
+    frustum = Frustum()
+    frustum.update(perspective(60.0, 1.0, 0.5, 200.0), view, fog_end=80.0)
+    centers = [(20.0, 0.0, 0.0), (-20.0, 0.0, 0.0), (0.0, 0.0, 20.0), (90.0, 0.0, 0.0)]
+    assert frustum.spheres_visible(centers, 1.0).tolist() == [True, False, False, False]
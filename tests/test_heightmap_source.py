@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from src.heightmap_source import HeightmapSource
+
+def write_raw(tmp_path, pixels):
+    path = tmp_path / 'map.r16'
+    np.asarray(pixels, dtype='<u2').tofile(path)
+    return str(path)
+
+def test_square_map_needs_no_size(tmp_path):
+    pixels = np.arange(16).reshape(4, 4)
+    source = HeightmapSource.from_raw(write_raw(tmp_path, pixels))
+    assert np.array_equal(source.data, pixels)
+
+def test_one_dimension_derives_the_other(tmp_path):
+    pixels = np.arange(24).reshape(3, 8)
+    path = write_raw(tmp_path, pixels)
+    assert np.array_equal(HeightmapSource.from_raw(path, width=8).data, pixels)
+    assert np.array_equal(HeightmapSource.from_raw(path, height=3).data, pixels)
+
+def test_sizes_that_do_not_match_the_file_are_rejected(tmp_path):
+    path = write_raw(tmp_path, np.arange(24).reshape(3, 8))
+    with pytest.raises(ValueError):
+        HeightmapSource.from_raw(path)  # Not square
+    with pytest.raises(ValueError):
+        HeightmapSource.from_raw(path, width=5)
+    with pytest.raises(ValueError):
+        HeightmapSource.from_raw(path, width=8, height=4)
+
+    odd = tmp_path / 'odd.r16'
+    odd.write_bytes(b'\0' * 33)
+    with pytest.raises(ValueError):
+        HeightmapSource.from_raw(str(odd), width=4, height=4)
@@ -0,0 +1,27 @@
+import numpy as np
+from src.mesh_lod import select_levels
+
+THRESHOLDS = (10.0, 20.0)
+
+def test_levels_follow_distance_away_from_boundaries():
+    levels = select_levels([5.0, 15.0, 50.0], [0, 0, 0], THRESHOLDS)
+    assert levels.tolist() == [0, 1, 2]
+    levels = select_levels([5.0, 15.0, 50.0], [2, 2, 2], THRESHOLDS)
+    assert levels.tolist() == [0, 1, 2]
+
+def test_levels_stick_near_a_boundary():
+    # Within 10% of the 10.0 boundary either level is kept
+    assert select_levels([9.5, 10.5], [0, 0], THRESHOLDS).tolist() == [0, 0]
+    assert select_levels([9.5, 10.5], [1, 1], THRESHOLDS).tolist() == [1, 1]
+
+def test_levels_switch_once_past_the_band():
+    assert select_levels([11.5], [0], THRESHOLDS).tolist() == [1]
+    assert select_levels([8.5], [1], THRESHOLDS).tolist() == [0]
+
+def test_hovering_at_a_boundary_does_not_flicker():
+    distances = 10.0 + 0.8 * np.sin(np.arange(50))
+    level, history = np.array([0]), []
+    for distance in distances:
+        level = select_levels([distance], level, THRESHOLDS)
+        history.append(int(level[0]))
+    assert history == [0] * len(distances)
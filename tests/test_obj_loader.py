@@ -0,0 +1,35 @@
+import numpy as np
+from src.obj_loader import parse_obj
+
+def test_uniform_lines_with_w_and_colours():
+    mesh = parse_obj(b'v 1 2 3 1 0.5 0.5 0.5\nv 4 5 6 1 0 0 0\nv 7 8 9 1 1 1 1\nf 1 2 3\n')
+    assert np.array_equal(mesh.positions, [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+    assert mesh.positions.dtype == np.float32
+
+def test_mixed_line_lengths_whose_total_divides_evenly():
+    mesh = parse_obj(b'v 1 2 3\nv 4 5 6 7 8\nv 9 10 11 12 13\nv 0 0 0\nf 1 2 3\n')
+    assert np.array_equal(mesh.positions, [[1, 2, 3], [4, 5, 6], [9, 10, 11], [0, 0, 0]])
+
+def test_mixed_w_and_vertex_colours():
+    mesh = parse_obj(b'v 1 2 3\nv 4 5 6 1\nv 7 8 9 0.1 0.2 0.3\nv 10 11 12 1 0.1 0.2 0.3\nf 1 2 3 4\n')
+    assert np.array_equal(mesh.positions, [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]])
+    assert mesh.triangles.shape == (2, 3, 3)
+
+def test_short_lines_are_zero_padded():
+    mesh = parse_obj(b'v 1 2 3\nv 4 5 6\nvt 0.5\nvt 0.25 0.75 0\nf 1/1 2/2 1/1\n')
+    assert np.array_equal(mesh.texcoords, [[0.5, 0], [0.25, 0.75]])
+
+def test_crlf_and_tabs():
+    mesh = parse_obj(b'v\t1 2 3\r\nv 4\t5 6\r\nv 7 8 9 1\r\nf 1 2 3\r\n')
+    assert np.array_equal(mesh.positions, [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+    assert np.array_equal(mesh.triangles[0, :, 0], [0, 1, 2])
+
+def test_indented_lines():
+    mesh = parse_obj(b'v 0 0 0\nv 1 0 0\nv 0 1 0\n  f 1 2 3\n')
+    assert np.array_equal(mesh.triangles[0, :, 0], [0, 1, 2])
+
+    # An indented v line still counts, so later indices are not shifted
+    mesh = parse_obj(b'  v 9 9 9\n\tv 1 0 0\nv 0 1 0\n v 0 0 1\nf 2 3 4\n  vt 0.5 0.5\n')
+    assert np.array_equal(mesh.positions, [[9, 9, 9], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    assert np.array_equal(mesh.triangles[0, :, 0], [1, 2, 3])
+    assert np.array_equal(mesh.texcoords, [[0.5, 0.5]])
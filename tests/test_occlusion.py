@@ -0,0 +1,37 @@
+import numpy as np
+from src.occlusion import HorizonOcclusion
+
+class Ridge:
+    # Flat ground with a 20 unit high wall along z, between x = 10 and 14
+    cell_size = 1.0
+    grid_origin = (0.0, 0.0)
+    height_version = 0
+
+    def vertex_heights(self, ix, iz):
+        ix, iz = np.broadcast_arrays(np.asarray(ix), np.asarray(iz))
+        return np.where((ix >= 10) & (ix <= 14), 20.0, 0.0)
+
+def make_occlusion():
+    occlusion = HorizonOcclusion(Ridge(), radius=60.0)
+    occlusion.update((0.0, 2.0, 0.0))
+    return occlusion
+
+def test_ridge_hides_what_is_behind_it():
+    occlusion = make_occlusion()
+    centers = [(30.0, 0.0, 0.0), (30.0, 0.0, 3.0), (40.0, 0.0, -5.0)]
+    assert occlusion.occluded(centers, 1.0, 5.0).all()
+
+def test_visible_objects_are_kept():
+    occlusion = make_occlusion()
+    centers = [
+        (30.0, 0.0, 0.0),  # Behind the ridge but towering over it
+        (6.0, 0.0, 0.0),  # In front of the ridge
+        (0.0, 0.0, 30.0),  # Off to the side, over flat ground
+        (-30.0, 0.0, 0.0),  # Behind the eye, away from the ridge
+    ]
+    tops = [80.0, 5.0, 5.0, 5.0]
+    assert not occlusion.occluded(centers, 1.0, tops).any()
+
+def test_nothing_is_hidden_before_the_first_update():
+    occlusion = HorizonOcclusion(Ridge())
+    assert not occlusion.occluded([(30.0, 0.0, 0.0)], 1.0, 5.0).any()
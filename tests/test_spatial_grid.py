@@ -0,0 +1,78 @@
+import numpy as np
+from src.spatial_grid import SpatialGrid
+
+def random_points(count, extent, seed=0):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(-extent, extent, (count, 3))
+    points[:, 1] = rng.uniform(0.0, 2.0, count)
+    return points
+
+def test_query_radius_matches_brute_force():
+    points = random_points(500, 20.0)
+    grid = SpatialGrid(cell_size=2.0)
+    grid.build(points)
+    for center in random_points(20, 20.0, seed=1):
+        expected = np.flatnonzero(np.hypot(points[:, 0] - center[0], points[:, 2] - center[2]) < 3.5)
+        assert grid.query_radius(center, 3.5).tolist() == expected.tolist()
+
+def test_query_segments_matches_brute_force():
+    points = random_points(400, 15.0)
+    grid = SpatialGrid(cell_size=2.0)
+    grid.build(points)
+    starts = random_points(30, 15.0, seed=2)
+    ends = starts + random_points(30, 6.0, seed=3)
+    radius = 0.8
+
+    segments, items, t = grid.query_segments(starts, ends, radius)
+    expected = set()
+    for s, (start, end) in enumerate(zip(starts, ends)):
+        direction = end - start
+        along = np.clip((points - start) @ direction / (direction @ direction), 0.0, 1.0)
+        closest = start + along[:, None] * direction
+        for item in np.flatnonzero(np.linalg.norm(points - closest, axis=1) < radius):
+            expected.add((s, item))
+    assert set(zip(segments.tolist(), items.tolist())) == expected
+    # Sorted by segment, then nearest first along it
+    order = np.lexsort((t, segments))
+    assert np.array_equal(order, np.arange(len(order)))
+
+def brute_pairs(points, radius, alive=None):
+    alive = np.arange(len(points)) if alive is None else alive
+    pairs = set()
+    for a in alive:
+        for b in alive:
+            if a < b and np.hypot(*(points[a, [0, 2]] - points[b, [0, 2]])) < radius:
+                pairs.add((a, b))
+    return pairs
+
+def as_pairs(i, j):
+    return {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+
+def test_pairs_matches_brute_force_and_splits_over_sources():
+    points = random_points(300, 10.0)
+    grid = SpatialGrid(cell_size=1.0, max_per_cell=64)
+    grid.build(points)
+    i, j = grid.pairs(1.0)
+    assert as_pairs(i, j) == brute_pairs(points, 1.0)
+
+    # Splitting the sources still finds every pair once
+    halves = [grid.pairs(1.0, rows) for rows in np.array_split(np.arange(len(points)), 3)]
+    found = np.concatenate([i for i, _ in halves]), np.concatenate([j for _, j in halves])
+    assert len(found[0]) == len(i)
+    assert as_pairs(*found) == as_pairs(i, j)
+
+def test_remove_with_swap_keeps_queries_consistent():
+    points = random_points(100, 8.0)
+    grid = SpatialGrid(cell_size=1.0, max_per_cell=64)
+    grid.build(points)
+
+    # Remove item 10 the way the swarm does, by moving the last item into its place
+    last = len(points) - 1
+    moved = points[last].copy()
+    points[10] = moved
+    grid.remove(10, moved_from=last)
+
+    alive = np.arange(last)
+    assert as_pairs(*grid.pairs(1.0)) == brute_pairs(points, 1.0, alive)
+    assert 10 in grid.query_radius(moved, 0.1).tolist()
+    assert last not in grid.query_radius(moved, 0.1).tolist()
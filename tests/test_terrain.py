@@ -0,0 +1,43 @@
+import math
+import numpy as np
+from src.terrain import Terrain, ProceduralHeights
+
+def scalar_heights(source, grid_offset, resolution):
+    # The original per-vertex generator, to check the vectorized one against
+    heights = np.zeros((resolution + 1, resolution + 1))
+    for y in range(resolution + 1):
+        for x in range(resolution + 1):
+            nx = (grid_offset[0] + x) / source.resolution - 0.5
+            ny = (grid_offset[1] + y) / source.resolution - 0.5
+            height = 0.0
+            amplitude = 1.0
+            frequency = 1.0
+            for i in range(source.NOISE_OCTAVES):
+                sx = nx * frequency * source.NOISE_SCALE + source.offsets[i, 0]
+                sy = ny * frequency * source.NOISE_SCALE + source.offsets[i, 1]
+                height += math.sin(sx * 12.9898 + sy * 78.233) * 43758.5453 % 1.0 * amplitude
+                amplitude *= source.NOISE_PERSISTENCE
+                frequency *= source.NOISE_LACUNARITY
+            height *= 2.0
+            if height < -0.3:
+                height = -0.3 + (height + 0.3) * 0.3
+            heights[y, x] = height
+    return heights
+
+def test_vectorized_heights_match_scalar_loop():
+    for seed, grid_offset in ((None, (0, 0)), (7, (16, -32))):
+        terrain = Terrain(32, 16, seed=seed, grid_offset=grid_offset, create_mesh=False)
+        expected = scalar_heights(terrain.height_source, grid_offset, 16)
+        assert np.allclose(terrain.heights, expected, atol=1e-6)
+
+def test_neighbouring_patches_share_edges():
+    source = ProceduralHeights(3, 50)
+    left = Terrain(32, 16, grid_offset=(0, 0), height_source=source, create_mesh=False)
+    right = Terrain(32, 16, grid_offset=(16, 0), height_source=source, create_mesh=False)
+    assert np.array_equal(left.heights[:, -1], right.heights[:, 0])
+
+def test_sample_many_matches_get_height():
+    terrain = Terrain(32, 16, seed=5, create_mesh=False)
+    points = np.random.default_rng(0).uniform(-20, 20, (200, 2))
+    expected = [terrain.get_height(x, z) for x, z in points]
+    assert np.allclose(terrain.sample_many(points), expected)
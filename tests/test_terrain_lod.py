@@ -0,0 +1,45 @@
+import numpy as np
+from src.terrain_lod import build_lod_indices
+
+PATCH = 8
+
+def grid_triangles(inner_levels):
+    # (T, 3, 2) vertex x/z of the index buffer for a square grid of patch
+    # levels, with hidden patches around it
+    levels = np.pad(np.asarray(inner_levels), 1, constant_values=-1)
+    row_length = len(inner_levels) * PATCH + 1
+    indices = build_lod_indices(levels, PATCH, row_length).astype(np.int64).reshape(-1, 3)
+    return np.stack([indices % row_length, indices // row_length], axis=2)
+
+def open_edges(triangles):
+    # Edges used by one triangle only; inside a crack-free mesh every edge has two
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    order = np.lexsort((edges[:, :, 1], edges[:, :, 0]), axis=1)
+    edges = np.take_along_axis(edges, order[:, :, np.newaxis], axis=1)
+    unique, counts = np.unique(edges.reshape(-1, 4), axis=0, return_counts=True)
+    assert counts.max() <= 2  # No triangles overlapping along an edge
+    return unique[counts == 1].reshape(-1, 2, 2)
+
+def test_mixed_levels_leave_no_cracks():
+    inner = [[0, 2, 1], [1, 0, 2], [2, 2, 0]]
+    triangles = grid_triangles(inner)
+    side = len(inner) * PATCH
+
+    # Every open edge lies on the outer border of the grid
+    edges = open_edges(triangles)
+    on_border = ((edges[:, :, 0] == 0).all(axis=1) | (edges[:, :, 0] == side).all(axis=1)
+                 | (edges[:, :, 1] == 0).all(axis=1) | (edges[:, :, 1] == side).all(axis=1))
+    assert len(edges) and on_border.all()
+
+    # The patches tile the grid exactly, all wound like Terrain.build_indices
+    edge1 = triangles[:, 1] - triangles[:, 0]
+    edge2 = triangles[:, 2] - triangles[:, 0]
+    areas = (edge1[:, 0] * edge2[:, 1] - edge1[:, 1] * edge2[:, 0]) / 2
+    assert (areas < 0).all()
+    assert -areas.sum() == side * side
+
+def test_seam_uses_the_coarser_step_on_both_sides():
+    triangles = grid_triangles([[0, 2], [0, 2]])
+    corners = triangles.reshape(-1, 2)
+    seam = corners[corners[:, 0] == PATCH, 1]
+    assert sorted(set(seam.tolist())) == [0, 4, 8, 12, 16]